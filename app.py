@@ -8,6 +8,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from layout.core_layout import create_main_layout
 from callbacks import register_all_callbacks
+from data_io.chunked_upload import register_chunked_upload_routes
+from data_io.model_api import register_model_api_routes
 
 app = dash.Dash(
     __name__,
@@ -18,6 +20,8 @@ app = dash.Dash(
 )
 
 server = app.server
+register_chunked_upload_routes(server)
+register_model_api_routes(server)
 
 # Assets
 ICON_UPLOAD_DEFAULT = app.get_asset_url('upload_file_csv_icon.png') # Using corrected filenames
@@ -0,0 +1,94 @@
+// assets/chunked_upload.js
+// Resumable chunked upload for large exports, started from the 'chunked-upload-button'.
+// Raw file slices are PUT to /upload/<id>?offset=N (see data_io/chunked_upload.py); on completion
+// the session file key is handed to Dash through the 'chunked-upload-store' dcc.Store.
+(function () {
+    var UPLOAD_URL = '/upload';
+    var CHUNK_BYTES = 4 * 1024 * 1024;
+    var MAX_RETRIES = 5;
+
+    function resumeKey(file) {
+        return 'yosai-upload:' + file.name + ':' + file.size + ':' + file.lastModified;
+    }
+
+    function setProgress(text) {
+        var el = document.getElementById('chunked-upload-progress');
+        if (el) { el.textContent = text; }
+    }
+
+    function jsonRequest(method, url, body) {
+        return fetch(url, {
+            method: method,
+            headers: body ? {'Content-Type': 'application/json'} : {},
+            body: body ? JSON.stringify(body) : undefined
+        }).then(function (resp) {
+            return resp.json().then(function (data) { return {status: resp.status, data: data}; });
+        });
+    }
+
+    function startOrResume(file) {
+        var saved = window.localStorage.getItem(resumeKey(file));
+        var start = function () {
+            return jsonRequest('POST', UPLOAD_URL + '/init', {filename: file.name, size: file.size})
+                .then(function (r) {
+                    if (r.status !== 200) { throw new Error(r.data.error || 'Upload could not be started.'); }
+                    window.localStorage.setItem(resumeKey(file), r.data.upload_id);
+                    return r.data;
+                });
+        };
+        if (!saved) { return start(); }
+        return jsonRequest('GET', UPLOAD_URL + '/' + saved).then(function (r) {
+            return r.status === 200 ? r.data : start();
+        });
+    }
+
+    function sendChunks(file, status, retries) {
+        if (status.received >= file.size) { return Promise.resolve(status); }
+        var end = Math.min(status.received + CHUNK_BYTES, file.size);
+        var url = UPLOAD_URL + '/' + status.upload_id + '?offset=' + status.received;
+        setProgress('Uploading ' + file.name + ': ' + Math.floor(100 * status.received / file.size) + '%');
+        return fetch(url, {method: 'PUT', body: file.slice(status.received, end)})
+            .then(function (resp) {
+                return resp.json().then(function (data) {
+                    // 409 means the server holds a different offset; continue from there.
+                    if (resp.status === 200 || resp.status === 409) { return sendChunks(file, data, MAX_RETRIES); }
+                    throw new Error(data.error || 'Chunk rejected.');
+                });
+            })
+            .catch(function (err) {
+                if (retries <= 0) { throw err; }
+                return new Promise(function (resolve) { setTimeout(resolve, 1000 * (MAX_RETRIES - retries + 1)); })
+                    .then(function () { return jsonRequest('GET', UPLOAD_URL + '/' + status.upload_id); })
+                    .then(function (r) { return sendChunks(file, r.data, retries - 1); });
+            });
+    }
+
+    function upload(file) {
+        startOrResume(file)
+            .then(function (status) { return sendChunks(file, status, MAX_RETRIES); })
+            .then(function (status) { return jsonRequest('POST', UPLOAD_URL + '/' + status.upload_id + '/complete'); })
+            .then(function (r) {
+                if (r.status !== 200) { throw new Error(r.data.error || 'Upload could not be completed.'); }
+                window.localStorage.removeItem(resumeKey(file));
+                setProgress('Uploaded ' + file.name + '.');
+                window.dash_clientside.set_props('chunked-upload-store', {
+                    data: {file_key: r.data.file_key, filename: r.data.filename}
+                });
+            })
+            .catch(function (err) {
+                setProgress('Upload failed: ' + err.message + ' Select the file again to resume.');
+            });
+    }
+
+    document.addEventListener('click', function (event) {
+        var button = event.target && event.target.closest && event.target.closest('#chunked-upload-button');
+        if (!button) { return; }
+        var input = document.createElement('input');
+        input.type = 'file';
+        input.accept = '.csv,.gz,.zip';
+        input.addEventListener('change', function () {
+            if (input.files.length) { upload(input.files[0]); }
+        });
+        input.click();
+    });
+})();
@@ -0,0 +1,245 @@
+# File: batch_models.py
+"""
+Headless batch run of the onion model over a directory of site exports.
+
+    python batch_models.py <exports_dir> <output_dir> --mapping mapping.json [--workers N]
+
+Every subdirectory of <exports_dir> is one site (all .csv/.gz/.zip files in it are loaded together);
+a file directly in <exports_dir> is a site of its own, named after the file. The mapping file is JSON:
+
+    {
+      "column_mapping": {"Time": "Timestamp", "Badge": "UserID", "Device": "DoorID", "Result": "EventType"},
+      "config": {"num_floors": 3},
+      "sites": {"hq": {"confirmed_entrances": ["MAIN LOBBY"], "column_mapping": {...}, "config": {...}}}
+    }
+
+Mapping values may be internal keys (as saved by the UI) or display names. "config" overrides
+GRAPH_PROCESSING_CONFIG; "sites" holds optional per-site overrides.
+Per site, <output_dir>/<site>/ receives device_attributes.csv, path_viz.csv, all_paths.csv,
+cytoscape_elements.json, timing.json and pipeline.log; <output_dir>/timing_report.csv summarizes all sites.
+
+With --event-store, each site's events are also appended to the Parquet event store (dataset named after
+the site; events already stored are skipped), so the API and date-range reads can use them later.
+
+With --incremental, each site's export is folded into the site's saved model state (per-day aggregates
+under YOSAI_MODEL_STATE_DIR) and the artifacts are built from all days in the state, so a daily run only
+processes the new export: "append each morning's export". Events already folded in are skipped. Combined
+with --event-store, the days the export touched are recomputed from their full stored events, so a user-day
+split across two exports is sequenced as one.
+
+With --sweep, each site also gets sensitivity_sweep.csv: the model for every combination of
+same_door_scan_threshold_seconds x ping_pong_threshold_minutes (grid from SENSITIVITY_SWEEP_CONFIG, or
+"sweep": {"same_door_scan_threshold_seconds": [...], "ping_pong_threshold_minutes": [...]} in the mapping file).
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import contextlib
+import traceback
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from constants.constants import REQUIRED_INTERNAL_COLUMNS
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.onion_model import run_onion_model_processing
+from processing.threshold_sweep import run_threshold_sweep
+from processing.incremental import (load_model_state, save_model_state, update_model_state, replace_days_in_state,
+                                    model_from_state)
+from processing.cytoscape_prep import prepare_cytoscape_elements
+from data_io.ingest import INGEST_CONFIG, expand_csv_members, load_event_members
+from data_io.event_store import write_events, read_events
+
+REPORT_COLUMNS = ['site', 'status', 'files', 'raw_events', 'enriched_events', 'devices', 'paths', 'elements',
+                  'load_seconds', 'process_seconds', 'elements_seconds', 'total_seconds', 'error']
+
+
+def discover_sites(exports_dir):
+    """Returns {site name: [CSV member descriptors]} for the exports directory."""
+    sites = {}
+    for name in sorted(os.listdir(exports_dir)):
+        path = os.path.join(exports_dir, name)
+        if name.startswith('.'):
+            continue
+        if os.path.isdir(path):
+            files = [os.path.join(path, f) for f in sorted(os.listdir(path))
+                     if f.lower().endswith(INGEST_CONFIG['allowed_extensions']) and not f.startswith('.')]
+            site = name
+        elif name.lower().endswith(INGEST_CONFIG['allowed_extensions']):
+            files = [path]
+            site = name.split('.')[0]
+        else:
+            continue
+        members = [member for f in files for member in expand_csv_members(f, os.path.relpath(f, exports_dir))]
+        if members:
+            sites.setdefault(site, []).extend(members)
+    return sites
+
+
+def site_dataset(site):
+    """Event store dataset (and model state) name of a site: characters outside [A-Za-z0-9_.-] become '_'."""
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', site)
+
+
+def to_display_mapping(column_mapping):
+    """CSV header -> display name; internal keys (as saved by the UI) are translated."""
+    return {csv_col: REQUIRED_INTERNAL_COLUMNS.get(target, target) for csv_col, target in column_mapping.items()}
+
+
+def site_settings(settings, site):
+    """Merges the global mapping/config with the per-site overrides."""
+    overrides = settings.get('sites', {}).get(site, {})
+    config = GRAPH_PROCESSING_CONFIG.copy()
+    config.update(settings.get('config', {}))
+    config.update(overrides.get('config', {}))
+    column_mapping = overrides.get('column_mapping') or settings.get('column_mapping') or {}
+    return to_display_mapping(column_mapping), config, overrides.get('confirmed_entrances')
+
+
+def write_site_artifacts(site_dir, device_attrs, path_viz, all_paths, elements):
+    device_attrs.to_csv(os.path.join(site_dir, 'device_attributes.csv'), index=False)
+    path_viz.to_csv(os.path.join(site_dir, 'path_viz.csv'), index=False)
+    all_paths.to_csv(os.path.join(site_dir, 'all_paths.csv'), index=False)
+    with open(os.path.join(site_dir, 'cytoscape_elements.json'), 'w') as fh:
+        json.dump(elements, fh, default=str)
+
+
+def fold_site_export(site, event_df, config, confirmed_entrances=None, event_store=False):
+    """
+    Folds one export into the site's saved model state and builds the model from every stored day.
+    Returns (enriched_event_count, device_attributes_df, path_viz_data_df, all_paths_df).
+    """
+    dataset = site_dataset(site)
+    state = load_model_state(dataset, config)
+    if event_store:
+        # Days with newly stored events, plus export days the state lacks (e.g. a state started after the store).
+        export_days = pd.to_datetime(event_df[REQUIRED_INTERNAL_COLUMNS['Timestamp']], errors='coerce').dt.date.dropna().unique()
+        days = sorted(set(write_events(event_df, dataset, mode='append'))
+                      | {day for day in export_days if day not in state['days']})
+        if days:
+            stored = read_events(dataset, start=min(days), end=max(days))
+            replace_days_in_state(state, stored, days, config)
+    else:
+        update_model_state(state, event_df, config)
+    save_model_state(state, dataset)
+    aggregates, device_attrs, path_viz, all_paths = model_from_state(
+        state, config, confirmed_official_entrances=confirmed_entrances)
+    return aggregates['event_count'], device_attrs, path_viz, all_paths
+
+
+def run_site(site, members, settings, output_dir, sweep=False, event_store=False, incremental=False):
+    """Worker: load -> model -> Cytoscape elements for one site. Pipeline output goes to pipeline.log."""
+    site_dir = os.path.join(output_dir, site)
+    os.makedirs(site_dir, exist_ok=True)
+    timing = dict.fromkeys(REPORT_COLUMNS)
+    timing.update(site=site, status='failed', files=len(members))
+    started = time.perf_counter()
+
+    with open(os.path.join(site_dir, 'pipeline.log'), 'w') as log, contextlib.redirect_stdout(log):
+        try:
+            column_mapping, config, confirmed_entrances = site_settings(settings, site)
+            if not column_mapping:
+                raise ValueError("No column mapping configured.")
+
+            step = time.perf_counter()
+            # Sites run in parallel already, so each site parses its own files in a single process.
+            event_df = load_event_members(members, column_mapping, max_workers=1)
+            if event_df is None:
+                raise ValueError("Event files could not be loaded with the configured column mapping.")
+            timing['load_seconds'] = round(time.perf_counter() - step, 3)
+            timing['raw_events'] = len(event_df)
+            if event_store and not incremental:
+                write_events(event_df, site_dataset(site), mode='append')
+
+            step = time.perf_counter()
+            if incremental:
+                enriched_events, device_attrs, path_viz, all_paths = fold_site_export(
+                    site, event_df, config, confirmed_entrances, event_store)
+            else:
+                enriched_df, device_attrs, path_viz, all_paths = run_onion_model_processing(
+                    event_df, config, confirmed_official_entrances=confirmed_entrances)
+                enriched_events = len(enriched_df) if enriched_df is not None else 0
+            timing['process_seconds'] = round(time.perf_counter() - step, 3)
+            if device_attrs is None or device_attrs.empty:
+                raise ValueError("Pipeline produced no model (no events left after cleaning?).")
+            timing['enriched_events'] = enriched_events
+
+            step = time.perf_counter()
+            nodes, edges = prepare_cytoscape_elements(device_attrs, path_viz, all_paths)
+            timing['elements_seconds'] = round(time.perf_counter() - step, 3)
+
+            write_site_artifacts(site_dir, device_attrs, path_viz, all_paths, nodes + edges)
+            if sweep:
+                grid = settings.get('sweep', {})
+                run_threshold_sweep(event_df, config, grid.get('same_door_scan_threshold_seconds'),
+                                    grid.get('ping_pong_threshold_minutes'), confirmed_official_entrances=confirmed_entrances
+                                    ).to_csv(os.path.join(site_dir, 'sensitivity_sweep.csv'), index=False)
+            timing.update(status='ok', devices=len(device_attrs), paths=len(all_paths), elements=len(nodes) + len(edges))
+        except Exception as e:
+            timing['error'] = str(e)
+            traceback.print_exc(file=log)
+
+    timing['total_seconds'] = round(time.perf_counter() - started, 3)
+    with open(os.path.join(site_dir, 'timing.json'), 'w') as fh:
+        json.dump(timing, fh, indent=2)
+    return timing
+
+
+def run_batch(exports_dir, output_dir, settings, workers=None, only_sites=None, sweep=False, event_store=False,
+              incremental=False):
+    sites = discover_sites(exports_dir)
+    if only_sites:
+        sites = {site: members for site, members in sites.items() if site in only_sites}
+    if not sites:
+        print(f"No site exports found in {exports_dir}.")
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    os.makedirs(output_dir, exist_ok=True)
+
+    workers = min(len(sites), workers or os.cpu_count() or 1)
+    print(f"Running {len(sites)} site(s) across {workers} worker process(es)...")
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_site, site, members, settings, output_dir, sweep, event_store, incremental): site
+                   for site, members in sites.items()}
+        for future in as_completed(futures):
+            timing = future.result()
+            results.append(timing)
+            error_note = f" ({timing['error']})" if timing['error'] else ''
+            print(f"[{len(results)}/{len(sites)}] {timing['site']}: {timing['status']} in {timing['total_seconds']}s{error_note}")
+
+    report = pd.DataFrame(results, columns=REPORT_COLUMNS).sort_values('site', ignore_index=True)
+    count_columns = ['files', 'raw_events', 'enriched_events', 'devices', 'paths', 'elements']
+    report[count_columns] = report[count_columns].astype('Int64')  # failed sites leave these empty
+    report.to_csv(os.path.join(output_dir, 'timing_report.csv'), index=False)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute onion models for a directory of site exports.")
+    parser.add_argument('exports_dir', help="Directory with one subdirectory (or file) per site.")
+    parser.add_argument('output_dir', help="Directory for per-site artifacts and timing_report.csv.")
+    parser.add_argument('--mapping', required=True, help="JSON file with column_mapping, config and per-site overrides.")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel site processes (default: CPU count).")
+    parser.add_argument('--site', action='append', dest='sites', help="Only run this site (repeatable).")
+    parser.add_argument('--sweep', action='store_true', help="Also write sensitivity_sweep.csv per site (threshold grid).")
+    parser.add_argument('--event-store', action='store_true',
+                        help="Also append each site's events to the Parquet event store (YOSAI_EVENT_STORE_DIR).")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Fold each site's export into its saved model state (YOSAI_MODEL_STATE_DIR) and model all stored days.")
+    args = parser.parse_args(argv)
+
+    with open(args.mapping) as fh:
+        settings = json.load(fh)
+    report = run_batch(args.exports_dir, args.output_dir, settings, workers=args.workers, only_sites=args.sites,
+                       sweep=args.sweep, event_store=args.event_store, incremental=args.incremental)
+    failed = int((report['status'] != 'ok').sum())
+    print(f"Done: {len(report) - failed} ok, {failed} failed. Report: {os.path.join(args.output_dir, 'timing_report.csv')}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
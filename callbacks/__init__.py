@@ -1,9 +1,25 @@
 from .upload_callbacks import register_upload_callbacks
 from .mapping_callbacks import register_mapping_callbacks
 from .graph_callbacks import register_graph_callbacks
+from .live_callbacks import register_live_callbacks
+from .diff_callbacks import register_diff_callbacks
+from .window_callbacks import register_window_callbacks
+from .date_range_callbacks import register_date_range_callbacks
+from .journey_callbacks import register_journey_callbacks
+from .traffic_callbacks import register_traffic_callbacks
+from .occupancy_callbacks import register_occupancy_callbacks
+from .progressive_callbacks import register_progressive_callbacks
 
 def register_all_callbacks(app, icon_default, icon_success, icon_fail, logo_path):
     # Register each callback group
     register_upload_callbacks(app, icon_default, icon_success, icon_fail)
     register_mapping_callbacks(app)
     register_graph_callbacks(app)
+    register_live_callbacks(app)
+    register_diff_callbacks(app)
+    register_window_callbacks(app)
+    register_date_range_callbacks(app)
+    register_journey_callbacks(app)
+    register_traffic_callbacks(app)
+    register_occupancy_callbacks(app)
+    register_progressive_callbacks(app)
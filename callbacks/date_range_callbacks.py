@@ -0,0 +1,102 @@
+import dash
+from dash import Input, Output, State
+
+from processing.model_aggregates import aggregate_summary_stats
+from processing.cytoscape_prep import prepare_cytoscape_elements
+from processing.model_diff import diff_date_ranges, previous_period, diff_summary, apply_diff_overlay
+from data_io.session_store import load_index_value
+from callbacks.graph_callbacks import format_stats_panel
+
+_DATE_RANGE_CONTROLS_STYLE = {'display': 'block', 'textAlign': 'center', 'marginBottom': '10px'}
+
+
+def register_date_range_callbacks(app):
+
+    @app.callback(
+        [
+            Output('model-date-range-controls', 'style'),
+            Output('model-date-range', 'min_date_allowed'),
+            Output('model-date-range', 'max_date_allowed'),
+            Output('model-date-range', 'initial_visible_month'),
+            Output('model-date-range', 'start_date'),
+            Output('model-date-range', 'end_date')
+        ],
+        [
+            Input('event-index-store', 'data'),
+            Input('time-window-store', 'data')
+        ]
+    )
+    def configure_date_range_picker(event_index_key, time_window_key):
+        """Enabled when the cleaned events (or at least per-day aggregates, after a snapshot reload) are cached."""
+        stored_events = load_index_value(event_index_key)
+        if stored_events:
+            first_day, last_day = stored_events['index'].first_day, stored_events['index'].last_day
+        else:
+            stored_days = load_index_value(time_window_key)
+            if not stored_days:
+                return {'display': 'none'}, None, None, None, None, None
+            first_day, last_day = stored_days['index'].days[0], stored_days['index'].days[-1]
+        return _DATE_RANGE_CONTROLS_STYLE, first_day, last_day, last_day, None, None
+
+    @app.callback(
+        [
+            Output('onion-graph', 'elements', allow_duplicate=True),
+            Output('model-date-range-status', 'children'),
+            Output('total-access-events-H1', 'children', allow_duplicate=True),
+            Output('event-date-range-P', 'children', allow_duplicate=True),
+            Output('stats-date-range-P', 'children', allow_duplicate=True),
+            Output('stats-days-with-data-P', 'children', allow_duplicate=True),
+            Output('stats-num-devices-P', 'children', allow_duplicate=True),
+            Output('stats-unique-tokens-P', 'children', allow_duplicate=True),
+            Output('most-active-devices-table-body', 'children', allow_duplicate=True)
+        ],
+        [
+            Input('model-date-range', 'start_date'),
+            Input('model-date-range', 'end_date'),
+            Input('model-date-range-compare', 'value')
+        ],
+        [
+            State('event-index-store', 'data'),
+            State('time-window-store', 'data')
+        ],
+        prevent_initial_call=True
+    )
+    def regenerate_for_date_range(start_date, end_date, compare, event_index_key, time_window_key):
+        if not start_date or not end_date:
+            return (dash.no_update,) * 9
+        start_date, end_date = start_date[:10], end_date[:10]
+
+        stored = load_index_value(event_index_key)
+        if stored:
+            event_stats, device_attrs, path_viz, all_paths = stored['index'].range_model(
+                stored['config'], start_date, end_date,
+                stored['confirmed_entrances'] or None, stored['door_classifications'] or None)
+            source = "cached events"
+        else:
+            # After a snapshot reload (or a sharded or out-of-core run) only the per-day aggregates are available.
+            stored = load_index_value(time_window_key)
+            if not stored:
+                return (dash.no_update, "Date ranges are not available for this model.") + (dash.no_update,) * 7
+            aggregates, device_attrs, path_viz, all_paths = stored['index'].window_model(
+                stored['config'], start_date, end_date,
+                stored['confirmed_entrances'] or None, stored['door_classifications'] or None)
+            event_stats = aggregate_summary_stats(aggregates) if aggregates['event_count'] else None
+            source = "per-day aggregates"
+
+        if event_stats is None:
+            return ([], "No events in the selected date range.") + (dash.no_update,) * 7
+        nodes, edges = prepare_cytoscape_elements(device_attrs, path_viz, all_paths)
+        elements = nodes + edges
+        status = f"Model regenerated for {len(device_attrs)} devices from {source}."
+
+        # Differences against the equally long period before, from the per-day aggregates (no pipeline run).
+        windows = load_index_value(time_window_key) if 'compare' in (compare or []) else None
+        before = previous_period(start_date, end_date)
+        if windows and not windows['index'].window_aggregates(*before)['event_count']:
+            status += f" No events in {before[0]} - {before[1]} to compare with."
+        elif windows:
+            diff = diff_date_ranges(windows['index'], windows['config'], before, (start_date, end_date),
+                                    windows['confirmed_entrances'] or None, windows['door_classifications'] or None)
+            elements = apply_diff_overlay(elements, diff)
+            status += f" Since {before[0]} - {before[1]}: {diff_summary(diff)}"
+        return (elements, status) + format_stats_panel(event_stats, device_attrs)
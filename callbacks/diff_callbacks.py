@@ -0,0 +1,61 @@
+import dash
+from dash import Input, Output, State
+
+from data_io.model_snapshots import list_model_snapshots, load_model_snapshot
+from processing.model_diff import diff_models, diff_summary, apply_diff_overlay, clear_diff_overlay
+from processing.cytoscape_prep import prepare_cytoscape_elements
+
+
+def register_diff_callbacks(app):
+
+    @app.callback(
+        [
+            Output('model-diff-baseline', 'options'),
+            Output('model-diff-baseline', 'value')
+        ],
+        Input('model-snapshot-store', 'data'),
+        State('model-diff-baseline', 'value')
+    )
+    def list_comparable_models(current_model, baseline_version):
+        """Other saved versions of the facility of the model on screen, newest first."""
+        # Resetting an already empty selection would fire show_model_diff and redraw the new model.
+        reset_value = None if baseline_version is not None else dash.no_update
+        if not current_model:
+            return [], reset_value
+        options = [
+            {'label': f"v{header['version']} - {header['created'].replace('T', ' ')} ({header['devices']} doors)",
+             'value': header['version']}
+            for header in reversed(list_model_snapshots(current_model['facility']))
+            if header['version'] != current_model['version']
+        ]
+        return options, reset_value
+
+    @app.callback(
+        [
+            Output('onion-graph', 'elements', allow_duplicate=True),
+            Output('model-diff-summary', 'children')
+        ],
+        Input('model-diff-baseline', 'value'),
+        [
+            State('model-snapshot-store', 'data'),
+            State('onion-graph', 'elements')
+        ],
+        prevent_initial_call=True
+    )
+    def show_model_diff(baseline_version, current_model, elements):
+        if not current_model:
+            return dash.no_update, ""
+        if baseline_version is None:
+            # Comparison cleared: drop the overlay from the elements on screen, no snapshot read needed.
+            return clear_diff_overlay(elements or []), ""
+        current = load_model_snapshot(current_model['facility'], version=current_model['version'])
+        if current is None:
+            return dash.no_update, "The model on screen is no longer saved on the server."
+        nodes, edges = prepare_cytoscape_elements(current['device_attributes'], current['path_viz'], current['all_paths'])
+
+        baseline = load_model_snapshot(current_model['facility'], version=baseline_version)
+        if baseline is None:
+            return dash.no_update, f"Saved model v{baseline_version} could not be loaded."
+        diff = diff_models(baseline, current)
+        summary = f"Since v{baseline_version}: {diff_summary(diff)}"
+        return apply_diff_overlay(nodes + edges, diff), summary
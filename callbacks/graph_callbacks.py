@@ -15,10 +15,25 @@ sys.path.append(project_root)
 
 from processing.graph_config import GRAPH_PROCESSING_CONFIG, UI_STYLES
 from styles.graph_styles import actual_default_stylesheet_for_graph
-from data_io.csv_loader import load_csv_event_log # This function is key
-from data_io.file_utils import decode_uploaded_csv
+from data_io.ingest import resolve_upload_members, load_event_members, member_opener, iter_member_event_chunks
+from data_io.csv_prescan import read_csv_headers
+from data_io.event_store import record_events, record_event_chunks
+from data_io.session_store import load_value, load_index_value, store_value, is_session_key, get_session_store
+from data_io.model_snapshots import (member_files_key, model_fingerprint, facility_for_headers,
+                                     load_model_snapshot, save_model_snapshot)
 from processing.onion_model import run_onion_model_processing
+from processing.out_of_core import run_out_of_core_processing, OUT_OF_CORE_CONFIG
+from processing.sharded import run_sharded_onion_model_processing, SHARDED_CONFIG
+from processing.model_aggregates import aggregate_summary_stats, enriched_event_stats
+from processing.temporal_windows import TemporalModelIndex
+from processing.event_index import EventTimeIndex
+from processing.journey_index import UserJourneyIndex
+from processing.door_profiles import DoorProfileIndex, WEEKDAY_NAMES
+from processing.traffic_cube import TrafficCube
+from processing.occupancy import LayerOccupancy
+from processing.progressive import PROGRESSIVE_CONFIG, stratified_user_sample, model_stability, stability_summary
 from processing.cytoscape_prep import prepare_cytoscape_elements
+from callbacks.progressive_callbacks import submit_refinement
 from constants.constants import REQUIRED_INTERNAL_COLUMNS 
 
 def fuzzy_match_columns(csv_columns, internal_keys):
@@ -55,6 +70,169 @@ SECURITY_LEVELS_SLIDER_MAP = {
 REVERSE_SECURITY_MAP = {v['value']: k for k, v in SECURITY_LEVELS_SLIDER_MAP.items()}
 
 
+def format_stats_panel(event_stats, device_attrs):
+    """Stats panel texts (total, date range, days, devices, tokens, most active devices rows) for one model."""
+    s_tae, s_er, s_sr, s_dd, s_nd, s_ut, s_adt = f"{event_stats['raw_event_count']:,}", "N/A", "N/A", "0", "0", "0", []
+
+    # --- Update stats calculations to use display names ---
+    min_d, max_d = event_stats['min_timestamp'], event_stats['max_timestamp']
+    if pd.notna(min_d) and pd.notna(max_d):
+        s_er = f"{min_d.strftime('%d.%m.%Y')} - {max_d.strftime('%d.%m.%Y')}"
+        s_sr = f"Date range: {s_er}"
+        s_dd = f"Days: {event_stats['days']}"
+        s_ut = f"Tokens: {'~' if event_stats.get('users_estimated') else ''}{event_stats['users']}"
+        s_adt = [html.Tr([html.Td(d), html.Td(f"{c:,}", style={'textAlign': 'right'})])
+                 for d, c in event_stats['top_doors']]
+
+    door_col = REQUIRED_INTERNAL_COLUMNS['DoorID']
+    if device_attrs is not None and door_col in device_attrs.columns:
+        s_nd = f"Devices: {device_attrs[door_col].nunique()}"
+
+    if not s_adt:
+        s_adt = [html.Tr([html.Td("N/A", colSpan=2)])]
+    return s_tae, s_er, s_sr, s_dd, s_nd, s_ut, s_adt
+
+
+_SPARKLINE_BLOCKS = "▁▂▃▄▅▆▇█"
+
+
+def _format_neighbours(pairs):
+    return ", ".join(f"{door} ({count:,})" for door, count in pairs) or "-"
+
+
+def format_door_profile(profile):
+    """Lines of the tap details for one DoorProfileIndex profile."""
+    peak = profile['hourly'].max()
+    sparkline = "".join(_SPARKLINE_BLOCKS[int(count * (len(_SPARKLINE_BLOCKS) - 1) / peak)] for count in profile['hourly']) \
+        if peak else ""
+    weekdays = " ".join(f"{name} {int(count):,}" for name, count in zip(WEEKDAY_NAMES, profile['weekday']))
+    depths = ", ".join(f"{depth}: {count:,}" for depth, count in profile['depth_distribution'])
+    return [
+        f"Events: {profile['events']:,} by {profile['users']:,} people | "
+        f"Busiest: {profile['peak_hour']:02d}:00-{profile['peak_hour'] + 1:02d}:00, {profile['peak_weekday']}",
+        f"By hour (00-23): {sparkline}",
+        f"By weekday: {weekdays}",
+        f"Mostly from: {_format_neighbours(profile['top_inbound'])}",
+        f"Mostly to: {_format_neighbours(profile['top_outbound'])}",
+        f"Depth per day (depth: events): {depths}",
+    ]
+
+
+# Indexes a model may carry besides its attributes, paths and stats (None when the path did not build them).
+_EMPTY_INDEXES = {'temporal_index': None, 'event_index': None, 'journey_index': None, 'door_profiles': None,
+                  'traffic_cube': None, 'occupancy': None}
+_INDEX_STORES = ['time-window-store', 'event-index-store', 'journey-index-store', 'door-profile-store',
+                 'traffic-cube-store', 'occupancy-store']
+
+
+# Panels fed by each index, for the note on what a model cannot show.
+_INDEX_PANELS = {'journey_index': 'journeys and frequent routes', 'door_profiles': 'door details',
+                 'traffic_cube': 'traffic by hour', 'occupancy': 'occupancy by layer'}
+
+
+def unavailable_panels_note(model):
+    """Status suffix naming the panels whose index the model does not have ("" when it has them all)."""
+    missing = [panel for name, panel in _INDEX_PANELS.items() if model[name] is None]
+    return f" Not available for this model: {', '.join(missing)}." if missing else ""
+
+
+def build_in_memory_model(df_final, config, confirmed_entrances, door_classifications):
+    """Model of a loaded event frame with its stats and indexes, as a dict (keys of _EMPTY_INDEXES and the model)."""
+    use_sharded = len(df_final) >= SHARDED_CONFIG['min_rows'] and \
+        (SHARDED_CONFIG['max_workers'] or os.cpu_count() or 1) > 1
+    model = dict(_EMPTY_INDEXES, event_stats=None)
+    if use_sharded:
+        # Per-user stages run on a process pool; only merged aggregates and index pieces come back.
+        aggregates, model['device_attrs'], model['path_viz'], model['all_paths'], indexes = run_sharded_onion_model_processing(
+            df_final,
+            config,
+            confirmed_official_entrances=confirmed_entrances,
+            detailed_door_classifications=door_classifications,
+            with_indexes=True
+        )
+        model.update(indexes)
+        if aggregates['event_count']:
+            model['event_stats'] = aggregate_summary_stats(aggregates)
+        return model
+
+    enriched_df, device_attrs, path_viz, all_paths = run_onion_model_processing(
+        df_final.copy(), # Pass df_final (with display names) to run_onion_model_processing
+        config,
+        confirmed_official_entrances=confirmed_entrances,
+        detailed_door_classifications=door_classifications
+    )
+    model.update(device_attrs=device_attrs, path_viz=path_viz, all_paths=all_paths)
+    if enriched_df is None:
+        return model
+
+    if not enriched_df.empty:
+        # Per-day aggregates for the time window slider (built once; windows are prefix-sum lookups).
+        model['temporal_index'] = TemporalModelIndex.from_enriched_events(enriched_df, df_final)
+        # Cleaned events in time order, so date-range regeneration reuses this run's cleaning.
+        model['event_index'] = EventTimeIndex(enriched_df, df_final)
+        model['journey_index'] = UserJourneyIndex(enriched_df)
+        model['door_profiles'] = DoorProfileIndex(enriched_df)
+        model['traffic_cube'] = TrafficCube(enriched_df, device_attrs)
+        if device_attrs is not None and not device_attrs.empty:
+            model['occupancy'] = LayerOccupancy(enriched_df, device_attrs)
+    model['event_stats'] = enriched_event_stats(enriched_df, len(df_final))
+    return model
+
+
+def save_snapshot(model, facility, input_hash, column_mapping, config, confirmed_entrances, door_classifications):
+    """Saves the model as the facility's next snapshot; returns its header, or None if it could not be written."""
+    try:
+        return save_model_snapshot(
+            facility, model['device_attrs'], model['path_viz'], model['all_paths'], model['event_stats'], input_hash,
+            column_mapping, config, confirmed_entrances, door_classifications,
+            temporal_index=model['temporal_index'], door_profiles=model['door_profiles'],
+            traffic_cube=model['traffic_cube'], occupancy=model['occupancy'])
+    except OSError as e:
+        print(f"Warning: Model snapshot could not be saved: {e}")
+        return None
+
+
+def index_store_values(model, config, confirmed_entrances, door_classifications):
+    """Session-store handles for the _INDEX_STORES of a model (None for the indexes it does not have)."""
+    temporal_index, event_index = model['temporal_index'], model['event_index']
+    settings = {'config': config, 'confirmed_entrances': confirmed_entrances, 'door_classifications': door_classifications}
+    return (
+        store_value(dict(settings, index=temporal_index))
+        if temporal_index is not None and len(temporal_index.days) > 1 else None,
+        store_value(dict(settings, index=event_index)) if event_index is not None else None,
+        *(store_value(model[name]) if model[name] is not None else None
+          for name in ('journey_index', 'door_profiles', 'traffic_cube', 'occupancy'))
+    )
+
+
+def refine_full_model(df_final, preview, facility, input_hash, column_mapping, config, confirmed_entrances,
+                      door_classifications):
+    """Background part of a progressive run: the full model, its snapshot, and how stable the preview was."""
+    model = build_in_memory_model(df_final, config, confirmed_entrances, door_classifications)
+    if model['event_stats'] is None:
+        raise ValueError("incomplete result")
+    snapshot_header = save_snapshot(model, facility, input_hash, column_mapping, config, confirmed_entrances,
+                                    door_classifications)
+    nodes, edges = prepare_cytoscape_elements(model['device_attrs'], model['path_viz'], model['all_paths'])
+    graph_elements = nodes + edges
+    stability = model_stability(preview['device_attrs'], preview['all_paths'], model['device_attrs'], model['all_paths'])
+    print(f"DEBUG: Full model replaces the preview; stability {stability}.")
+    return {
+        'elements': graph_elements,
+        'status_message': f"Graph generated! {stability_summary(stability)}{unavailable_panels_note(model)}" if graph_elements
+        else "Processed, but no graph elements to display.",
+        'stability': stability,
+        # graph-output-container, stats-panels-container and yosai-custom-header
+        'styles': (UI_STYLES['show_block'], UI_STYLES['show_flex_stats'], UI_STYLES['show_block']) if graph_elements
+        else (UI_STYLES['hide'],) * 3,
+        'stats': format_stats_panel(model['event_stats'], model['device_attrs']),
+        'snapshot': {'facility': facility, 'version': snapshot_header['version']}
+        if graph_elements and snapshot_header else None,
+        'stores': index_store_values(model, config, confirmed_entrances, door_classifications)
+        if graph_elements else (None,) * len(_INDEX_STORES),
+    }
+
+
 def register_graph_callbacks(app):
     # Define display names for clarity and consistency within this file
     DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
@@ -78,7 +256,18 @@ def register_graph_callbacks(app):
             Output('stats-unique-tokens-P', 'children'),
             Output('most-active-devices-table-body', 'children'),
             Output('manual-door-classifications-store', 'data', allow_duplicate=True),
-            Output('column-mapping-store', 'data', allow_duplicate=True)
+            Output('column-mapping-store', 'data', allow_duplicate=True),
+            # A generated model replaces whatever live mode was showing, so live mode is switched off.
+            Output('live-tail-toggle', 'value', allow_duplicate=True),
+            Output('model-snapshot-store', 'data'),
+            Output('time-window-store', 'data'),
+            Output('event-index-store', 'data'),
+            Output('journey-index-store', 'data'),
+            Output('door-profile-store', 'data'),
+            Output('traffic-cube-store', 'data'),
+            Output('occupancy-store', 'data'),
+            Output('progressive-job-store', 'data'),
+            Output('progressive-refine-interval', 'disabled')
         ],
         Input('confirm-and-generate-button', 'n_clicks'),
         [
@@ -101,7 +290,7 @@ def register_graph_callbacks(app):
         ],
         prevent_initial_call=True
     )
-    def generate_model_final(n_clicks, file_contents_b64, stored_column_mapping_json, all_door_ids_from_store,
+    def generate_model_final(n_clicks, uploaded_file_key, stored_column_mapping_json, all_doors_store_key,
                              floor_values, floor_ids, is_ee_values, is_ee_ids, is_stair_values, is_stair_ids,
                              security_slider_values, security_slider_ids, num_floors_from_input, manual_map_choice, # ✅ Updated input names
                              csv_headers, existing_saved_classifications_json):
@@ -117,13 +306,16 @@ def register_graph_callbacks(app):
         s_tae, s_er, s_sr, s_dd, s_nd, s_ut = "0", "N/A", "N/A", "0", "0", "0"
         s_adt = []
 
-        if not n_clicks or not file_contents_b64:
-            return graph_elements, "Missing data or button not clicked.", hide_style, hide_style, hide_style, s_tae, s_er, s_sr, s_dd, s_nd, s_ut, s_adt, dash.no_update, stored_column_mapping_json
+        csv_members = resolve_upload_members(uploaded_file_key)
+        if not n_clicks or not csv_members:
+            return graph_elements, "Missing data or button not clicked.", hide_style, hide_style, hide_style, s_tae, s_er, s_sr, s_dd, s_nd, s_ut, s_adt, dash.no_update, stored_column_mapping_json, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
-        if isinstance(existing_saved_classifications_json, str):
-            all_manual_classifications = json.loads(existing_saved_classifications_json)
+        all_door_ids_from_store = load_value(all_doors_store_key)
+        existing_saved_classifications = load_value(existing_saved_classifications_json, namespace='classifications')
+        if isinstance(existing_saved_classifications, str):
+            all_manual_classifications = json.loads(existing_saved_classifications)
         else:
-            all_manual_classifications = existing_saved_classifications_json or {}
+            all_manual_classifications = existing_saved_classifications or {}
 
         current_door_classifications = {}
         confirmed_entrances = []
@@ -166,9 +358,6 @@ def register_graph_callbacks(app):
             status_msg += " Using heuristic for entrances."
 
         try:
-            # Re-decode CSV stream for load_csv_event_log. Each time it's used, a new stream is needed.
-            csv_io_for_loader = decode_uploaded_csv(file_contents_b64)
-            
             if isinstance(stored_column_mapping_json, str):
                 all_column_mappings = json.loads(stored_column_mapping_json)
             else:
@@ -188,8 +377,7 @@ def register_graph_callbacks(app):
                     print("🤖 Stored mapping incomplete, falling back to fuzzy matching")
                 
                 # When fuzzy matching, we need the actual CSV column names to match against
-                temp_csv_io_peek = decode_uploaded_csv(file_contents_b64) # Fresh stream for peeking
-                df_peek_columns = pd.read_csv(temp_csv_io_peek, nrows=0).columns.tolist()
+                df_peek_columns = read_csv_headers(member_opener(csv_members[0]))
                 current_mapping_csv_to_internal = fuzzy_match_columns(df_peek_columns, REQUIRED_INTERNAL_COLUMNS)
                 print("🤖 Fuzzy Mapping Used (CSV Header -> Internal Key):", current_mapping_csv_to_internal)
 
@@ -214,72 +402,120 @@ def register_graph_callbacks(app):
 
             print(f"Mapping passed to load_csv_event_log (CSV Header -> Display Name): {mapping_for_loader_csv_to_display}")
 
-            df_final = load_csv_event_log(csv_io_for_loader, mapping_for_loader_csv_to_display)
-
-            if df_final is None:
-                raise ValueError(
-                    "Failed to load CSV for final processing. The `load_csv_event_log` function returned None. "
-                    "This strongly suggests an issue within `load_csv_event_log` itself, "
-                    "likely due to it not finding expected display-named columns after applying the mapping. "
-                    "Consider inspecting the `load_csv_event_log` function in `data_io/csv_loader.py`."
-                )
-
-            # --- Final Validation ---
-            missing_display_columns_in_final_df = [
-                display_name for internal_key, display_name in REQUIRED_INTERNAL_COLUMNS.items()
-                if display_name not in df_final.columns
-            ]
-
-            if missing_display_columns_in_final_df:
-                raise ValueError(
-                    f"Final DataFrame is missing critical display columns AFTER `load_csv_event_log` processing: "
-                    f"{', '.join(missing_display_columns_in_final_df)}. "
-                    f"Current DataFrame columns: {df_final.columns.tolist()}. "
-                    f"This indicates that `load_csv_event_log` did not correctly rename columns to display names."
-                )
-
-            # --- Data Processing and Model Generation (using df_final) ---
             config = GRAPH_PROCESSING_CONFIG.copy()
             # ✅ Use num_floors_from_input
             config['num_floors'] = num_floors_from_input or GRAPH_PROCESSING_CONFIG['num_floors']
 
-            enriched_df, device_attrs, path_viz, all_paths = run_onion_model_processing(
-                df_final.copy(), # Pass df_final (with display names) to run_onion_model_processing
-                config,
-                confirmed_official_entrances=confirmed_entrances,
-                detailed_door_classifications=current_door_classifications
-            )
+            # Uploads above OUT_OF_CORE_CONFIG['min_rows'] (row count known from the upload prescan) are never
+            # loaded whole: they are streamed in chunks, partitioned by user on disk and reduced to aggregates.
+            prescan = get_session_store('prescan').get(uploaded_file_key) or {}
+            use_out_of_core = prescan.get('row_count', 0) >= OUT_OF_CORE_CONFIG['min_rows']
+
+            # Reopening the same export with the same mapping, config and classifications loads the saved
+            # snapshot instead of running the pipeline again. The input is keyed on the files' full content
+            # (member_files_key), hashed once per file and process.
+            facility = facility_for_headers(csv_headers or read_csv_headers(member_opener(csv_members[0])))
+            input_hash = member_files_key(csv_members)
+            snapshot = load_model_snapshot(facility, fingerprint=model_fingerprint(
+                input_hash, mapping_for_loader_csv_to_display, config, confirmed_entrances, current_door_classifications))
+
+            model = None
+            preview_job_key = None
+            if snapshot is not None:
+                print(f"DEBUG: Loaded model snapshot v{snapshot['header']['version']} of '{facility}'; pipeline skipped.")
+                model = dict(_EMPTY_INDEXES, device_attrs=snapshot['device_attributes'], path_viz=snapshot['path_viz'],
+                             all_paths=snapshot['all_paths'], event_stats=snapshot['summary_stats'],
+                             temporal_index=snapshot['temporal_index'], door_profiles=snapshot['door_profiles'],
+                             traffic_cube=snapshot['traffic_cube'], occupancy=snapshot['occupancy'])
+            elif use_out_of_core:
+                print(f"DEBUG: {prescan['row_count']:,} rows uploaded; using out-of-core processing.")
+                # Each chunk is also appended to the facility's event store dataset as it streams past.
+                aggregates, device_attrs, path_viz, all_paths, indexes = run_out_of_core_processing(
+                    record_event_chunks(iter_member_event_chunks(csv_members, mapping_for_loader_csv_to_display,
+                                                                 chunk_rows=OUT_OF_CORE_CONFIG['chunk_rows']),
+                                        facility),
+                    config,
+                    confirmed_official_entrances=confirmed_entrances,
+                    detailed_door_classifications=current_door_classifications,
+                    with_indexes=True
+                )
+                model = dict(_EMPTY_INDEXES, device_attrs=device_attrs, path_viz=path_viz, all_paths=all_paths,
+                             event_stats=aggregate_summary_stats(aggregates) if aggregates['event_count'] else None,
+                             **indexes)
+            else:
+                # The uploaded files live in the server-side session store; each one (or each zip member)
+                # is streamed from disk and parsed in its own process, then merged in timestamp order.
+                df_final = load_event_members(csv_members, mapping_for_loader_csv_to_display)
+
+                if df_final is None:
+                    raise ValueError(
+                        "Failed to load CSV for final processing. The `load_csv_event_log` function returned None. "
+                        "This strongly suggests an issue within `load_csv_event_log` itself, "
+                        "likely due to it not finding expected display-named columns after applying the mapping. "
+                        "Consider inspecting the `load_csv_event_log` function in `data_io/csv_loader.py`."
+                    )
+
+                # --- Final Validation ---
+                missing_display_columns_in_final_df = [
+                    display_name for internal_key, display_name in REQUIRED_INTERNAL_COLUMNS.items()
+                    if display_name not in df_final.columns
+                ]
+
+                if missing_display_columns_in_final_df:
+                    raise ValueError(
+                        f"Final DataFrame is missing critical display columns AFTER `load_csv_event_log` processing: "
+                        f"{', '.join(missing_display_columns_in_final_df)}. "
+                        f"Current DataFrame columns: {df_final.columns.tolist()}. "
+                        f"This indicates that `load_csv_event_log` did not correctly rename columns to display names."
+                    )
+
+                # Loaded events are kept in the facility's event store dataset (stored events are skipped).
+                record_events(df_final, facility)
+
+                # --- Data Processing and Model Generation (using df_final) ---
+                if len(df_final) >= PROGRESSIVE_CONFIG['min_rows']:
+                    # Large frames: a model of a stratified sample of people is shown first, and the full
+                    # model (with its indexes and snapshot) replaces it when the background run finishes.
+                    sample_df = df_final[stratified_user_sample(df_final)]
+                    _, device_attrs, path_viz, all_paths = run_onion_model_processing(
+                        sample_df.copy(),
+                        config,
+                        confirmed_official_entrances=confirmed_entrances,
+                        detailed_door_classifications=current_door_classifications
+                    )
+                    model = dict(_EMPTY_INDEXES, device_attrs=device_attrs, path_viz=path_viz, all_paths=all_paths,
+                                 event_stats=None)
+                    preview_job_key = submit_refinement(
+                        refine_full_model, df_final, model, facility, input_hash, mapping_for_loader_csv_to_display,
+                        config, confirmed_entrances, current_door_classifications)
+                    preview_users = (sample_df[USERID_COL_DISPLAY].nunique(), df_final[USERID_COL_DISPLAY].nunique())
+                    print(f"DEBUG: Preview from {preview_users[0]:,} of {preview_users[1]:,} people; refining in the background.")
+                else:
+                    model = build_in_memory_model(df_final, config, confirmed_entrances, current_door_classifications)
 
-            if enriched_df is not None:
-                nodes, edges = prepare_cytoscape_elements(device_attrs, path_viz, all_paths)
+            snapshot_header = None
+            if preview_job_key is not None:
+                nodes, edges = prepare_cytoscape_elements(model['device_attrs'], model['path_viz'], model['all_paths'])
                 graph_elements = nodes + edges
                 current_yosai_style = show_style if graph_elements else hide_style
-                status_msg = "Graph generated!" if graph_elements else "Processed, but no graph elements to display."
-                s_tae = f"{len(df_final):,}" 
-
-                # --- Update stats calculations to use display names ---
-                if not enriched_df.empty and TIMESTAMP_COL_DISPLAY in enriched_df.columns:
-                    if not pd.api.types.is_datetime64_any_dtype(enriched_df[TIMESTAMP_COL_DISPLAY]):
-                        enriched_df[TIMESTAMP_COL_DISPLAY] = pd.to_datetime(enriched_df[TIMESTAMP_COL_DISPLAY], errors='coerce')
-
-                    min_d, max_d = enriched_df[TIMESTAMP_COL_DISPLAY].min(), enriched_df[TIMESTAMP_COL_DISPLAY].max()
-                    s_er = f"{min_d.strftime('%d.%m.%Y')} - {max_d.strftime('%d.%m.%Y')}" if pd.notna(min_d) and pd.notna(max_d) else "N/A"
-                    s_sr = f"Date range: {s_er}"
-                    
-                    s_dd = f"Days: {enriched_df[TIMESTAMP_COL_DISPLAY].dt.date.nunique()}"
-                    
-                    if USERID_COL_DISPLAY in enriched_df.columns:
-                        s_ut = f"Tokens: {enriched_df[USERID_COL_DISPLAY].nunique()}"
-                    
-                    if DOORID_COL_DISPLAY in enriched_df.columns:
-                        s_adt = [html.Tr([html.Td(d), html.Td(f"{c:,}", style={'textAlign': 'right'})])
-                                 for d, c in enriched_df[DOORID_COL_DISPLAY].value_counts().nlargest(5).items()]
+                status_msg = (f"Preview from {preview_users[0]:,} of {preview_users[1]:,} people; building the full model..."
+                              if graph_elements else "Preview has no graph elements; building the full model...")
 
-                if device_attrs is not None and DOORID_COL_DISPLAY in device_attrs.columns:
-                    s_nd = f"Devices: {device_attrs[DOORID_COL_DISPLAY].nunique()}"
-
-                if not s_adt:
-                    s_adt = [html.Tr([html.Td("N/A", colSpan=2)])]
+            elif model['event_stats'] is not None:
+                if snapshot is None:
+                    snapshot_header = save_snapshot(model, facility, input_hash, mapping_for_loader_csv_to_display,
+                                                    config, confirmed_entrances, current_door_classifications)
+                else:
+                    snapshot_header = snapshot['header']
+                nodes, edges = prepare_cytoscape_elements(model['device_attrs'], model['path_viz'], model['all_paths'])
+                graph_elements = nodes + edges
+                current_yosai_style = show_style if graph_elements else hide_style
+                status_msg = "Graph generated!" if graph_elements else "Processed, but no graph elements to display."
+                if snapshot is not None and graph_elements:
+                    status_msg = f"Graph loaded from saved model v{snapshot_header['version']} ({snapshot_header['created']})."
+                if graph_elements:
+                    status_msg += unavailable_panels_note(model)
+                s_tae, s_er, s_sr, s_dd, s_nd, s_ut, s_adt = format_stats_panel(model['event_stats'], model['device_attrs'])
 
             else:
                 status_msg = "Error in processing: incomplete result."
@@ -287,11 +523,19 @@ def register_graph_callbacks(app):
             return (
                 graph_elements, status_msg,
                 show_style if graph_elements else hide_style,
-                show_stats_style if graph_elements else hide_style,
+                show_stats_style if graph_elements and preview_job_key is None else hide_style,
                 current_yosai_style,
                 s_tae, s_er, s_sr, s_dd, s_nd, s_ut, s_adt,
-                json.dumps(all_manual_classifications) if all_manual_classifications else dash.no_update,
-                stored_column_mapping_json
+                store_value(all_manual_classifications, namespace='classifications',
+                            key=existing_saved_classifications_json if is_session_key(existing_saved_classifications_json) else None)
+                if all_manual_classifications else dash.no_update,
+                stored_column_mapping_json,
+                [],
+                {'facility': facility, 'version': snapshot_header['version']} if graph_elements and snapshot_header else None,
+                *(index_store_values(model, config, confirmed_entrances, current_door_classifications)
+                  if graph_elements else (None,) * len(_INDEX_STORES)),
+                preview_job_key,
+                preview_job_key is None
             )
 
         except Exception as e:
@@ -300,7 +544,7 @@ def register_graph_callbacks(app):
                 [], f"Error: {str(e)}",
                 hide_style, hide_style, hide_style,
                 s_tae, s_er, s_sr, s_dd, s_nd, s_ut, s_adt,
-                dash.no_update, stored_column_mapping_json
+                dash.no_update, stored_column_mapping_json, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, None, True
             )
 
     @app.callback(
@@ -314,9 +558,10 @@ def register_graph_callbacks(app):
 
     @app.callback(
         Output('tap-node-data-output', 'children'),
-        Input('onion-graph', 'tapNodeData')
+        Input('onion-graph', 'tapNodeData'),
+        State('door-profile-store', 'data')
     )
-    def display_tap_node_data_final(data):
+    def display_tap_node_data_final(data, door_profile_key):
         if data and not data.get('is_layer_parent'):
             details = [f"Tapped: {data.get('label', data.get('id'))}"]
             if 'layer' in data:
@@ -329,7 +574,11 @@ def register_graph_callbacks(app):
                 details.append("Type: Staircase")
             if 'security_level' in data:
                 details.append(f"Security: {data['security_level']}" )
-            return " | ".join(details)
+            door_profiles = load_index_value(door_profile_key)
+            profile = door_profiles.profile(data.get('id')) if door_profiles is not None else None
+            if profile is None:
+                return " | ".join(details)
+            return "\n".join([" | ".join(details)] + format_door_profile(profile))
         return "Upload CSV, map headers, (optionally classify doors), then Confirm & Generate. Tap a node for its details."
 
     # --- NEW CALLBACK TO GENERATE DOOR CLASSIFICATION TABLE CONTENT ---
@@ -340,10 +589,10 @@ def register_graph_callbacks(app):
             Input('manual-map-toggle', 'value'),            # Trigger when user selects Yes/No for manual map
             Input('num-floors-input', 'value'),             # Trigger when num floors changes
             Input('top-n-entrances-input', 'value'),        # If 'show more' influences displayed doors
-            Input('show-more-entrances-button', 'n_clicks') # Explicit button click for "show more"
+            Input('show-more-entrances-button', 'n_clicks'), # Explicit button click for "show more"
+            Input('all-doors-from-csv-store', 'data')       # Key of the door list (refreshed when the mapping is confirmed)
         ],
         [
-            State('all-doors-from-csv-store', 'data'),      # List of all doors extracted
             State('manual-door-classifications-store', 'data'), # Existing classifications
             State('current-entrance-offset-store', 'data'), # For pagination/show more (currently unused)
             State('ranked-doors-store', 'data')              # If you have pre-ranked doors for suggestions (currently unused)
@@ -352,8 +601,11 @@ def register_graph_callbacks(app):
     )
     def generate_door_classification_table_content(
         n_clicks_confirm_map, manual_map_choice, num_floors, top_n_entrances, n_clicks_show_more_button,
-        all_doors_from_store_data, existing_saved_classifications, current_offset_unused_yet, ranked_doors_unused_yet
+        all_doors_store_key, existing_saved_classifications_key, current_offset_unused_yet, ranked_doors_unused_yet
     ):
+        all_doors_from_store_data = load_value(all_doors_store_key)
+        existing_saved_classifications = load_value(existing_saved_classifications_key, namespace='classifications')
+
         # Only generate if manual mapping is chosen and there are doors
         if manual_map_choice != 'yes' or not all_doors_from_store_data:
             print("DEBUG: Not in manual mode or no doors available for classification table.")
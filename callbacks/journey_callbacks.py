@@ -0,0 +1,127 @@
+import json
+
+from dash import Input, Output, State
+
+from data_io.session_store import load_index_value
+from processing.path_mining import frequent_routes
+from styles.graph_styles import (actual_default_stylesheet_for_graph, journey_node_style, journey_edge_style,
+                                 journey_dimmed_style)
+
+_JOURNEY_CONTROLS_STYLE = {'display': 'block', 'marginBottom': '10px'}
+
+
+def _quoted(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def journey_stylesheet(doors, transitions):
+    """Default stylesheet with the journey's doors and moves highlighted and everything else dimmed."""
+    stylesheet = list(actual_default_stylesheet_for_graph)
+    stylesheet.append({'selector': 'node[!is_layer_parent], edge', 'style': journey_dimmed_style})
+    for door in dict.fromkeys(doors):
+        stylesheet.append({'selector': f"node[id = {_quoted(door)}]", 'style': {**journey_node_style, 'opacity': 1}})
+    for source, target in dict.fromkeys(transitions):
+        stylesheet.append({'selector': f"edge[source = {_quoted(source)}][target = {_quoted(target)}]",
+                           'style': {**journey_edge_style, 'opacity': 1}})
+    return stylesheet
+
+
+def register_journey_callbacks(app):
+
+    @app.callback(
+        [
+            Output('journey-controls', 'style'),
+            Output('journey-user', 'value')
+        ],
+        Input('journey-index-store', 'data')
+    )
+    def configure_journey_controls(journey_index_key):
+        journey_index = load_index_value(journey_index_key)
+        if journey_index is None:
+            return {'display': 'none'}, None
+        return _JOURNEY_CONTROLS_STYLE, None
+
+    @app.callback(
+        Output('journey-user', 'options'),
+        [
+            Input('journey-user', 'search_value'),
+            Input('journey-index-store', 'data')
+        ],
+        State('journey-user', 'value')
+    )
+    def search_journey_users(search_value, journey_index_key, user):
+        """Only the users matching the typed prefix are sent to the browser, not the whole user list."""
+        journey_index = load_index_value(journey_index_key)
+        if journey_index is None:
+            return []
+        matches = journey_index.users_with_prefix(search_value)
+        # The selected user stays among the options, or the dropdown would clear it.
+        if user is not None and user not in matches and user in journey_index:
+            matches.insert(0, user)
+        return matches
+
+    @app.callback(
+        [
+            Output('journey-day', 'options'),
+            Output('journey-day', 'value')
+        ],
+        Input('journey-user', 'value'),
+        State('journey-index-store', 'data'),
+        prevent_initial_call=True
+    )
+    def list_journey_days(user, journey_index_key):
+        journey_index = load_index_value(journey_index_key)
+        if journey_index is None or user is None:
+            return [], None
+        return [{'label': day.strftime('%d.%m.%Y'), 'value': day.isoformat()} for day in journey_index.journey_days(user)], None
+
+    @app.callback(
+        [
+            Output('onion-graph', 'stylesheet', allow_duplicate=True),
+            Output('journey-status', 'children')
+        ],
+        [
+            Input('journey-user', 'value'),
+            Input('journey-day', 'value')
+        ],
+        State('journey-index-store', 'data'),
+        prevent_initial_call=True
+    )
+    def highlight_journey(user, day, journey_index_key):
+        journey_index = load_index_value(journey_index_key)
+        if journey_index is None or user is None:
+            return actual_default_stylesheet_for_graph, ""
+        journey = journey_index.journey(user, day)
+        if journey.empty:
+            return actual_default_stylesheet_for_graph, f"No events for {user} on the selected day."
+        doors = journey.iloc[:, 1].tolist()
+        transitions = journey_index.journey_transitions(user, day)
+        path_preview = " → ".join(doors[:8]) + (" → …" if len(doors) > 8 else "")
+        status = f"{user}: {len(journey):,} events, {len(set(doors))} doors. {path_preview}"
+        return journey_stylesheet(doors, transitions), status
+
+    @app.callback(
+        [
+            Output('frequent-route', 'options'),
+            Output('frequent-route', 'value')
+        ],
+        Input('journey-index-store', 'data')
+    )
+    def list_frequent_routes(journey_index_key):
+        routes = frequent_routes(load_index_value(journey_index_key))
+        return [{'label': f"{' → '.join(row.Route)} ({row.Support:,} person-days)", 'value': json.dumps(list(row.Route))}
+                for row in routes.itertuples()], None
+
+    @app.callback(
+        [
+            Output('onion-graph', 'stylesheet', allow_duplicate=True),
+            Output('frequent-route-status', 'children')
+        ],
+        Input('frequent-route', 'value'),
+        prevent_initial_call=True
+    )
+    def highlight_frequent_route(route_value):
+        if not route_value:
+            return actual_default_stylesheet_for_graph, ""
+        doors = json.loads(route_value)
+        return journey_stylesheet(doors, zip(doors[:-1], doors[1:])), f"Route of {len(doors)} doors: {' → '.join(doors)}"
@@ -0,0 +1,117 @@
+import dash
+from dash import Input, Output, State, Patch
+import json
+
+from processing.graph_config import GRAPH_PROCESSING_CONFIG, UI_STYLES
+from data_io.live_tail import LIVE_TAIL_CONFIG, CsvTailFollower
+from data_io.session_store import load_value
+from processing.live_model import get_live_session, find_live_session, release_live_session, diff_elements
+from callbacks.graph_callbacks import fuzzy_match_columns
+from constants.constants import REQUIRED_INTERNAL_COLUMNS
+
+
+def _live_display_mapping(headers, stored_column_mapping_json):
+    """CSV header -> display name for the live log, from the saved mapping for its headers or fuzzy matching."""
+    if isinstance(stored_column_mapping_json, str):
+        all_column_mappings = json.loads(stored_column_mapping_json)
+    else:
+        all_column_mappings = stored_column_mapping_json or {}
+    stored_map = all_column_mappings.get(json.dumps(sorted(headers)))
+    if not (isinstance(stored_map, dict) and set(stored_map.values()) >= set(REQUIRED_INTERNAL_COLUMNS.keys())):
+        stored_map = fuzzy_match_columns(headers, REQUIRED_INTERNAL_COLUMNS)
+    mapping = {csv_col: REQUIRED_INTERNAL_COLUMNS[key] for csv_col, key in stored_map.items() if key in REQUIRED_INTERNAL_COLUMNS}
+    if set(mapping.values()) != set(REQUIRED_INTERNAL_COLUMNS.values()):
+        return None
+    return mapping
+
+
+def register_live_callbacks(app):
+
+    @app.callback(
+        [
+            Output('live-tail-interval', 'disabled'),
+            Output('live-tail-store', 'data'),
+            Output('live-tail-status', 'children')
+        ],
+        Input('live-tail-toggle', 'value'),
+        [
+            State('column-mapping-store', 'data'),
+            State('manual-door-classifications-store', 'data'),
+            State('num-floors-input', 'value'),
+            State('live-tail-store', 'data')
+        ],
+        prevent_initial_call=True
+    )
+    def toggle_live_mode(toggle_value, stored_column_mapping_json, saved_classifications_key, num_floors, live_store):
+        # This client's previous session (toggle off, or settings changed) no longer needs its follower thread.
+        # On success it is released after the new session is taken, so an unchanged session keeps running.
+        previous_session_id = (live_store or {}).get('session_id')
+
+        def live_off(message):
+            if previous_session_id:
+                release_live_session(previous_session_id)
+            return True, None, message
+
+        if 'live' not in (toggle_value or []):
+            return live_off("Live mode off.")
+        source = LIVE_TAIL_CONFIG['source']
+        if not source:
+            return live_off("Live mode is not configured on this server (set YOSAI_LIVE_TAIL_SOURCE).")
+
+        headers = CsvTailFollower(source).read_header()
+        if not headers:
+            return live_off("No CSV log found at the live source yet.")
+        column_mapping = _live_display_mapping(headers, stored_column_mapping_json)
+        if column_mapping is None:
+            return live_off("Live log columns could not be mapped. Upload one export of it and confirm the mapping first.")
+
+        # Saved door classifications for this header set (from Step 3) also apply to the live model.
+        saved_classifications = load_value(saved_classifications_key, namespace='classifications')
+        if isinstance(saved_classifications, str):
+            saved_classifications = json.loads(saved_classifications)
+        door_classifications = (saved_classifications or {}).get(json.dumps(sorted(headers))) or None
+        confirmed_entrances = [door for door, info in (door_classifications or {}).items() if info.get('is_ee')] or None
+
+        config = GRAPH_PROCESSING_CONFIG.copy()
+        config['num_floors'] = num_floors or GRAPH_PROCESSING_CONFIG['num_floors']
+        session = get_live_session(source, column_mapping, config,
+                                   confirmed_official_entrances=confirmed_entrances,
+                                   detailed_door_classifications=door_classifications)
+        if previous_session_id:
+            release_live_session(previous_session_id)
+        return False, {'session_id': session.session_id, 'version': None}, "Live mode on. Waiting for events..."
+
+    @app.callback(
+        [
+            Output('onion-graph', 'elements', allow_duplicate=True),
+            Output('live-tail-status', 'children', allow_duplicate=True),
+            Output('live-tail-store', 'data', allow_duplicate=True),
+            Output('graph-output-container', 'style', allow_duplicate=True)
+        ],
+        Input('live-tail-interval', 'n_intervals'),
+        State('live-tail-store', 'data'),
+        prevent_initial_call=True
+    )
+    def push_live_updates(n_intervals, live_store):
+        session = find_live_session((live_store or {}).get('session_id'))
+        if session is None:
+            return dash.no_update, "Live session is not running.", dash.no_update, dash.no_update
+
+        snapshot = session.snapshot()
+        client_version = live_store.get('version')
+        if snapshot['version'] == 0 or snapshot['version'] == client_version:
+            return dash.no_update, snapshot['status'], dash.no_update, dash.no_update
+
+        # The client holds the previous version: send only the elements that changed.
+        changes = None
+        if client_version is not None and client_version == snapshot['previous_version']:
+            changes = diff_elements(snapshot['previous_elements'], snapshot['elements'])
+        if changes is not None:
+            elements_update = Patch()
+            for index, element in changes.items():
+                elements_update[index] = element
+        else:
+            elements_update = snapshot['elements']
+
+        return (elements_update, snapshot['status'], dict(live_store, version=snapshot['version']),
+                UI_STYLES['show_block'])
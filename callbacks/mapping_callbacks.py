@@ -1,6 +1,9 @@
 from dash import Input, Output, State, html, dcc, no_update
 from dash.dependencies import ALL
 import json
+from data_io.session_store import get_session_store, store_value
+from data_io.csv_prescan import scan_door_column
+from data_io.ingest import resolve_upload_members, member_opener
 
 def register_mapping_callbacks(app):
     @app.callback(
@@ -10,17 +13,19 @@ def register_mapping_callbacks(app):
             Output('column-mapping-store', 'data'),
             Output('processing-status', 'children', allow_duplicate=True),
             Output('confirm-header-map-button', 'style', allow_duplicate=True),
+            Output('all-doors-from-csv-store', 'data', allow_duplicate=True),
         ],
         Input('confirm-header-map-button', 'n_clicks'),
         [
             State({'type': 'mapping-dropdown', 'index': ALL}, 'value'),
             State({'type': 'mapping-dropdown', 'index': ALL}, 'id'),
             State('csv-headers-store', 'data'),
-            State('column-mapping-store', 'data')
+            State('column-mapping-store', 'data'),
+            State('uploaded-file-store', 'data')
         ],
         prevent_initial_call=True
     )
-    def show_manual_classification_options(n_clicks, values, ids, csv_headers, existing_json):
+    def show_manual_classification_options(n_clicks, values, ids, csv_headers, existing_json, uploaded_file_key):
         if not n_clicks:
             return no_update
 
@@ -39,6 +44,19 @@ def register_mapping_callbacks(app):
         header_key = json.dumps(sorted(csv_headers))
         updated_mappings[header_key] = mapping
 
+        # The upload prescan only knew the door column if a mapping was saved for these headers.
+        # Stream just the confirmed DoorID column now if it differs from what was prescanned.
+        all_doors_output = no_update
+        door_column = next((csv_h for csv_h, internal_k in mapping.items() if internal_k == 'DoorID'), None)
+        prescan = get_session_store('prescan').get(uploaded_file_key) or {}
+        csv_members = resolve_upload_members(uploaded_file_key)
+        if door_column and csv_members and door_column != prescan.get('door_column'):
+            doors, row_count = scan_door_column([member_opener(member) for member in csv_members], door_column)
+            print(f"DEBUG: Rescanned door column '{door_column}': {len(doors)} unique doors in {row_count:,} rows.")
+            all_doors_output = store_value(doors)
+            if prescan:
+                prescan.update({'door_column': door_column, 'doors': doors})
+                get_session_store('prescan').put(prescan, key=uploaded_file_key)
 
 
         return (
@@ -46,7 +64,8 @@ def register_mapping_callbacks(app):
             {'display': 'block', 'width': '95%', 'margin': '0 auto', 'paddingLeft': '15px', 'boxSizing': 'border-box', 'textAlign': 'center'}, # ✅ Show and center entrance classification UI (dbc.Container)
             updated_mappings,                     # Save updated mappings
             "Step 2: Set Classification Options", # Update status message
-            {'display': 'none'}                   # Hide confirm button again
+            {'display': 'none'},                  # Hide confirm button again
+            all_doors_output                      # Door list for the confirmed DoorID column
         )
 
     @app.callback(
@@ -0,0 +1,53 @@
+from dash import Input, Output
+
+from data_io.session_store import load_index_value
+from processing.occupancy import OCCUPANCY_CONFIG
+from callbacks.traffic_callbacks import dark_figure, EMPTY_FIGURE
+
+_OCCUPANCY_CONTAINER_STYLE = {'display': 'block', 'width': '90%', 'margin': '20px auto', 'padding': '15px'}
+
+
+def occupancy_figure(occupancy, view, start=None, end=None):
+    """(figure, summary) of the per-layer occupancy time series or the dwell-time distributions."""
+    if view == 'dwell':
+        edges = OCCUPANCY_CONFIG['dwell_bin_edges_minutes']
+        labels = [f"{low}-{high} min" for low, high in zip(edges[:-1], edges[1:])] + [f"{edges[-1]}+ min"]
+        traces = [{'type': 'bar', 'name': f"Layer {layer}", 'x': labels,
+                   'y': occupancy.dwell_histogram(layer).tolist()} for layer in occupancy.layers]
+        figure = dark_figure(traces, "Time spent in the layer", "Stays")
+        summary = occupancy.dwell_summary()
+        return figure, "Median stay: " + ", ".join(
+            f"layer {row.Layer} {row.MedianMinutes:.0f} min ({row.Stays:,} stays, p90 {row.P90Minutes:.0f} min)"
+            for row in summary.itertuples())
+
+    series = occupancy.occupancy_series(start, end)
+    traces = [{'type': 'scatter', 'mode': 'lines', 'line': {'shape': 'hv'}, 'name': f"Layer {layer}",
+               'x': series.index.strftime('%Y-%m-%d %H:%M').tolist(), 'y': series[layer].tolist()}
+              for layer in series.columns]
+    figure = dark_figure(traces, "Time", "People present")
+    peaks = occupancy.peak_occupancy()
+    return figure, "Peak occupancy: " + ", ".join(
+        f"layer {layer} {people:,} at {moment.strftime('%d.%m.%Y %H:%M')}" for layer, (people, moment) in peaks.items())
+
+
+def register_occupancy_callbacks(app):
+
+    @app.callback(
+        [
+            Output('occupancy-container', 'style'),
+            Output('occupancy-graph', 'figure'),
+            Output('occupancy-summary', 'children')
+        ],
+        [
+            Input('occupancy-store', 'data'),
+            Input('occupancy-view', 'value'),
+            Input('model-date-range', 'start_date'),
+            Input('model-date-range', 'end_date')
+        ]
+    )
+    def show_occupancy(occupancy_key, view, start_date, end_date):
+        occupancy = load_index_value(occupancy_key)
+        if occupancy is None or not len(occupancy):
+            return {'display': 'none'}, EMPTY_FIGURE, ""
+        start, end = (start_date[:10], end_date[:10]) if start_date and end_date else (None, None)
+        return (_OCCUPANCY_CONTAINER_STYLE,) + occupancy_figure(occupancy, view, start, end)
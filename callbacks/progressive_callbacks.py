@@ -0,0 +1,125 @@
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import dash
+from dash import Input, Output, State
+
+from data_io.session_store import get_session_store
+from processing.progressive import PROGRESSIVE_CONFIG
+
+# Full-model refinements of progressive previews run on a thread pool of the process that received the
+# Generate click. The job record (status, then the result) is written to the disk session store, so any
+# server worker can answer the poll, but only that process can finish the job. While a job is queued or
+# running its process refreshes the record's heartbeat; the poll fails jobs whose heartbeat stopped
+# (the process died or restarted) or that ran past PROGRESSIVE_CONFIG['max_job_seconds'].
+_REFINEMENT_NAMESPACE = 'progressive'
+_EXECUTOR = None
+_EXECUTOR_GUARD = threading.Lock()
+_ACTIVE_JOBS = set()            # job keys queued or running in this process
+_HEARTBEAT_THREAD = None
+# Held around every write of a job record, so a heartbeat never overwrites a finished job.
+_JOBS_GUARD = threading.Lock()
+
+
+def _executor():
+    global _EXECUTOR, _HEARTBEAT_THREAD
+    with _EXECUTOR_GUARD:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-refinement')
+        if _HEARTBEAT_THREAD is None:
+            _HEARTBEAT_THREAD = threading.Thread(target=_beat_heartbeats, name='model-refinement-heartbeat', daemon=True)
+            _HEARTBEAT_THREAD.start()
+        return _EXECUTOR
+
+
+def _beat_heartbeats():
+    store = get_session_store(_REFINEMENT_NAMESPACE)
+    while True:
+        time.sleep(PROGRESSIVE_CONFIG['heartbeat_seconds'])
+        with _JOBS_GUARD:
+            for job_key in list(_ACTIVE_JOBS):
+                job = store.get(job_key)
+                if job is not None and job['status'] == 'running':
+                    store.put(dict(job, heartbeat=time.time()), key=job_key)
+
+
+def _finish_job(job_key, job):
+    with _JOBS_GUARD:
+        _ACTIVE_JOBS.discard(job_key)
+        get_session_store(_REFINEMENT_NAMESPACE).put(job, key=job_key)
+
+
+def _run_refinement(job_key, refine, args):
+    try:
+        _finish_job(job_key, dict(refine(*args), status='done'))
+    except Exception as e:
+        traceback.print_exc()
+        _finish_job(job_key, {'status': 'failed', 'error': str(e)})
+
+
+def submit_refinement(refine, *args):
+    """Runs `refine(*args)` (returning a dict of callback outputs) in the background; returns the job key."""
+    now = time.time()
+    with _JOBS_GUARD:
+        job_key = get_session_store(_REFINEMENT_NAMESPACE).put({'status': 'running', 'submitted': now, 'heartbeat': now})
+        _ACTIVE_JOBS.add(job_key)
+    _executor().submit(_run_refinement, job_key, refine, args)
+    return job_key
+
+
+def stale_job_error(job, now=None):
+    """Why a 'running' job record is considered lost, or None while it is still alive."""
+    now = time.time() if now is None else now
+    if now - job.get('heartbeat', 0) > PROGRESSIVE_CONFIG['stale_after_seconds']:
+        return "the background run stopped (the server process may have restarted)"
+    if now - job.get('submitted', 0) > PROGRESSIVE_CONFIG['max_job_seconds']:
+        return f"the background run did not finish within {PROGRESSIVE_CONFIG['max_job_seconds'] // 60} minutes"
+    return None
+
+
+def register_progressive_callbacks(app):
+
+    @app.callback(
+        [
+            Output('onion-graph', 'elements', allow_duplicate=True),
+            Output('processing-status', 'children', allow_duplicate=True),
+            Output('graph-output-container', 'style', allow_duplicate=True),
+            Output('stats-panels-container', 'style', allow_duplicate=True),
+            Output('yosai-custom-header', 'style', allow_duplicate=True),
+            Output('total-access-events-H1', 'children', allow_duplicate=True),
+            Output('event-date-range-P', 'children', allow_duplicate=True),
+            Output('stats-date-range-P', 'children', allow_duplicate=True),
+            Output('stats-days-with-data-P', 'children', allow_duplicate=True),
+            Output('stats-num-devices-P', 'children', allow_duplicate=True),
+            Output('stats-unique-tokens-P', 'children', allow_duplicate=True),
+            Output('most-active-devices-table-body', 'children', allow_duplicate=True),
+            Output('model-snapshot-store', 'data', allow_duplicate=True),
+            Output('time-window-store', 'data', allow_duplicate=True),
+            Output('event-index-store', 'data', allow_duplicate=True),
+            Output('journey-index-store', 'data', allow_duplicate=True),
+            Output('door-profile-store', 'data', allow_duplicate=True),
+            Output('traffic-cube-store', 'data', allow_duplicate=True),
+            Output('occupancy-store', 'data', allow_duplicate=True),
+            Output('progressive-refine-interval', 'disabled', allow_duplicate=True)
+        ],
+        Input('progressive-refine-interval', 'n_intervals'),
+        State('progressive-job-store', 'data'),
+        prevent_initial_call=True
+    )
+    def show_refined_model(n_intervals, job_key):
+        store = get_session_store(_REFINEMENT_NAMESPACE)
+        job = store.get(job_key) if job_key else None
+        if job is not None and job['status'] == 'running':
+            error = stale_job_error(job)
+            if error is None:
+                return [dash.no_update] * 20
+            job = {'status': 'failed', 'error': error}
+            with _JOBS_GUARD:
+                _ACTIVE_JOBS.discard(job_key)
+                store.put(job, key=job_key)
+        if job is None or job['status'] == 'failed':
+            error = job['error'] if job else "refinement job not found"
+            return [dash.no_update, f"Preview shown; the full model could not be built: {error}"] + [dash.no_update] * 17 + [True]
+        return [job['elements'], job['status_message'], *job['styles'], *job['stats'], job['snapshot'], *job['stores'], True]
@@ -0,0 +1,89 @@
+from dash import Input, Output
+
+from data_io.session_store import load_index_value
+from processing.traffic_cube import TRAFFIC_CUBE_CONFIG
+from styles.style_config import COLORS
+
+_TRAFFIC_CONTAINER_STYLE = {'display': 'block', 'width': '90%', 'margin': '20px auto', 'padding': '15px',
+                            'backgroundColor': COLORS['surface'], 'borderRadius': '8px'}
+_HOUR_LABELS = [f"{hour:02d}:00" for hour in range(24)]
+EMPTY_FIGURE = {'data': [], 'layout': {}}
+
+
+def dark_figure(traces, x_title, y_title):
+    """Plain-dict Plotly figure in the app's dark theme."""
+    return {
+        'data': traces,
+        'layout': {
+            'paper_bgcolor': COLORS['surface'], 'plot_bgcolor': COLORS['surface'],
+            'font': {'color': COLORS['text_light']},
+            'margin': {'l': 120, 'r': 20, 't': 20, 'b': 50},
+            'xaxis': {'title': {'text': x_title}},
+            'yaxis': {'title': {'text': y_title}, 'autorange': 'reversed' if traces and traces[0]['type'] == 'heatmap' else True},
+        },
+    }
+
+
+def traffic_figure(cube, view, doors=None, layers=None, floors=None, start=None, end=None):
+    """(figure, peak-hour summary) of one heatmap/peak-hour view of a TrafficCube selection."""
+    if view == 'door-hour':
+        door_names, matrix = cube.door_hour_matrix(doors, layers, floors, start, end)
+        busiest = matrix.sum(axis=1).argsort(kind='stable')[::-1][:TRAFFIC_CUBE_CONFIG['max_heatmap_doors']]
+        figure = dark_figure([{'type': 'heatmap', 'z': matrix[busiest].tolist(), 'x': _HOUR_LABELS,
+                              'y': [door_names[i] for i in busiest], 'colorscale': 'Viridis'}], "Hour of day", "Door")
+    elif view == 'hour':
+        figure = dark_figure([{'type': 'bar', 'x': _HOUR_LABELS,
+                              'y': cube.hourly_totals(doors, layers, floors, start, end).tolist(),
+                              'marker': {'color': COLORS['accent']}}], "Hour of day", "Events")
+    else:
+        dates, matrix = cube.date_hour_matrix(doors, layers, floors, start, end)
+        figure = dark_figure([{'type': 'heatmap', 'z': matrix.tolist(), 'x': _HOUR_LABELS,
+                              'y': [day.strftime('%d.%m.%Y') for day in dates], 'colorscale': 'Viridis'}], "Hour of day", "Date")
+
+    peaks = cube.peak_hours(doors, layers, floors, start, end)
+    if not peaks:
+        return figure, "No events in this selection."
+    return figure, "Peak hours: " + ", ".join(f"{hour:02d}:00-{hour + 1:02d}:00 ({events:,})" for hour, events in peaks)
+
+
+def register_traffic_callbacks(app):
+
+    @app.callback(
+        [
+            Output('traffic-heatmap-container', 'style'),
+            Output('traffic-layer-filter', 'options'),
+            Output('traffic-floor-filter', 'options'),
+            Output('traffic-door-filter', 'options')
+        ],
+        Input('traffic-cube-store', 'data')
+    )
+    def configure_traffic_filters(traffic_cube_key):
+        cube = load_index_value(traffic_cube_key)
+        if cube is None:
+            return {'display': 'none'}, [], [], []
+        return (_TRAFFIC_CONTAINER_STYLE,
+                [{'label': f"Layer {layer}", 'value': layer} for layer in cube.layers()],
+                [{'label': f"Floor {floor}", 'value': floor} for floor in cube.floors()],
+                list(cube.doors))
+
+    @app.callback(
+        [
+            Output('traffic-heatmap', 'figure'),
+            Output('traffic-peak-hours', 'children')
+        ],
+        [
+            Input('traffic-cube-store', 'data'),
+            Input('traffic-view', 'value'),
+            Input('traffic-layer-filter', 'value'),
+            Input('traffic-floor-filter', 'value'),
+            Input('traffic-door-filter', 'value'),
+            Input('model-date-range', 'start_date'),
+            Input('model-date-range', 'end_date')
+        ]
+    )
+    def show_traffic_view(traffic_cube_key, view, layers, floors, doors, start_date, end_date):
+        cube = load_index_value(traffic_cube_key)
+        if cube is None:
+            return EMPTY_FIGURE, ""
+        start, end = (start_date[:10], end_date[:10]) if start_date and end_date else (None, None)
+        return traffic_figure(cube, view, doors, layers, floors, start, end)
@@ -1,12 +1,29 @@
 import base64
-import io
-import pandas as pd
 import json
 import traceback
-from dash import Input, Output, State, html, dcc
+from dash import Input, Output, State, html, dcc, ctx
 # Import the styles directly so we can use them
 from styles.graph_styles import upload_style_initial, upload_style_success, upload_style_fail, upload_icon_img_style 
 from constants import REQUIRED_INTERNAL_COLUMNS
+from data_io.session_store import get_session_store, store_value
+from data_io.csv_prescan import prescan_csv, read_csv_headers
+from data_io.ingest import register_upload, resolve_upload_members, member_opener, UPLOADED_FILES_NAMESPACE
+
+
+def build_prescan_preview(prescan):
+    """Small table of the first rows of the upload, shown under the mapping dropdowns."""
+    sample_df = prescan['sample']
+    cell_style = {'padding': '2px 8px', 'borderBottom': '1px solid #ccc', 'textAlign': 'left'}
+    return html.Div([
+        html.P(f"Preview ({prescan['row_count']:,} rows in file):", style={'marginTop': '15px', 'fontWeight': 'bold'}),
+        html.Table([
+            html.Thead(html.Tr([html.Th(col, style=cell_style) for col in sample_df.columns])),
+            html.Tbody([
+                html.Tr([html.Td(str(val), style=cell_style) for val in row])
+                for row in sample_df.itertuples(index=False, name=None)
+            ])
+        ], style={'fontSize': '0.8em', 'margin': '0 auto'})
+    ], style={'overflowX': 'auto'})
 
 
 def register_upload_callbacks(app, icon_upload_default, icon_upload_success, icon_upload_fail):
@@ -29,11 +46,11 @@ def register_upload_callbacks(app, icon_upload_default, icon_upload_success, ico
             Output('all-doors-from-csv-store', 'data'),
             Output('upload-icon', 'style') # ✅ ADDED THIS OUTPUT: Control the style of the icon itself
         ],
-        [Input('upload-data', 'contents')],
+        [Input('upload-data', 'contents'), Input('chunked-upload-store', 'data')],
         [State('upload-data', 'filename'), State('column-mapping-store', 'data')],
         prevent_initial_call='initial_duplicate'
     )
-    def handle_upload_and_show_header_mapping(contents, filename, saved_col_mappings_json):
+    def handle_upload_and_show_header_mapping(contents, chunked_upload, filename, saved_col_mappings_json):
         # Initial/Default styles (these are passed into the callback from app.py)
         # We need an initial style for the icon itself.
         initial_icon_style_to_set = upload_icon_img_style # Use the style from graph_styles.py
@@ -72,7 +89,19 @@ def register_upload_callbacks(app, icon_upload_default, icon_upload_success, ico
         }
         processing_status_msg = ""
 
-        if contents is None:
+        # Large files arrive through the resumable /upload route and are already on disk.
+        from_chunked_upload = ctx.triggered_id == 'chunked-upload-store' and chunked_upload
+        if from_chunked_upload:
+            filename = chunked_upload.get('filename', '')
+        elif isinstance(filename, list):
+            # dcc.Upload(multiple=True): one entry per selected file (daily exports, .gz or .zip bundles)
+            filename_list = filename
+            filename = ', '.join(filename)
+        else:
+            filename_list = [filename]
+            contents = [contents] if contents else contents
+
+        if not contents and not from_chunked_upload:
             return (
                 None, None, [],
                 confirm_button_style_hidden, hide_style, processing_status_msg,
@@ -83,17 +112,27 @@ def register_upload_callbacks(app, icon_upload_default, icon_upload_success, ico
             )
 
         try:
-            content_type, content_string = contents.split(',')
-            decoded = base64.b64decode(content_string)
-
-            if not filename.lower().endswith('.csv'):
-                raise ValueError("Uploaded file is not a CSV.")
-
-            # Load the full DataFrame here to get all unique Door IDs
-            df_full_for_doors = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
-            headers = df_full_for_doors.columns.tolist()
+            if from_chunked_upload:
+                uploaded_files = [{'file_key': chunked_upload.get('file_key'), 'filename': filename}]
+            else:
+                # Keep the decoded bytes server-side; the browser store only receives the manifest key.
+                uploaded_files = []
+                for file_contents, file_name in zip(contents, filename_list):
+                    content_type, content_string = file_contents.split(',')
+                    uploaded_files.append({'file_key': get_session_store(UPLOADED_FILES_NAMESPACE).put_bytes(
+                        base64.b64decode(content_string)),
+                                           'filename': file_name})
+            uploaded_file_key = register_upload(uploaded_files)
+            csv_members = resolve_upload_members(uploaded_file_key)
+            if not csv_members:
+                raise ValueError("Uploaded file is no longer available on the server. Please upload it again.")
+
+            headers = read_csv_headers(member_opener(csv_members[0]))
             if not headers:
                 raise ValueError("CSV has no headers.")
+            for member in csv_members[1:]:
+                if read_csv_headers(member_opener(member)) != headers:
+                    raise ValueError(f"'{member['name']}' has different headers than '{csv_members[0]['name']}'.")
 
             if isinstance(saved_col_mappings_json, str):
                 saved_col_mappings = json.loads(saved_col_mappings_json)
@@ -103,25 +142,24 @@ def register_upload_callbacks(app, icon_upload_default, icon_upload_success, ico
             header_key = json.dumps(sorted(headers))
             loaded_col_map_prefs = saved_col_mappings.get(header_key, {})
 
-            temp_mapping_for_doors = {}
-            for csv_h_selected, internal_k in loaded_col_map_prefs.items():
-                if internal_k in REQUIRED_INTERNAL_COLUMNS:
-                    temp_mapping_for_doors[csv_h_selected] = REQUIRED_INTERNAL_COLUMNS[internal_k]
-                else:
-                    temp_mapping_for_doors[csv_h_selected] = internal_k
+            DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
 
-            df_full_for_doors.rename(columns=temp_mapping_for_doors, inplace=True)
+            # Resolve the CSV column holding door ids from the saved mapping (or an already standardized header).
+            door_column = next((csv_h for csv_h, internal_k in loaded_col_map_prefs.items()
+                                if internal_k == 'DoorID' and csv_h in headers), None)
+            if door_column is None and DOORID_COL_DISPLAY in headers:
+                door_column = DOORID_COL_DISPLAY
 
-            DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
+            # Only the header, a few sample rows and the door column are read; the full parse waits for Generate.
+            prescan = prescan_csv([member_opener(member) for member in csv_members], door_column=door_column)
+            get_session_store('prescan').put(prescan, key=uploaded_file_key)
 
-            all_unique_doors = []
-            if DOORID_COL_DISPLAY in df_full_for_doors.columns:
-                all_unique_doors = sorted(df_full_for_doors[DOORID_COL_DISPLAY].astype(str).unique().tolist())
+            all_unique_doors = prescan['doors'] or []
+            if prescan['doors'] is not None:
                 print(f"DEBUG: Extracted {len(all_unique_doors)} unique doors for classification.")
             else:
                 print(f"Warning: '{DOORID_COL_DISPLAY}' column not found after preliminary mapping for door list extraction.")
 
-
             mapping_dropdowns_children = []
             for internal_name, display_text in REQUIRED_INTERNAL_COLUMNS.items():
                 pre_sel = None
@@ -156,9 +194,12 @@ def register_upload_callbacks(app, icon_upload_default, icon_upload_success, ico
                     ])
                 )
 
-            processing_status_msg = f"Step 1: Confirm Header Mapping for '{filename}'."
+            mapping_dropdowns_children.append(build_prescan_preview(prescan))
+
+            processing_status_msg = (f"Step 1: Confirm Header Mapping for '{filename}' "
+                                     f"({prescan['row_count']:,} rows in {len(csv_members)} file(s)).")
             return (
-                contents,
+                uploaded_file_key,
                 headers,
                 mapping_dropdowns_children,
                 confirm_button_style_visible,
@@ -169,7 +210,7 @@ def register_upload_callbacks(app, icon_upload_default, icon_upload_success, ico
                 hide_style, hide_style, hide_style, hide_style,
                 yosai_header_style_to_set,
                 [],
-                all_unique_doors,
+                store_value(all_unique_doors),
                 upload_icon_img_style # ✅ Return the desired size/style for the icon itself
             )
 
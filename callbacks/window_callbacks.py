@@ -0,0 +1,69 @@
+import dash
+from dash import Input, Output, State, ctx
+
+from processing.graph_config import UI_STYLES
+from processing.cytoscape_prep import prepare_cytoscape_elements
+from data_io.session_store import load_index_value
+
+
+def _windows(temporal_index, window_days):
+    """[(start, end)] for the selected window length; 0 means one window over all days."""
+    if not window_days:
+        return [(temporal_index.days[0], temporal_index.days[-1])]
+    return temporal_index.rolling_windows(window_days)
+
+
+def register_window_callbacks(app):
+
+    @app.callback(
+        [
+            Output('time-window-controls', 'style'),
+            Output('time-window-slider', 'max'),
+            Output('time-window-slider', 'marks'),
+            Output('time-window-slider', 'value')
+        ],
+        [
+            Input('time-window-store', 'data'),
+            Input('time-window-days', 'value')
+        ]
+    )
+    def configure_time_window_slider(time_window_key, window_days):
+        stored = load_index_value(time_window_key)
+        if not stored:
+            return UI_STYLES['hide'], 0, {}, None
+        windows = _windows(stored['index'], window_days)
+        label_every = max(1, len(windows) // 6)
+        marks = {i: start.strftime('%d.%m') for i, (start, _) in enumerate(windows) if i % label_every == 0}
+        # A new model leaves the slider unset, so the graph just generated is not replaced by a window;
+        # choosing a window length starts on the most recent window.
+        position = None if ctx.triggered_id == 'time-window-store' else len(windows) - 1
+        return UI_STYLES['show_block'], len(windows) - 1, marks, position
+
+    @app.callback(
+        [
+            Output('onion-graph', 'elements', allow_duplicate=True),
+            Output('time-window-label', 'children')
+        ],
+        [
+            Input('time-window-slider', 'value'),
+            Input('time-window-days', 'value')
+        ],
+        State('time-window-store', 'data'),
+        prevent_initial_call=True
+    )
+    def show_time_window(position, window_days, time_window_key):
+        if position is None:
+            return dash.no_update, "Pick a window length or move the slider to view one period."
+        stored = load_index_value(time_window_key)
+        if not stored:
+            return dash.no_update, ""
+        temporal_index = stored['index']
+        windows = _windows(temporal_index, window_days)
+        start, end = windows[min(position or 0, len(windows) - 1)]
+        aggregates, device_attrs, path_viz, all_paths = temporal_index.window_model(
+            stored['config'], start, end, stored['confirmed_entrances'] or None, stored['door_classifications'] or None)
+        if not aggregates['event_count']:
+            return [], f"{start:%d.%m.%Y} - {end:%d.%m.%Y}: no events in this window."
+        nodes, edges = prepare_cytoscape_elements(device_attrs, path_viz, all_paths)
+        return nodes + edges, (f"{start:%d.%m.%Y} - {end:%d.%m.%Y}: {aggregates['raw_event_count']:,} events, "
+                               f"~{aggregates['stats'].distinct_users():,} tokens, {len(device_attrs)} devices.")
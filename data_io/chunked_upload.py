@@ -0,0 +1,168 @@
+# data_io/chunked_upload.py
+
+import os
+import json
+import time
+import uuid
+import weakref
+import threading
+from flask import Blueprint, request, jsonify
+
+from data_io.session_store import SESSION_STORE_CONFIG, get_session_store
+from data_io.ingest import UPLOADED_FILES_NAMESPACE
+
+# Raw chunks are appended to a spool file on disk; nothing is base64-encoded or held in a Python string.
+CHUNKED_UPLOAD_CONFIG = {
+    'url_prefix': '/upload',
+    'spool_directory': os.path.join(SESSION_STORE_CONFIG['directory'], 'spool'),
+    'max_chunk_bytes': 8 * 1024 * 1024,
+    'read_block_bytes': 1024 * 1024,
+    'allowed_extensions': ('.csv', '.gz', '.zip'),
+    # Unfinished uploads that have not received a chunk for this long are removed.
+    'stale_after_seconds': SESSION_STORE_CONFIG['namespaces'][UPLOADED_FILES_NAMESPACE]['ttl_seconds'],
+}
+
+# Weak values: a lock lives only while requests hold it, so finished or abandoned uploads leave none behind.
+_UPLOAD_LOCKS = weakref.WeakValueDictionary()
+_UPLOAD_LOCKS_GUARD = threading.Lock()
+
+
+def _lock_for(upload_id):
+    """One lock per upload, so a slow chunk never blocks other users' uploads."""
+    with _UPLOAD_LOCKS_GUARD:
+        return _UPLOAD_LOCKS.setdefault(upload_id, threading.Lock())
+
+
+def _spool_paths(upload_id):
+    """Returns (data_path, metadata_path) for an upload id, rejecting anything that is not a uuid4 hex."""
+    try:
+        upload_id = uuid.UUID(hex=upload_id).hex
+    except (ValueError, TypeError):
+        return None, None
+    spool_dir = CHUNKED_UPLOAD_CONFIG['spool_directory']
+    return os.path.join(spool_dir, f"{upload_id}.part"), os.path.join(spool_dir, f"{upload_id}.json")
+
+
+def _read_metadata(meta_path):
+    try:
+        with open(meta_path, 'r') as fh:
+            return json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _sweep_stale_uploads():
+    spool_dir = CHUNKED_UPLOAD_CONFIG['spool_directory']
+    cutoff = time.time() - CHUNKED_UPLOAD_CONFIG['stale_after_seconds']
+    with os.scandir(spool_dir) as it:
+        for entry in it:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+
+
+def _upload_status(upload_id, data_path, meta):
+    received = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+    return {'upload_id': upload_id, 'filename': meta['filename'], 'size': meta['size'], 'received': received}
+
+
+def create_chunked_upload_blueprint():
+    bp = Blueprint('chunked_upload', __name__, url_prefix=CHUNKED_UPLOAD_CONFIG['url_prefix'])
+
+    @bp.route('/init', methods=['POST'])
+    def init_upload():
+        payload = request.get_json(silent=True) or {}
+        filename = os.path.basename(str(payload.get('filename', '')))
+        try:
+            size = int(payload.get('size', -1))
+        except (TypeError, ValueError):
+            size = -1
+        if not filename.lower().endswith(CHUNKED_UPLOAD_CONFIG['allowed_extensions']):
+            return jsonify({'error': f"Unsupported file type: '{filename}'."}), 400
+        if size < 0:
+            return jsonify({'error': "Missing or invalid file size."}), 400
+
+        os.makedirs(CHUNKED_UPLOAD_CONFIG['spool_directory'], exist_ok=True)
+        _sweep_stale_uploads()
+        upload_id = uuid.uuid4().hex
+        data_path, meta_path = _spool_paths(upload_id)
+        open(data_path, 'wb').close()
+        meta = {'filename': filename, 'size': size}
+        with open(meta_path, 'w') as fh:
+            json.dump(meta, fh)
+        print(f"DEBUG: Started chunked upload {upload_id} for '{filename}' ({size:,} bytes).")
+        return jsonify(_upload_status(upload_id, data_path, meta))
+
+    @bp.route('/<upload_id>', methods=['GET'])
+    def upload_status(upload_id):
+        data_path, meta_path = _spool_paths(upload_id)
+        meta = _read_metadata(meta_path) if meta_path else None
+        if meta is None:
+            return jsonify({'error': "Unknown upload."}), 404
+        return jsonify(_upload_status(upload_id, data_path, meta))
+
+    @bp.route('/<upload_id>', methods=['PUT'])
+    def upload_chunk(upload_id):
+        data_path, meta_path = _spool_paths(upload_id)
+        meta = _read_metadata(meta_path) if meta_path else None
+        if meta is None:
+            return jsonify({'error': "Unknown upload."}), 404
+        try:
+            offset = int(request.args.get('offset', '-1'))
+        except ValueError:
+            offset = -1
+        if request.content_length is not None and request.content_length > CHUNKED_UPLOAD_CONFIG['max_chunk_bytes']:
+            return jsonify({'error': "Chunk too large."}), 413
+
+        with _lock_for(upload_id):
+            received = os.path.getsize(data_path)
+            if offset != received:
+                # Client is out of sync (e.g. resuming after a dropped connection): tell it where to continue.
+                return jsonify(_upload_status(upload_id, data_path, meta)), 409
+            # Never more than the announced size: a chunk that would overflow it is rejected before it is
+            # written, and one without Content-Length is cut off (and rolled back) at the limit.
+            limit = min(meta['size'] - received, CHUNKED_UPLOAD_CONFIG['max_chunk_bytes'])
+            if request.content_length is not None and request.content_length > limit:
+                return jsonify(dict(_upload_status(upload_id, data_path, meta),
+                                    error="Received more bytes than announced.")), 400
+            block_size = CHUNKED_UPLOAD_CONFIG['read_block_bytes']
+            with open(data_path, 'ab') as fh:
+                written = 0
+                while True:
+                    block = request.stream.read(min(block_size, limit - written + 1))
+                    if not block:
+                        break
+                    if written + len(block) > limit:
+                        fh.flush()
+                        fh.truncate(received)
+                        return jsonify(dict(_upload_status(upload_id, data_path, meta),
+                                            error="Received more bytes than announced.")), 400
+                    fh.write(block)
+                    written += len(block)
+            os.utime(meta_path, None)
+
+        return jsonify(_upload_status(upload_id, data_path, meta))
+
+    @bp.route('/<upload_id>/complete', methods=['POST'])
+    def complete_upload(upload_id):
+        data_path, meta_path = _spool_paths(upload_id)
+        meta = _read_metadata(meta_path) if meta_path else None
+        if meta is None:
+            return jsonify({'error': "Unknown upload."}), 404
+        with _lock_for(upload_id):
+            status = _upload_status(upload_id, data_path, meta)
+            if status['received'] != meta['size']:
+                return jsonify(dict(status, error="Upload is incomplete.")), 409
+            file_key = get_session_store(UPLOADED_FILES_NAMESPACE).adopt_file(data_path)
+            os.remove(meta_path)
+        print(f"DEBUG: Completed chunked upload {upload_id} as session file {file_key}.")
+        return jsonify({'file_key': file_key, 'filename': meta['filename'], 'size': meta['size']})
+
+    return bp
+
+
+def register_chunked_upload_routes(server):
+    """Registers the resumable upload endpoints on the Flask server behind the Dash app."""
+    server.register_blueprint(create_chunked_upload_blueprint())
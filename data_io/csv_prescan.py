@@ -0,0 +1,91 @@
+# data_io/csv_prescan.py
+
+import contextlib
+import pandas as pd
+
+# Rows per chunk when streaming a single column; only one column is ever materialised at a time.
+PRESCAN_CHUNK_ROWS = 1_000_000
+PRESCAN_SAMPLE_ROWS = 5
+
+
+@contextlib.contextmanager
+def opened_source(csv_source):
+    """
+    A CSV source is either a path/file-like object, or a zero-argument callable returning
+    a fresh binary stream (used for gzip/zip members, which cannot be rewound cheaply).
+    Streams opened here from a callable are closed when the block ends.
+    """
+    if not callable(csv_source):
+        yield csv_source
+        return
+    source = csv_source()
+    try:
+        yield source
+    finally:
+        if hasattr(source, 'close'):
+            source.close()
+
+
+def read_csv_headers(csv_source):
+    """Reads only the header row of a CSV (file path or file-like object)."""
+    with opened_source(csv_source) as source:
+        return pd.read_csv(source, nrows=0).columns.tolist()
+
+
+def scan_door_column(csv_source, door_column, chunk_rows=PRESCAN_CHUNK_ROWS):
+    """
+    Streams a single column of the CSV and returns (sorted unique door ids, row count).
+    Values are read as strings, matching how load_csv_event_log types the DoorID column.
+    A list of sources is scanned as one logical file (e.g. the members of a zip upload).
+    """
+    sources = csv_source if isinstance(csv_source, list) else [csv_source]
+    unique_doors = set()
+    row_count = 0
+    for source in sources:
+        with opened_source(source) as stream:
+            for chunk in pd.read_csv(stream, usecols=[door_column], dtype=str, chunksize=chunk_rows):
+                row_count += len(chunk)
+                unique_doors.update(chunk[door_column].astype(str).unique().tolist())
+    return sorted(unique_doors), row_count
+
+
+def count_csv_rows(csv_source, headers, chunk_rows=PRESCAN_CHUNK_ROWS):
+    """Counts data rows by streaming only the first column (quoted newlines are handled by the parser)."""
+    if not headers:
+        return 0
+    with opened_source(csv_source) as source:
+        return sum(len(chunk) for chunk in pd.read_csv(source, usecols=[headers[0]], dtype=str, chunksize=chunk_rows))
+
+
+def prescan_csv(csv_source, door_column=None, sample_rows=PRESCAN_SAMPLE_ROWS):
+    """
+    Cheap upload-time scan that avoids parsing the whole file:
+    the header row, a few sample rows for the mapping preview, the row count,
+    and (if `door_column` is known) the unique door list from that column alone.
+    `csv_source` must be re-readable (a path or a stream factory), or a list of them that share one header.
+    """
+    sources = csv_source if isinstance(csv_source, list) else [csv_source]
+    headers = read_csv_headers(sources[0]) if sources else []
+    sample_df = pd.DataFrame()
+    if headers:
+        with opened_source(sources[0]) as source:
+            sample_df = pd.read_csv(source, nrows=sample_rows, dtype=str).fillna('')
+
+    doors = None
+    if door_column and door_column in headers:
+        doors, row_count = scan_door_column(sources, door_column)
+    else:
+        if door_column:
+            print(f"Warning: Door column '{door_column}' not in CSV headers; skipping door prescan.")
+        door_column = None
+        row_count = sum(count_csv_rows(source, headers) for source in sources)
+
+    print(f"DEBUG: Prescan found {len(headers)} columns, {row_count:,} rows in {len(sources)} file(s)"
+          f"{f', {len(doors)} unique doors' if doors is not None else ''}.")
+    return {
+        'headers': headers,
+        'sample': sample_df,
+        'row_count': row_count,
+        'door_column': door_column,
+        'doors': doors,
+    }
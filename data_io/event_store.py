@@ -0,0 +1,273 @@
+# data_io/event_store.py
+
+import os
+import re
+import uuid
+import shutil
+import datetime
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_ds
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency: only needed when the event store is used.
+    pa = pa_ds = pq = None
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+
+# Parsed, normalized event logs are kept as Parquet, one directory per facility ("dataset") and
+# one hive partition per calendar day: <root>/<dataset>/EventDate=YYYY-MM-DD/part-<id>.parquet
+EVENT_STORE_CONFIG = {
+    'root': os.environ.get('YOSAI_EVENT_STORE_DIR', os.path.join(os.getcwd(), 'event_store')),
+    'partition_field': 'EventDate',
+    # Small row groups let door filters skip most of a day: rows are sorted by door within each partition.
+    'row_group_size': 64_000,
+    'compression': 'zstd',
+    # Events loaded for a model (UI uploads, API submissions) are appended to the facility's dataset.
+    'store_uploads': True,
+}
+
+TIMESTAMP_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+USERID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['UserID']
+DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
+EVENTTYPE_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['EventType']
+DICTIONARY_COLUMNS = [USERID_COL_DISPLAY, DOORID_COL_DISPLAY, EVENTTYPE_COL_DISPLAY]
+
+_DATASET_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+# Hashes of each day's stored events (processing.deduplication.EventHashSet), kept in the day's partition so
+# a write only loads and saves the days it touches; '_' files are ignored by dataset discovery.
+DAY_HASHES_FILE = '_event_hashes.npy'
+# Dataset-wide hash file of earlier versions: split into the partitions on the next write or delete.
+LEGACY_HASHES_FILE = '_event_hashes.pkl'
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("The columnar event store requires 'pyarrow'. Install it with: pip install pyarrow")
+
+
+def dataset_path(dataset, root=None):
+    if not _DATASET_NAME_PATTERN.match(str(dataset)) or dataset in ('.', '..'):
+        raise ValueError(f"Invalid event store dataset name: {dataset!r}")
+    return os.path.join(root or EVENT_STORE_CONFIG['root'], dataset)
+
+
+def _partition_dir(dataset_dir, day):
+    return os.path.join(dataset_dir, f"{EVENT_STORE_CONFIG['partition_field']}={day.isoformat()}")
+
+
+def _event_schema():
+    dictionary_type = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        pa.field(TIMESTAMP_COL_DISPLAY, pa.timestamp('ns')),
+        pa.field(USERID_COL_DISPLAY, dictionary_type),
+        pa.field(DOORID_COL_DISPLAY, dictionary_type),
+        pa.field(EVENTTYPE_COL_DISPLAY, dictionary_type),
+    ])
+
+
+def _timestamp_scalar(ts):
+    return pa.scalar(pd.Timestamp(ts).as_unit('ns').value, type=pa.timestamp('ns'))
+
+
+def _is_date_only(value):
+    """True for a date (not a datetime) or a 'YYYY-MM-DD' string: as a range end it means the whole day."""
+    if isinstance(value, str):
+        return len(value.strip()) <= 10
+    return isinstance(value, datetime.date) and not isinstance(value, datetime.datetime)
+
+
+def list_event_dates(dataset, root=None):
+    """Sorted list of the days (datetime.date) present in a dataset."""
+    dataset_dir = dataset_path(dataset, root)
+    if not os.path.isdir(dataset_dir):
+        return []
+    prefix = f"{EVENT_STORE_CONFIG['partition_field']}="
+    return sorted(datetime.date.fromisoformat(name[len(prefix):])
+                  for name in os.listdir(dataset_dir) if name.startswith(prefix))
+
+
+def _save_day_hashes(dataset_dir, hash_set, days):
+    for day in days:
+        partition_dir = _partition_dir(dataset_dir, day)
+        if day not in hash_set.days or not os.path.isdir(partition_dir):
+            continue
+        tmp_path = os.path.join(partition_dir, f".{DAY_HASHES_FILE}.tmp")
+        with open(tmp_path, 'wb') as fh:
+            np.save(fh, hash_set.days[day])
+        os.replace(tmp_path, os.path.join(partition_dir, DAY_HASHES_FILE))
+
+
+def _split_legacy_hashes(dataset_dir):
+    from processing.deduplication import EventHashSet
+
+    legacy_path = os.path.join(dataset_dir, LEGACY_HASHES_FILE)
+    if os.path.exists(legacy_path):
+        hash_set = EventHashSet.load(legacy_path)
+        _save_day_hashes(dataset_dir, hash_set, list(hash_set.days))
+        os.remove(legacy_path)
+
+
+def _load_day_hashes(dataset, days, root=None):
+    """EventHashSet of the events stored for `days`, read from their partitions only."""
+    from processing.deduplication import EventHashSet
+
+    dataset_dir = dataset_path(dataset, root)
+    hash_set = EventHashSet()
+    for day in days:
+        partition_dir = _partition_dir(dataset_dir, day)
+        hashes_path = os.path.join(partition_dir, DAY_HASHES_FILE)
+        if os.path.exists(hashes_path):
+            hash_set.days[day] = np.load(hashes_path)
+        elif os.path.isdir(partition_dir):
+            # Day written before its hashes were kept: hash its stored events once.
+            hash_set.add_events(read_events(dataset, start=day, end=day, root=root))
+    return hash_set
+
+
+def delete_event_dates(dataset, dates, root=None):
+    dataset_dir = dataset_path(dataset, root)
+    _split_legacy_hashes(dataset_dir)
+    for day in dates:
+        shutil.rmtree(_partition_dir(dataset_dir, day), ignore_errors=True)  # the day's hashes go with it
+
+
+def write_events(event_df, dataset, root=None, mode='overwrite_partitions'):
+    """
+    Persists a loaded event frame (display-name columns, as returned by load_csv_event_log).
+    Door ids are normalized the same way as the pipeline does, and the id/type columns are
+    dictionary-encoded. With mode='overwrite_partitions' (default) any day present in
+    `event_df` replaces what is stored for that day, so re-uploading a daily export is idempotent;
+    mode='append' adds new files next to existing ones. Exact duplicate events are not written twice:
+    every day partition keeps the hashes of its stored events, so rows repeated within `event_df` or
+    already stored by an earlier write are dropped. Only the partitions of the days in `event_df` are
+    read or rewritten. Returns the list of days written.
+    """
+    _require_pyarrow()
+    from processing.onion_model import normalize_door_ids
+    from processing.deduplication import EventHashSet, drop_duplicate_events
+
+    if event_df is None or event_df.empty:
+        print("Warning: No events to write to the event store.")
+        return []
+    missing = [col for col in _event_schema().names if col not in event_df.columns]
+    if missing:
+        raise ValueError(f"Event frame is missing columns for the event store: {missing}")
+
+    df = event_df[_event_schema().names].copy()
+    if not pd.api.types.is_datetime64_any_dtype(df[TIMESTAMP_COL_DISPLAY]):
+        df[TIMESTAMP_COL_DISPLAY] = pd.to_datetime(df[TIMESTAMP_COL_DISPLAY], errors='coerce')
+    df.dropna(subset=[TIMESTAMP_COL_DISPLAY], inplace=True)
+    df[TIMESTAMP_COL_DISPLAY] = df[TIMESTAMP_COL_DISPLAY].astype('datetime64[ns]')
+    df = normalize_door_ids(df, door_id_col=DOORID_COL_DISPLAY)
+
+    dataset_dir = dataset_path(dataset, root)
+    _split_legacy_hashes(dataset_dir)
+    if mode == 'overwrite_partitions':
+        hash_set = EventHashSet()  # the days in `df` replace what is stored, hashes included
+    else:
+        hash_set = _load_day_hashes(dataset, sorted(df[TIMESTAMP_COL_DISPLAY].dt.date.unique()), root)
+    df, _ = drop_duplicate_events(df, hash_set)
+
+    schema = _event_schema()
+    days_written = []
+    for day, day_df in df.groupby(df[TIMESTAMP_COL_DISPLAY].dt.date, sort=True):
+        partition_dir = _partition_dir(dataset_dir, day)
+        if mode == 'overwrite_partitions':
+            shutil.rmtree(partition_dir, ignore_errors=True)
+        os.makedirs(partition_dir, exist_ok=True)
+
+        # Sorting by door (then time) gives every row group a narrow door range for min/max pruning.
+        day_df = day_df.sort_values([DOORID_COL_DISPLAY, TIMESTAMP_COL_DISPLAY], kind='stable')
+        for col in DICTIONARY_COLUMNS:
+            day_df[col] = day_df[col].astype(str).astype('category')
+        table = pa.Table.from_pandas(day_df, schema=schema, preserve_index=False)
+
+        file_name = f"part-{uuid.uuid4().hex}.parquet"
+        final_path = os.path.join(partition_dir, file_name)
+        tmp_path = os.path.join(partition_dir, f".{file_name}.tmp")  # dot-files are ignored by dataset discovery
+        pq.write_table(table, tmp_path,
+                       row_group_size=EVENT_STORE_CONFIG['row_group_size'],
+                       compression=EVENT_STORE_CONFIG['compression'],
+                       use_dictionary=True,
+                       write_statistics=True)
+        os.replace(tmp_path, final_path)
+        days_written.append(day)
+
+    _save_day_hashes(dataset_dir, hash_set, days_written)
+    print(f"Event store '{dataset}': wrote {len(df)} events across {len(days_written)} day partition(s).")
+    return days_written
+
+
+def read_events(dataset, start=None, end=None, doors=None, users=None, root=None, as_categories=False):
+    """
+    Loads events from the store with predicate pushdown: the date range prunes whole day partitions,
+    and timestamp/door/user predicates are checked against Parquet row-group statistics before any
+    data is decoded. `start`/`end` are inclusive dates or timestamps; a date-only `end` (a date or a
+    'YYYY-MM-DD' string) includes that whole day. Returns a frame with the same
+    display-name columns as load_csv_event_log, sorted by timestamp, or None if the dataset is missing.
+    """
+    _require_pyarrow()
+    dataset_dir = dataset_path(dataset, root)
+    if not os.path.isdir(dataset_dir):
+        print(f"Error: Event store dataset '{dataset}' not found at {dataset_dir}.")
+        return None
+
+    partition_field = EVENT_STORE_CONFIG['partition_field']
+    ds = pa_ds.dataset(dataset_dir, format='parquet', schema=_event_schema().append(pa.field(partition_field, pa.string())),
+                       partitioning=pa_ds.partitioning(pa.schema([(partition_field, pa.string())]), flavor='hive'))
+
+    predicate = None
+
+    def _and(expr):
+        return expr if predicate is None else predicate & expr
+
+    if start is not None:
+        start_ts = pd.Timestamp(start)
+        predicate = _and(pa_ds.field(partition_field) >= start_ts.date().isoformat())
+        predicate = _and(pa_ds.field(TIMESTAMP_COL_DISPLAY) >= _timestamp_scalar(start_ts))
+    if end is not None:
+        end_ts = pd.Timestamp(end)
+        if _is_date_only(end):
+            end_ts = end_ts.normalize() + pd.Timedelta(days=1) - pd.Timedelta(1, unit='ns')  # whole end day is included
+        predicate = _and(pa_ds.field(partition_field) <= end_ts.date().isoformat())
+        predicate = _and(pa_ds.field(TIMESTAMP_COL_DISPLAY) <= _timestamp_scalar(end_ts))
+    if doors:
+        normalized_doors = sorted({re.sub(r'\s+', ' ', str(d).upper().strip()) for d in doors})
+        predicate = _and(pa_ds.field(DOORID_COL_DISPLAY).isin(normalized_doors))
+    if users:
+        predicate = _and(pa_ds.field(USERID_COL_DISPLAY).isin(sorted({str(u) for u in users})))
+
+    table = ds.to_table(columns=_event_schema().names, filter=predicate)
+    event_df = table.to_pandas()
+    if not as_categories:
+        for col in DICTIONARY_COLUMNS:
+            event_df[col] = event_df[col].astype(str)
+    event_df.sort_values(TIMESTAMP_COL_DISPLAY, kind='stable', inplace=True, ignore_index=True)
+    print(f"Event store '{dataset}': loaded {len(event_df)} events.")
+    return event_df
+
+
+def record_events(event_df, dataset, root=None):
+    """
+    Appends events loaded for a model run to `dataset` (events already stored are skipped by their
+    hashes, so reopening the same export adds nothing). Returns the days written; a store that cannot be
+    written (no pyarrow, disk errors) only prints a warning, so the model run itself goes on.
+    """
+    if not EVENT_STORE_CONFIG['store_uploads']:
+        return []
+    try:
+        return write_events(event_df, dataset, root=root, mode='append')
+    except (ImportError, OSError, ValueError) as e:
+        print(f"Warning: Events could not be added to the event store dataset '{dataset}': {e}")
+        return []
+
+
+def record_event_chunks(event_chunks, dataset, root=None):
+    """Passes `event_chunks` through unchanged, appending each one to `dataset` (see record_events) on the way."""
+    for chunk_df in event_chunks:
+        if chunk_df is not None and not chunk_df.empty:
+            record_events(chunk_df, dataset, root=root)
+        yield chunk_df
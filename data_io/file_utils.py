@@ -3,10 +3,11 @@
 import base64
 import io
 
-def decode_uploaded_csv(contents_b64: str) -> io.StringIO:
+def decode_uploaded_csv(contents_b64: str) -> io.BytesIO:
+    # Returns the decoded bytes directly; pandas parses bytes, so no extra UTF-8 string copy is made.
+    # Prefer the resumable /upload route (data_io/chunked_upload.py) for large files.
     try:
         _, content_string = contents_b64.split(',')
-        decoded = base64.b64decode(content_string).decode('utf-8')
-        return io.StringIO(decoded)
+        return io.BytesIO(base64.b64decode(content_string))
     except Exception as e:
-        raise ValueError(f"Error decoding uploaded file: {e}")
+        raise ValueError(f"Error decoding uploaded file: {e}")
\ No newline at end of file
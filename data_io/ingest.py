@@ -0,0 +1,208 @@
+# data_io/ingest.py
+
+import io
+import os
+import gzip
+import contextlib
+import zipfile
+import functools
+import traceback
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+from data_io.csv_loader import load_csv_event_log, iter_csv_event_chunks
+from data_io.session_store import get_session_store, store_value, load_value
+
+INGEST_CONFIG = {
+    'max_workers': None,            # None -> os.cpu_count()
+    'allowed_extensions': ('.csv', '.gz', '.zip'),
+}
+
+# Session store namespace of uploaded files and their manifests (see SESSION_STORE_CONFIG).
+UPLOADED_FILES_NAMESPACE = 'uploaded_files'
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZIP_MAGIC = b'PK\x03\x04'
+
+
+def detect_compression(path):
+    """Sniffs the first bytes of a file: 'gzip', 'zip' or None (plain CSV). Extensions are not trusted."""
+    with open(path, 'rb') as fh:
+        head = fh.read(4)
+    if head.startswith(_GZIP_MAGIC):
+        return 'gzip'
+    if head.startswith(_ZIP_MAGIC):
+        return 'zip'
+    return None
+
+
+def expand_csv_members(path, display_name):
+    """
+    Lists the CSV streams contained in one uploaded file as picklable descriptors:
+    a plain CSV or gzip file yields one member, a zip archive one per contained .csv / .csv.gz entry.
+    """
+    compression = detect_compression(path)
+    if compression != 'zip':
+        return [{'path': path, 'member': None, 'compression': compression, 'name': display_name}]
+
+    members = []
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            lower_name = info.filename.lower()
+            if info.is_dir() or os.path.basename(lower_name).startswith('.'):
+                continue
+            if lower_name.endswith('.csv') or lower_name.endswith('.csv.gz'):
+                members.append({'path': path, 'member': info.filename, 'compression': 'zip',
+                                'name': f"{display_name}/{info.filename}"})
+    if not members:
+        raise ValueError(f"Zip archive '{display_name}' contains no CSV files.")
+    return members
+
+
+class _MemberStream(io.BufferedIOBase):
+    """Decompressed stream of a zip member; closing it also closes the layers and the archive beneath it."""
+
+    def __init__(self, stream, *owned):
+        super().__init__()
+        self._stream = stream
+        self._owned = owned
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+    def read1(self, size=-1):
+        return self._stream.read1(size)
+
+    def readinto(self, buffer):
+        return self._stream.readinto(buffer)
+
+    def close(self):
+        if not self.closed:
+            for handle in (self._stream,) + self._owned:
+                handle.close()
+        super().close()
+
+
+def open_csv_member(member):
+    """
+    Opens a member descriptor as a streaming binary file object; nothing is decompressed up front.
+    The caller closes it (it is a context manager); a plain CSV is returned as its path.
+    """
+    if member['compression'] == 'gzip':
+        return gzip.open(member['path'], 'rb')
+    if member['compression'] == 'zip':
+        archive = zipfile.ZipFile(member['path'])
+        stream = archive.open(member['member'])
+        if member['member'].lower().endswith('.gz'):
+            return _MemberStream(gzip.GzipFile(fileobj=stream, mode='rb'), stream, archive)
+        return _MemberStream(stream, archive)
+    return member['path']  # plain CSV path: load_csv_event_log memory-maps it
+
+
+@contextlib.contextmanager
+def opened_csv_member(member):
+    """open_csv_member as a `with` block: the stream (if any) is closed when the block ends."""
+    source = open_csv_member(member)
+    try:
+        yield source
+    finally:
+        if hasattr(source, 'close'):
+            source.close()
+
+
+def member_opener(member):
+    """Zero-argument factory returning a fresh stream for `member` (see csv_prescan.opened_source)."""
+    return functools.partial(open_csv_member, member)
+
+
+# --- Upload manifests ---
+# An upload (one or many files) is a manifest in the session store listing the blob key of each file;
+# both live in UPLOADED_FILES_NAMESPACE.
+# Only the manifest key travels through 'uploaded-file-store'.
+
+def register_upload(files):
+    """`files` is a list of {'file_key', 'filename'}; returns the manifest key."""
+    for entry in files:
+        if not entry['filename'].lower().endswith(INGEST_CONFIG['allowed_extensions']):
+            raise ValueError(f"Unsupported file type: '{entry['filename']}'. Upload .csv, .gz or .zip files.")
+    return store_value({'files': files}, namespace=UPLOADED_FILES_NAMESPACE)
+
+
+def resolve_upload_members(upload_key):
+    """Expands an upload manifest into the list of CSV member descriptors, in upload order."""
+    manifest = load_value(upload_key, namespace=UPLOADED_FILES_NAMESPACE)
+    if not isinstance(manifest, dict) or not manifest.get('files'):
+        return []
+    store = get_session_store(UPLOADED_FILES_NAMESPACE)
+    members = []
+    for entry in manifest['files']:
+        path = store.blob_path(entry['file_key'])
+        if path is None:
+            print(f"Warning: Uploaded file '{entry['filename']}' is no longer available on the server.")
+            return []
+        members.extend(expand_csv_members(path, entry['filename']))
+    return members
+
+
+# --- Parallel parsing ---
+
+def _load_member(member, column_mapping, timestamp_format):
+    """Process-pool worker: parses one member into a standardized event frame."""
+    try:
+        with opened_csv_member(member) as source:
+            df = load_csv_event_log(source, column_mapping, timestamp_format=timestamp_format)
+    except Exception as e:
+        print(f"Error loading '{member['name']}': {e}")
+        traceback.print_exc()
+        return member['name'], None
+    return member['name'], df
+
+
+def load_event_members(members, column_mapping, timestamp_format=None, max_workers=None):
+    """
+    Parses every member (in parallel across processes when there is more than one),
+    then merges the per-file frames in timestamp order into the single event frame
+    expected by run_onion_model_processing. Returns None if any member fails to load.
+    """
+    if not members:
+        print("Error: No CSV files to load.")
+        return None
+
+    if len(members) == 1:
+        results = [_load_member(members[0], column_mapping, timestamp_format)]
+    else:
+        workers = min(len(members), max_workers or INGEST_CONFIG['max_workers'] or os.cpu_count() or 1)
+        print(f"Loading {len(members)} files across {workers} worker processes...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_load_member, members,
+                                    [column_mapping] * len(members), [timestamp_format] * len(members)))
+
+    frames = []
+    for name, df in results:
+        if df is None:
+            print(f"Error: '{name}' could not be loaded with the current column mapping.")
+            return None
+        frames.append(df)
+
+    if len(frames) == 1:
+        return frames[0]
+
+    TIMESTAMP_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+    # Stable sort keeps each file's own row order for identical timestamps.
+    merged_df = pd.concat(frames, ignore_index=True)
+    merged_df.sort_values(TIMESTAMP_COL_DISPLAY, kind='stable', inplace=True, ignore_index=True)
+    print(f"Merged {len(frames)} files into {len(merged_df)} events in timestamp order.")
+    return merged_df
+
+
+def iter_member_event_chunks(members, column_mapping, chunk_rows=500_000, timestamp_format=None):
+    """Streams every member, one after another, as standardized event chunks (for out-of-core runs)."""
+    for member in members:
+        print(f"DEBUG: Streaming '{member['name']}' in chunks of {chunk_rows:,} rows.")
+        with opened_csv_member(member) as source:
+            yield from iter_csv_event_chunks(source, column_mapping, chunk_rows=chunk_rows,
+                                             timestamp_format=timestamp_format)
@@ -0,0 +1,116 @@
+# data_io/live_tail.py
+
+import io
+import os
+import asyncio
+import threading
+import traceback
+import pandas as pd
+
+# Live mode follows an append-only CSV, or a directory of rotating CSV files, and hands over only the
+# rows written since the previous poll. The source is configured on the server, never sent by the browser.
+LIVE_TAIL_CONFIG = {
+    'source': os.environ.get('YOSAI_LIVE_TAIL_SOURCE'),   # CSV file or directory; None disables live mode
+    'poll_seconds': 1.0,
+    # Upper bound on bytes parsed per poll: a burst (or a large existing file) is caught up over several polls.
+    'max_bytes_per_poll': 8 * 1024 * 1024,
+}
+
+
+class CsvTailFollower:
+    """
+    Tracks a byte offset per followed file. Each poll reads from the offset to the last complete line;
+    a partial trailing line is kept until its newline arrives. A file that shrinks or is replaced
+    (different inode) is read again from the start, which covers log rotation.
+    """
+
+    def __init__(self, source, max_bytes_per_poll=None):
+        self.source = source
+        self.max_bytes_per_poll = max_bytes_per_poll or LIVE_TAIL_CONFIG['max_bytes_per_poll']
+        self._files = {}
+
+    def _candidate_files(self):
+        if os.path.isdir(self.source):
+            paths = [os.path.join(self.source, name) for name in os.listdir(self.source)
+                     if name.lower().endswith('.csv') and not name.startswith('.')]
+            return sorted(paths, key=lambda p: (os.path.getmtime(p), p))
+        return [self.source] if os.path.isfile(self.source) else []
+
+    def _read_new_bytes(self, path, budget):
+        """Returns (header bytes, complete new lines) for one file, or (None, b'') if nothing new."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._files.pop(path, None)
+            return None, b''
+        track = self._files.get(path)
+        if track is None or track['inode'] != stat.st_ino or stat.st_size < track['offset']:
+            track = {'inode': stat.st_ino, 'offset': 0, 'header': None, 'remainder': b''}
+            self._files[path] = track
+        if stat.st_size == track['offset'] or budget <= 0:
+            return track['header'], b''
+
+        with open(path, 'rb') as fh:
+            fh.seek(track['offset'])
+            data = fh.read(min(stat.st_size - track['offset'], budget))
+        track['offset'] += len(data)
+        data = track['remainder'] + data
+
+        if track['header'] is None:
+            newline = data.find(b'\n')
+            if newline < 0:
+                track['remainder'] = data
+                return None, b''
+            track['header'], data = data[:newline].rstrip(b'\r'), data[newline + 1:]
+
+        last_newline = data.rfind(b'\n')
+        track['remainder'] = data[last_newline + 1:]
+        return track['header'], data[:last_newline + 1]
+
+    def read_new_rows(self):
+        """Raw string frame of the rows appended since the last call (CSV headers as columns), or None."""
+        frames = []
+        budget = self.max_bytes_per_poll
+        for path in self._candidate_files():
+            header, lines = self._read_new_bytes(path, budget)
+            budget -= len(lines)
+            if header is None or not lines.strip():
+                continue
+            frames.append(pd.read_csv(io.BytesIO(header + b'\n' + lines), dtype=str))
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def read_header(self):
+        """Header row of the first followed file (used to pick the saved column mapping)."""
+        files = self._candidate_files()
+        if not files:
+            return []
+        return pd.read_csv(files[0], nrows=0).columns.tolist()
+
+    async def watch(self, on_rows, stop_event, poll_seconds=None, on_error=None):
+        """
+        Polls until `stop_event` is set; file reads and `on_rows` run off the event loop. A poll that
+        fails (unreadable file, malformed rows, an error in `on_rows`) is logged and passed to
+        `on_error`, and polling goes on: the rows of that poll are skipped, later rows are still read.
+        """
+        poll_seconds = poll_seconds or LIVE_TAIL_CONFIG['poll_seconds']
+        while not stop_event.is_set():
+            try:
+                new_rows = await asyncio.to_thread(self.read_new_rows)
+                await asyncio.to_thread(on_rows, new_rows)
+            except Exception as e:
+                print(f"Error: Live tail poll of '{self.source}' failed: {e}")
+                traceback.print_exc()
+                if on_error is not None:
+                    on_error(e)
+            await asyncio.sleep(poll_seconds)
+
+
+def start_follower_thread(follower, on_rows, poll_seconds=None, on_error=None):
+    """Runs `follower.watch` on its own asyncio loop in a daemon thread. Returns the stop event."""
+    stop_event = threading.Event()
+    thread = threading.Thread(target=asyncio.run, args=(follower.watch(on_rows, stop_event, poll_seconds, on_error),),
+                              name=f"live-tail:{follower.source}", daemon=True)
+    thread.start()
+    return stop_event
@@ -0,0 +1,442 @@
+# data_io/model_api.py
+
+import os
+import gzip
+import json
+import time
+import uuid
+import zlib
+import hashlib
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+try:
+    import orjson  # Optional: several times faster than json for large element lists.
+except ImportError:
+    orjson = None
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.onion_model import run_onion_model_processing
+from processing.cytoscape_prep import prepare_cytoscape_elements
+from data_io.session_store import SESSION_STORE_CONFIG, get_session_store
+from data_io.ingest import (INGEST_CONFIG, UPLOADED_FILES_NAMESPACE, expand_csv_members, resolve_upload_members,
+                            load_event_members)
+from data_io.model_snapshots import member_files_key, model_fingerprint
+
+# JSON API for generating onion models without the UI. A submission becomes a background job; the
+# finished model is stored under its fingerprint (input content + mapping + config + classifications),
+# so an identical submission is answered from the store and clients can revalidate with ETags.
+# Jobs run on a thread pool of the process that received the submission; while a job is queued or
+# running, that process refreshes the record's heartbeat, and status requests fail jobs whose heartbeat
+# stopped (the process died or restarted) or that ran past 'max_job_seconds'.
+MODEL_API_CONFIG = {
+    'url_prefix': '/api/v1/models',
+    'max_workers': 2,
+    'read_block_bytes': 1024 * 1024,
+    'gzip_level': 6,
+    # Resources are served in blocks of this size, so large edge lists are never built as one response string.
+    'stream_block_bytes': 256 * 1024,
+    # Resources are serialized and compressed this many rows at a time, straight into the store's file.
+    'serialize_block_rows': 10_000,
+    'heartbeat_seconds': 10,
+    'stale_after_seconds': 60,
+    'max_job_seconds': 4 * 60 * 60,
+}
+
+MODEL_RESOURCES = ('device_attributes', 'all_paths', 'path_viz', 'elements')
+
+_JOBS_NAMESPACE = 'models'
+_UPLOADS_NAMESPACE = 'uploads'
+_EXECUTOR = None
+_EXECUTOR_GUARD = threading.Lock()
+_JOB_GUARD = threading.Lock()
+_ACTIVE_JOBS = set()            # job ids queued or running in this process
+_HEARTBEAT_THREAD = None
+
+
+# --- Serialization ---
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps_json(value):
+    """Serializes to UTF-8 JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+
+def frame_records(df):
+    """DataFrame -> list of row dicts with NaN/NaT as null (plain JSON has no NaN)."""
+    if df is None or df.empty:
+        return []
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+# --- Fingerprints ---
+
+def input_fingerprint(spec):
+    """Digest of the input events: full file contents for uploads, partition file stats for event store datasets."""
+    if spec.get('members'):
+        return member_files_key(spec['members'])
+    from data_io.event_store import dataset_path, list_event_dates, _partition_dir
+    digest = hashlib.sha256()
+    source = spec['event_store']
+    dataset_dir = dataset_path(source['dataset'])
+    start = pd.Timestamp(source['start']).date() if source.get('start') else datetime.date.min
+    end = pd.Timestamp(source['end']).date() if source.get('end') else datetime.date.max
+    for day in list_event_dates(source['dataset']):
+        if not start <= day <= end:
+            continue
+        partition = _partition_dir(dataset_dir, day)
+        for name in sorted(os.listdir(partition)):
+            stat = os.stat(os.path.join(partition, name))
+            digest.update(f"{day}/{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    digest.update(json.dumps(source, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _resource_key(fingerprint, resource):
+    """Store key (32 hex chars) of one serialized resource of a model."""
+    return hashlib.sha256(f"{fingerprint}:{resource}".encode()).hexdigest()[:32]
+
+
+# --- Submissions ---
+
+def parse_model_request(payload, file_storage=None):
+    """
+    Validates a submission and resolves its input. Returns the job spec; raises ValueError on bad input.
+    Input is one of: an uploaded file (multipart 'file'), 'file_key' (from the chunked upload API),
+    'upload_key' (an upload manifest from the UI) or 'event_store': {'dataset', 'start', 'end'}. With an
+    uploaded input, 'dataset' also appends the loaded events to that event store dataset.
+    """
+    payload = payload or {}
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object.")
+    store = get_session_store(UPLOADED_FILES_NAMESPACE)
+    members = None
+
+    if file_storage is not None:
+        filename = os.path.basename(file_storage.filename or 'upload.csv')
+        if not filename.lower().endswith(INGEST_CONFIG['allowed_extensions']):
+            raise ValueError(f"Unsupported file type: '{filename}'.")
+        spool_path = os.path.join(SESSION_STORE_CONFIG['directory'], f"api-{uuid.uuid4().hex}.part")
+        os.makedirs(SESSION_STORE_CONFIG['directory'], exist_ok=True)
+        file_storage.save(spool_path)
+        uploads = get_session_store(_UPLOADS_NAMESPACE)
+        file_key = uploads.adopt_file(spool_path)
+        members = expand_csv_members(uploads.blob_path(file_key), filename)
+    elif payload.get('file_key'):
+        path = store.blob_path(payload['file_key'])
+        if path is None:
+            raise ValueError("Unknown or expired 'file_key'.")
+        members = expand_csv_members(path, payload.get('filename') or 'upload.csv')
+    elif payload.get('upload_key'):
+        members = resolve_upload_members(payload['upload_key'])
+        if not members:
+            raise ValueError("Unknown or expired 'upload_key'.")
+    elif isinstance(payload.get('event_store'), dict) and payload['event_store'].get('dataset'):
+        from data_io.event_store import dataset_path
+        dataset_path(payload['event_store']['dataset'])  # validates the name
+    else:
+        raise ValueError("Provide a file, 'file_key', 'upload_key' or 'event_store': {'dataset': ...}.")
+    if members is not None and payload.get('dataset'):
+        from data_io.event_store import dataset_path
+        dataset_path(payload['dataset'])  # validates the name
+
+    # Mapping values may be internal keys (as saved by the UI) or display names.
+    column_mapping = {str(csv_col): REQUIRED_INTERNAL_COLUMNS.get(target, target)
+                      for csv_col, target in (payload.get('column_mapping') or {}).items()}
+    if members is not None and set(column_mapping.values()) != set(REQUIRED_INTERNAL_COLUMNS.values()):
+        raise ValueError(f"'column_mapping' must map CSV headers to: {', '.join(REQUIRED_INTERNAL_COLUMNS.keys())}.")
+
+    config = GRAPH_PROCESSING_CONFIG.copy()
+    unknown_keys = set(payload.get('config') or {}) - set(config)
+    if unknown_keys:
+        raise ValueError(f"Unknown config keys: {', '.join(sorted(unknown_keys))}.")
+    config.update(payload.get('config') or {})
+
+    door_classifications = payload.get('door_classifications') or None
+    confirmed_entrances = payload.get('confirmed_entrances')
+    if confirmed_entrances is None and door_classifications:
+        confirmed_entrances = [door for door, info in door_classifications.items() if info.get('is_ee')] or None
+
+    return {
+        'members': _pin_members(members) if members is not None else None,
+        'event_store': payload.get('event_store') if members is None else None,
+        'dataset': payload.get('dataset') if members is not None else None,
+        'column_mapping': column_mapping,
+        'config': config,
+        'confirmed_entrances': confirmed_entrances,
+        'door_classifications': door_classifications,
+    }
+
+
+def _pin_members(members):
+    """
+    Points the members at files in the uploads namespace, which only the job removes (release_job_inputs):
+    uploaded files (chunked uploads, UI uploads) are linked there, so eviction cannot drop them first.
+    """
+    uploads = get_session_store(_UPLOADS_NAMESPACE)
+    pinned = {}
+    for path in dict.fromkeys(member['path'] for member in members):
+        if os.path.dirname(path) == uploads.directory:
+            pinned[path] = path
+        else:
+            pinned[path] = uploads.blob_path(uploads.link_file(path))
+    return [dict(member, path=pinned[member['path']]) for member in members]
+
+
+def release_job_inputs(spec):
+    """Removes the job's pinned upload files once nothing will read them again."""
+    uploads = get_session_store(_UPLOADS_NAMESPACE)
+    for path in dict.fromkeys(member['path'] for member in spec.get('members') or []):
+        uploads.delete(os.path.basename(path).split('.')[0])
+
+
+# --- Jobs ---
+
+def _executor():
+    global _EXECUTOR, _HEARTBEAT_THREAD
+    with _EXECUTOR_GUARD:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=MODEL_API_CONFIG['max_workers'], thread_name_prefix='model-api')
+        if _HEARTBEAT_THREAD is None:
+            _HEARTBEAT_THREAD = threading.Thread(target=_beat_heartbeats, name='model-api-heartbeat', daemon=True)
+            _HEARTBEAT_THREAD.start()
+        return _EXECUTOR
+
+
+def _beat_heartbeats():
+    store = get_session_store(_JOBS_NAMESPACE)
+    while True:
+        time.sleep(MODEL_API_CONFIG['heartbeat_seconds'])
+        with _JOB_GUARD:
+            for job_id in list(_ACTIVE_JOBS):
+                job = store.get(job_id)
+                if job is not None and job['status'] in ('queued', 'running'):
+                    store.put(dict(job, heartbeat=time.time()), key=job_id)
+
+
+def _update_job(job_id, **changes):
+    # Job records live in the disk store, so any server worker process can answer status requests.
+    store = get_session_store(_JOBS_NAMESPACE)
+    with _JOB_GUARD:
+        job = store.get(job_id) or {}
+        job.update(changes)
+        store.put(job, key=job_id)
+    return job
+
+
+def stale_job_error(job, now=None):
+    """Why a queued or running job record is considered lost, or None while it is still alive."""
+    now = time.time() if now is None else now
+    if now - job.get('heartbeat', 0) > MODEL_API_CONFIG['stale_after_seconds']:
+        return "the job stopped (the server process may have restarted); submit it again"
+    submitted = datetime.datetime.fromisoformat(job['submitted']).timestamp() if job.get('submitted') else 0
+    if now - submitted > MODEL_API_CONFIG['max_job_seconds']:
+        return f"the job did not finish within {MODEL_API_CONFIG['max_job_seconds'] // 60} minutes"
+    return None
+
+
+def get_job(job_id):
+    """The job record; a queued or running job whose run was lost is marked failed first."""
+    job = get_session_store(_JOBS_NAMESPACE).get(job_id)
+    if job is not None and job['status'] in ('queued', 'running'):
+        error = stale_job_error(job)
+        if error is not None:
+            job = _update_job(job_id, status='failed', error=error, finished=datetime.datetime.now().isoformat())
+    return job
+
+
+def _load_events(spec):
+    from data_io.event_store import read_events, record_events
+    if spec['members']:
+        event_df = load_event_members(spec['members'], spec['column_mapping'])
+        if event_df is not None and spec.get('dataset'):
+            record_events(event_df, spec['dataset'])
+        return event_df
+    source = spec['event_store']
+    return read_events(source['dataset'], start=source.get('start'), end=source.get('end'), doors=source.get('doors'))
+
+
+def _json_array_blocks(value):
+    """The JSON array of `value` (a DataFrame's records, or a list) as the bytes of consecutive row blocks."""
+    block_rows = MODEL_API_CONFIG['serialize_block_rows']
+    for start in range(0, len(value), block_rows):
+        if isinstance(value, pd.DataFrame):
+            block = frame_records(value.iloc[start:start + block_rows])
+        else:
+            block = value[start:start + block_rows]
+        yield dumps_json(block)[1:-1]  # the rows without the enclosing brackets
+
+
+def store_model_resources(fingerprint, resources):
+    """
+    Serializes each resource once, gzip-compressed, into the store; responses stream those bytes.
+    Rows are encoded and compressed block by block into a spool file that the store then adopts,
+    so neither the whole JSON document nor its compressed form is held in memory.
+    """
+    store = get_session_store(_JOBS_NAMESPACE)
+    for resource, value in resources.items():
+        spool_path = os.path.join(store.directory, f"resource-{uuid.uuid4().hex}.part")
+        try:
+            with gzip.open(spool_path, 'wb', compresslevel=MODEL_API_CONFIG['gzip_level']) as fh:
+                fh.write(b'[')
+                for index, block in enumerate(_json_array_blocks(value)):
+                    fh.write(block if index == 0 else b',' + block)
+                fh.write(b']')
+            store.adopt_file(spool_path, key=_resource_key(fingerprint, resource))
+        finally:
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
+
+
+def _run_job(job_id, spec, fingerprint):
+    _update_job(job_id, status='running', started=datetime.datetime.now().isoformat(), heartbeat=time.time())
+    try:
+        event_df = _load_events(spec)
+        if event_df is None or event_df.empty:
+            raise ValueError("No events could be loaded with the given input and column mapping.")
+        enriched_df, device_attrs, path_viz, all_paths = run_onion_model_processing(
+            event_df, spec['config'], confirmed_official_entrances=spec['confirmed_entrances'],
+            detailed_door_classifications=spec['door_classifications'])
+        if device_attrs is None or device_attrs.empty:
+            raise ValueError("Pipeline produced no model (no events left after cleaning?).")
+        nodes, edges = prepare_cytoscape_elements(device_attrs, path_viz, all_paths)
+
+        store_model_resources(fingerprint, {
+            'device_attributes': device_attrs,
+            'all_paths': all_paths,
+            'path_viz': path_viz,
+            'elements': nodes + edges,
+        })
+        timestamps = event_df[REQUIRED_INTERNAL_COLUMNS['Timestamp']]
+        summary = {'raw_events': len(event_df), 'enriched_events': len(enriched_df),
+                   'devices': len(device_attrs), 'paths': len(all_paths), 'nodes': len(nodes), 'edges': len(edges),
+                   'first_event': timestamps.min().isoformat(), 'last_event': timestamps.max().isoformat()}
+        get_session_store(_JOBS_NAMESPACE).put({'fingerprint': fingerprint, 'summary': summary}, key=fingerprint[:32])
+        _update_job(job_id, status='done', summary=summary, finished=datetime.datetime.now().isoformat())
+        print(f"DEBUG: Model API job {job_id} finished ({summary['devices']} devices, {summary['edges']} edges).")
+    except Exception as e:
+        print(f"Error: Model API job {job_id} failed: {e}")
+        _update_job(job_id, status='failed', error=str(e), finished=datetime.datetime.now().isoformat())
+    finally:
+        with _JOB_GUARD:
+            _ACTIVE_JOBS.discard(job_id)
+        release_job_inputs(spec)
+
+
+def submit_model_job(spec):
+    """Queues a model build; a model with the same fingerprint that is still stored completes the job at once."""
+    fingerprint = model_fingerprint(input_fingerprint(spec), spec['column_mapping'], spec['config'],
+                                    spec['confirmed_entrances'], spec['door_classifications'])
+    job_id = uuid.uuid4().hex
+    store = get_session_store(_JOBS_NAMESPACE)
+    cached = store.get(fingerprint[:32])
+    resources_present = all(store.blob_path(_resource_key(fingerprint, r)) for r in MODEL_RESOURCES)
+    if cached and cached.get('fingerprint') == fingerprint and resources_present:
+        _update_job(job_id, status='done', fingerprint=fingerprint, summary=cached['summary'], cached=True,
+                    submitted=datetime.datetime.now().isoformat())
+        release_job_inputs(spec)
+        return job_id
+    _update_job(job_id, status='queued', fingerprint=fingerprint, submitted=datetime.datetime.now().isoformat(),
+                heartbeat=time.time())
+    with _JOB_GUARD:
+        _ACTIVE_JOBS.add(job_id)
+    _executor().submit(_run_job, job_id, spec, fingerprint)
+    return job_id
+
+
+# --- Responses ---
+
+def _accepts_gzip():
+    return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+
+def _stream_resource(path, compressed):
+    """Yields the stored gzip bytes as-is, or inflates them block by block for clients without gzip."""
+    block_size = MODEL_API_CONFIG['stream_block_bytes']
+    with open(path, 'rb') as fh:
+        inflater = None if compressed else zlib.decompressobj(16 + zlib.MAX_WBITS)
+        while True:
+            block = fh.read(block_size)
+            if not block:
+                break
+            yield block if inflater is None else inflater.decompress(block)
+        if inflater is not None:
+            yield inflater.flush()
+
+
+def create_model_api_blueprint():
+    bp = Blueprint('model_api', __name__, url_prefix=MODEL_API_CONFIG['url_prefix'])
+
+    @bp.route('', methods=['POST'])
+    def submit_model():
+        file_storage = request.files.get('file')
+        try:
+            if file_storage is not None:
+                payload = json.loads(request.form.get('request') or '{}')
+            else:
+                payload = request.get_json(silent=True)
+            spec = parse_model_request(payload, file_storage)
+            job_id = submit_model_job(spec)
+        except (ValueError, json.JSONDecodeError) as e:
+            return jsonify({'error': str(e)}), 400
+        job = get_job(job_id)
+        status_url = f"{MODEL_API_CONFIG['url_prefix']}/{job_id}"
+        return jsonify({'job_id': job_id, 'status': job['status'], 'status_url': status_url}), 202, {'Location': status_url}
+
+    @bp.route('/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        job = get_job(job_id)
+        if job is None:
+            return jsonify({'error': "Unknown job."}), 404
+        body = dict(job, job_id=job_id)
+        if job['status'] == 'done':
+            body['resources'] = {r: f"{MODEL_API_CONFIG['url_prefix']}/{job_id}/{r}" for r in MODEL_RESOURCES}
+        return jsonify(body)
+
+    @bp.route('/<job_id>/<resource>', methods=['GET'])
+    def model_resource(job_id, resource):
+        if resource not in MODEL_RESOURCES:
+            return jsonify({'error': f"Unknown resource '{resource}'."}), 404
+        job = get_job(job_id)
+        if job is None:
+            return jsonify({'error': "Unknown job."}), 404
+        if job['status'] != 'done':
+            return jsonify({'error': f"Model is not ready (status: {job['status']})."}), 409
+
+        path = get_session_store(_JOBS_NAMESPACE).blob_path(_resource_key(job['fingerprint'], resource))
+        if path is None:
+            return jsonify({'error': "Model has expired from the server; submit it again."}), 410
+        # Weak ETag: the same model is served gzip-encoded or plain, depending on the client.
+        etag = f'W/"{job["fingerprint"][:32]}-{resource}"'
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            return Response(status=304, headers={'ETag': etag})
+
+        compressed = _accepts_gzip()
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Accept-Encoding'}
+        if compressed:
+            headers['Content-Encoding'] = 'gzip'
+            headers['Content-Length'] = str(os.path.getsize(path))
+        return Response(stream_with_context(_stream_resource(path, compressed)),
+                        mimetype='application/json', headers=headers)
+
+    return bp
+
+
+def register_model_api_routes(server):
+    """Registers the model generation API on the Flask server behind the Dash app."""
+    server.register_blueprint(create_model_api_blueprint())
@@ -0,0 +1,285 @@
+# data_io/model_snapshots.py
+
+import io
+import os
+import re
+import json
+import zlib
+import uuid
+import pickle
+import struct
+import hashlib
+import datetime
+import pandas as pd
+
+try:
+    import pyarrow as pa  # Optional: model frames are stored as Parquet when it is installed.
+except ImportError:
+    pa = None
+
+# Finished models are saved per facility as numbered snapshot files:
+#   <directory>/<facility>/v000001.snapshot
+# A snapshot holds the pipeline outputs (device attributes, path viz, all paths, summary stats) together
+# with everything that produced them (input hash, column mapping, config, door classifications), so a
+# facility can be reopened by loading the snapshot whose fingerprint matches instead of re-running the pipeline.
+MODEL_SNAPSHOT_CONFIG = {
+    'directory': os.environ.get('YOSAI_MODEL_SNAPSHOT_DIR', os.path.join(os.getcwd(), 'model_snapshots')),
+    'keep_versions': 20,      # older snapshots of a facility are removed
+    'compression_level': 3,
+    # Input files are hashed in full, streamed in blocks of this size (see member_files_key).
+    'hash_block_bytes': 1024 * 1024,
+}
+
+# File layout: magic | format version (uint16) | header length (uint32) | JSON header | body.
+# The header can be read without decompressing the frames (used to list and match snapshots).
+# Format 2 bodies are sections whose (offset, length) the header lists under 'sections': each model
+# frame as Parquet, and 'objects' = zlib(pickle(indexes and stats)). Format 1 bodies are one zlib(pickle(payload)).
+SNAPSHOT_FORMAT_VERSION = 2
+SNAPSHOT_FRAMES = ('device_attributes', 'path_viz', 'all_paths')
+_MAGIC = b'YOSAISNP'
+_PREFIX = struct.Struct('<8sHI')
+_VERSION_FILE_PATTERN = re.compile(r'^v(\d{6})\.snapshot$')
+_FACILITY_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+# --- Fingerprints ---
+
+# sha256 per (path, size, mtime, inode): a file reopened unchanged is not read again by this process.
+_FILE_DIGESTS = {}
+_FILE_DIGESTS_MAX = 256
+
+
+def _file_digest(path):
+    """sha256 of a file's full content, read in 'hash_block_bytes' blocks."""
+    stat = os.stat(path)
+    identity = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+    if identity in _FILE_DIGESTS:
+        return _FILE_DIGESTS[identity]
+    digest = hashlib.sha256()
+    block_bytes = MODEL_SNAPSHOT_CONFIG['hash_block_bytes']
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(block_bytes), b''):
+            digest.update(block)
+    if len(_FILE_DIGESTS) >= _FILE_DIGESTS_MAX:
+        _FILE_DIGESTS.pop(next(iter(_FILE_DIGESTS)))
+    _FILE_DIGESTS[identity] = digest.hexdigest()
+    return _FILE_DIGESTS[identity]
+
+
+def member_files_key(members):
+    """
+    Identity of the uploaded files behind `members`: the full-content hash of each file, independent of
+    the order and server paths of the files.
+    """
+    digests = sorted(_file_digest(path) for path in {member['path'] for member in members})
+    return hashlib.sha256(json.dumps(digests).encode()).hexdigest()
+
+
+def model_fingerprint(input_hash, column_mapping, config_params, confirmed_official_entrances=None,
+                      detailed_door_classifications=None):
+    """Identifies a model by its input and every setting that changes the pipeline output."""
+    settings = [input_hash, column_mapping, config_params,
+                sorted(confirmed_official_entrances) if confirmed_official_entrances else None,
+                detailed_door_classifications or None]
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def facility_for_headers(csv_headers):
+    """Facility name for UI uploads: exports with the same header set share mappings, classifications and snapshots."""
+    return 'headers-' + hashlib.sha256(json.dumps(sorted(csv_headers)).encode()).hexdigest()[:16]
+
+
+# --- Files ---
+
+def _facility_dir(facility, directory=None):
+    if not _FACILITY_PATTERN.match(str(facility)) or facility in ('.', '..'):
+        raise ValueError(f"Invalid facility name for model snapshots: {facility!r}")
+    return os.path.join(directory or MODEL_SNAPSHOT_CONFIG['directory'], facility)
+
+
+def _snapshot_versions(facility_dir):
+    """Sorted [(version, path)] of the snapshot files in a facility directory."""
+    if not os.path.isdir(facility_dir):
+        return []
+    versions = []
+    for name in os.listdir(facility_dir):
+        match = _VERSION_FILE_PATTERN.match(name)
+        if match:
+            versions.append((int(match.group(1)), os.path.join(facility_dir, name)))
+    return sorted(versions)
+
+
+def _read_prefix_and_header(fh):
+    magic, format_version, header_length = _PREFIX.unpack(fh.read(_PREFIX.size))
+    if magic != _MAGIC:
+        raise ValueError("Not a model snapshot file.")
+    if format_version > SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Snapshot format {format_version} is newer than this version supports ({SNAPSHOT_FORMAT_VERSION}).")
+    return json.loads(fh.read(header_length).decode('utf-8'))
+
+
+def read_snapshot_header(path):
+    """Metadata of one snapshot file, or None if it cannot be read."""
+    try:
+        with open(path, 'rb') as fh:
+            return _read_prefix_and_header(fh)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Warning: Model snapshot '{path}' could not be read: {e}")
+        return None
+
+
+def list_model_snapshots(facility, directory=None):
+    """Headers of all readable snapshots of `facility`, oldest first."""
+    headers = [read_snapshot_header(path) for _, path in _snapshot_versions(_facility_dir(facility, directory))]
+    return [header for header in headers if header is not None]
+
+
+def save_model_snapshot(facility, device_attributes_df, path_viz_data_df, all_paths_df, summary_stats,
+                        input_hash, column_mapping, config_params, confirmed_official_entrances=None,
+                        detailed_door_classifications=None, temporal_index=None, door_profiles=None,
+                        traffic_cube=None, occupancy=None, directory=None):
+    """
+    Writes the next snapshot version of `facility` and returns its header. `temporal_index` (a
+    TemporalModelIndex, when the per-day aggregates are known) is kept so time windows work after a reload,
+    and `door_profiles`, `traffic_cube` and `occupancy` (DoorProfileIndex, TrafficCube, LayerOccupancy) so the
+    tap details, heatmaps and occupancy views do.
+    """
+    facility_dir = _facility_dir(facility, directory)
+    os.makedirs(facility_dir, exist_ok=True)
+
+    header = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'facility': facility,
+        'version': None,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'fingerprint': model_fingerprint(input_hash, column_mapping, config_params,
+                                         confirmed_official_entrances, detailed_door_classifications),
+        'input_hash': input_hash,
+        'column_mapping': column_mapping,
+        'config': config_params,
+        'confirmed_entrances': confirmed_official_entrances,
+        'door_classifications': detailed_door_classifications,
+        'devices': 0 if device_attributes_df is None else len(device_attributes_df),
+        'paths': 0 if all_paths_df is None else len(all_paths_df),
+    }
+    frames = {'device_attributes': device_attributes_df, 'path_viz': path_viz_data_df, 'all_paths': all_paths_df}
+    objects = {'summary_stats': summary_stats, 'temporal_index': temporal_index, 'door_profiles': door_profiles,
+               'traffic_cube': traffic_cube, 'occupancy': occupancy}
+    sections = []
+    for name, df in frames.items():
+        parquet_bytes = _frame_to_parquet(df)
+        if parquet_bytes is None:
+            objects[name] = df  # no pyarrow, or a column Parquet cannot hold: pickled with the indexes
+        else:
+            sections.append((name, parquet_bytes))
+    sections.append(('objects', zlib.compress(pickle.dumps(objects, protocol=pickle.HIGHEST_PROTOCOL),
+                                              MODEL_SNAPSHOT_CONFIG['compression_level'])))
+    offset = 0
+    header['sections'] = {}
+    for name, data in sections:
+        header['sections'][name] = [offset, len(data)]
+        offset += len(data)
+
+    tmp_path = os.path.join(facility_dir, f".{uuid.uuid4().hex}.tmp")
+    try:
+        path = None
+        while path is None:
+            existing = _snapshot_versions(facility_dir)
+            header['version'] = existing[-1][0] + 1 if existing else 1
+            header_bytes = json.dumps(header, default=str).encode('utf-8')
+            with open(tmp_path, 'wb') as fh:
+                fh.write(_PREFIX.pack(_MAGIC, SNAPSHOT_FORMAT_VERSION, len(header_bytes)))
+                fh.write(header_bytes)
+                for _, data in sections:
+                    fh.write(data)
+            path = _claim_version_path(tmp_path, facility_dir, header['version'])
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    existing = _snapshot_versions(facility_dir)
+    for _, old_path in existing[:max(0, len(existing) - MODEL_SNAPSHOT_CONFIG['keep_versions'])]:
+        try:
+            os.remove(old_path)
+        except FileNotFoundError:
+            pass
+    print(f"Model snapshot: saved '{facility}' v{header['version']} ({os.path.getsize(path):,} bytes).")
+    return header
+
+
+def _claim_version_path(tmp_path, facility_dir, version):
+    """
+    Publishes the finished `tmp_path` as snapshot `version` only if no concurrent save took that number
+    (exclusive create); returns the path, or None when the version is taken and the caller must retry.
+    """
+    path = os.path.join(facility_dir, f"v{version:06d}.snapshot")
+    try:
+        os.link(tmp_path, path)
+        return path
+    except FileExistsError:
+        return None
+    except OSError:
+        pass
+    # No hard links on this filesystem: reserve the name with O_EXCL, then move the file over it.
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return None
+    os.replace(tmp_path, path)
+    return path
+
+
+def _frame_to_parquet(df):
+    """Parquet bytes of a model frame, or None if pyarrow is missing or the frame has mixed-type columns."""
+    if pa is None or df is None:
+        return None
+    buffer = io.BytesIO()
+    try:
+        df.to_parquet(buffer, engine='pyarrow', index=False)
+    except (pa.ArrowException, ValueError, TypeError) as e:
+        print(f"Warning: Model frame could not be stored as Parquet ({e}); pickling it instead.")
+        return None
+    return buffer.getvalue()
+
+
+def _read_sections(fh, header):
+    """Payload dict of a format 2 body (the file positioned right after the header)."""
+    body = fh.read()
+    sections = {name: body[offset:offset + length] for name, (offset, length) in header['sections'].items()}
+    payload = pickle.loads(zlib.decompress(sections.pop('objects')))
+    for name, data in sections.items():
+        payload[name] = pd.read_parquet(io.BytesIO(data), engine='pyarrow')
+    return payload
+
+
+def load_model_snapshot(facility, version=None, fingerprint=None, directory=None):
+    """
+    Loads a snapshot of `facility`: the given `version`, else the newest one whose fingerprint matches
+    `fingerprint`, else the newest one. Returns {'header', 'device_attributes', 'path_viz', 'all_paths',
+    'summary_stats', 'temporal_index', 'door_profiles', 'traffic_cube', 'occupancy'}
+    or None if there is no such snapshot.
+    """
+    for snapshot_version, path in reversed(_snapshot_versions(_facility_dir(facility, directory))):
+        if version is not None and snapshot_version != version:
+            continue
+        try:
+            with open(path, 'rb') as fh:
+                header = _read_prefix_and_header(fh)
+                if fingerprint is not None and header.get('fingerprint') != fingerprint:
+                    continue
+                if 'sections' in header:
+                    payload = _read_sections(fh, header)
+                else:
+                    payload = pickle.loads(zlib.decompress(fh.read()))
+        except (OSError, ValueError, KeyError, struct.error, zlib.error, pickle.UnpicklingError) as e:
+            print(f"Warning: Model snapshot '{path}' could not be loaded: {e}")
+            continue
+        payload['header'] = header
+        for name in SNAPSHOT_FRAMES:
+            payload.setdefault(name, None)
+        payload.setdefault('temporal_index', None)
+        payload.setdefault('door_profiles', None)
+        payload.setdefault('traffic_cube', None)
+        payload.setdefault('occupancy', None)
+        return payload
+    return None
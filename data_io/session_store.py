@@ -0,0 +1,278 @@
+# data_io/session_store.py
+
+import os
+import re
+import time
+import uuid
+import pickle
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Per-namespace settings. dcc.Stores only ever hold the short key returned by put();
+# the payload itself lives on the server's local disk under `directory/<namespace>`.
+SESSION_STORE_CONFIG = {
+    'directory': os.environ.get('YOSAI_SESSION_STORE_DIR',
+                                os.path.join(tempfile.gettempdir(), 'yosai_session_store')),
+    'namespaces': {
+        'session': {'ttl_seconds': 6 * 60 * 60, 'max_entries': 256},
+        # Files uploaded in the UI or through the chunked upload API, and the manifests listing them
+        # (data_io.ingest). Small entries (door lists, indexes) must not push them out of the LRU, so
+        # they get their own namespace, bounded by the total size of its files instead of a count.
+        'uploaded_files': {'ttl_seconds': 6 * 60 * 60, 'max_entries': None,
+                           'max_bytes': int(os.environ.get('YOSAI_UPLOADED_FILES_MAX_BYTES', 20 * 1024 ** 3))},
+        # Manual classifications back a local-storage dcc.Store and are a facility's only copy of the
+        # door setup, so they are never expired or evicted (None disables the limit).
+        'classifications': {'ttl_seconds': None, 'max_entries': None},
+        # Files submitted to the model API: removed by the job that reads them, so no LRU eviction can
+        # drop them while the job is queued. The TTL only clears files left behind by a server restart.
+        'uploads': {'ttl_seconds': 7 * 24 * 60 * 60, 'max_entries': None},
+        # Generated models and their serialized artifacts, shared by all clients (see model_api).
+        'models': {'ttl_seconds': 7 * 24 * 60 * 60, 'max_entries': 2048},
+    },
+    # Indexes read on every tap/selection are also kept unpickled in this process (see load_index_value).
+    'loaded_index_entries': 8,
+}
+
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+_OBJECT_SUFFIX = '.pkl'
+_BLOB_SUFFIX = '.bin'
+
+
+def is_session_key(value):
+    """True if `value` looks like a key issued by DiskSessionStore (uuid4 hex)."""
+    return isinstance(value, str) and bool(_KEY_PATTERN.match(value))
+
+
+class DiskSessionStore:
+    """
+    Server-side key/value store backed by the local disk, with TTL and LRU eviction by entry count or
+    by total bytes (each one is disabled when its setting is None).
+    Python objects are pickled (`put`/`get`); raw file bytes are kept verbatim (`put_bytes`/`blob_path`)
+    so loaders can read them straight from disk. File mtimes double as the access clock,
+    so several worker processes can share one directory.
+    """
+
+    def __init__(self, directory, ttl_seconds=6 * 60 * 60, max_entries=256, max_bytes=None):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    # --- Paths ---
+
+    def _path(self, key, suffix):
+        if not is_session_key(key):
+            raise KeyError(f"Invalid session key: {key!r}")
+        return os.path.join(self.directory, key + suffix)
+
+    def _existing_path(self, key):
+        for suffix in (_OBJECT_SUFFIX, _BLOB_SUFFIX):
+            path = self._path(key, suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _expired(self, mtime, now=None):
+        return self.ttl_seconds is not None and (now or time.time()) - mtime > self.ttl_seconds
+
+    def _touch_if_fresh(self, path):
+        """Refreshes the LRU clock of `path`; returns False (and removes it) if it has expired."""
+        try:
+            if self._expired(os.path.getmtime(path)):
+                os.remove(path)
+                return False
+            os.utime(path, None)
+            return True
+        except FileNotFoundError:
+            return False
+
+    # --- Writes ---
+
+    def put(self, value, key=None):
+        """Pickles `value` to disk and returns its key. Passing an existing `key` overwrites it in place."""
+        key = key if is_session_key(key) else uuid.uuid4().hex
+        path = self._path(key, _OBJECT_SUFFIX)
+        self._atomic_write(path, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        self.evict()
+        return key
+
+    def put_bytes(self, data, key=None):
+        """Stores raw bytes (e.g. an uploaded CSV) without any re-encoding and returns the key."""
+        key = key if is_session_key(key) else uuid.uuid4().hex
+        self._atomic_write(self._path(key, _BLOB_SUFFIX), data)
+        self.evict()
+        return key
+
+    def adopt_file(self, src_path, key=None):
+        """Moves an already spooled file into the store as a blob, without copying it through memory."""
+        key = key if is_session_key(key) else uuid.uuid4().hex
+        # shutil.move is a plain rename on the same filesystem and a streamed copy otherwise.
+        shutil.move(src_path, self._path(key, _BLOB_SUFFIX))
+        self.evict()
+        return key
+
+    def link_file(self, src_path, key=None):
+        """Adds a file that must stay where it is (e.g. another namespace's blob): hard link, or a streamed copy."""
+        key = key if is_session_key(key) else uuid.uuid4().hex
+        path = self._path(key, _BLOB_SUFFIX)
+        try:
+            os.link(src_path, path)
+        except OSError:
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, path)
+        self.evict()
+        return key
+
+    def _atomic_write(self, path, data):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+
+    # --- Reads ---
+
+    def get(self, key, default=None):
+        if not is_session_key(key):
+            return default
+        path = self._path(key, _OBJECT_SUFFIX)
+        if not self._touch_if_fresh(path):
+            return default
+        try:
+            with open(path, 'rb') as fh:
+                return pickle.load(fh)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError) as e:
+            print(f"Warning: Session entry '{key}' could not be read: {e}")
+            return default
+
+    def blob_path(self, key):
+        """Returns the on-disk path of a blob stored with put_bytes/adopt_file, or None if missing/expired."""
+        if not is_session_key(key):
+            return None
+        path = self._path(key, _BLOB_SUFFIX)
+        return path if self._touch_if_fresh(path) else None
+
+    def get_bytes(self, key, default=None):
+        path = self.blob_path(key)
+        if path is None:
+            return default
+        with open(path, 'rb') as fh:
+            return fh.read()
+
+    def __contains__(self, key):
+        if not is_session_key(key):
+            return False
+        path = self._existing_path(key)
+        return path is not None and not self._expired(os.path.getmtime(path))
+
+    def delete(self, key):
+        if not is_session_key(key):
+            return
+        for suffix in (_OBJECT_SUFFIX, _BLOB_SUFFIX):
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+    # --- Eviction ---
+
+    def evict(self):
+        """Drops expired entries, then the least recently used ones beyond `max_entries` or `max_bytes`."""
+        if self.ttl_seconds is None and self.max_entries is None and self.max_bytes is None:
+            return
+        with self._lock:
+            now = time.time()
+            live_entries = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith((_OBJECT_SUFFIX, _BLOB_SUFFIX)):
+                        continue
+                    try:
+                        stat = entry.stat()
+                        if self._expired(stat.st_mtime, now):
+                            os.remove(entry.path)
+                        else:
+                            live_entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    except FileNotFoundError:
+                        continue
+
+            live_entries.sort()
+            overflow = len(live_entries) - self.max_entries if self.max_entries is not None else 0
+            if self.max_bytes is not None:
+                # The most recently used entry is always kept, even if it alone is over the limit.
+                total_bytes = sum(size for _, size, _ in live_entries[max(overflow, 0):])
+                while total_bytes > self.max_bytes and overflow < len(live_entries) - 1:
+                    overflow = max(overflow, 0) + 1
+                    total_bytes -= live_entries[overflow - 1][1]
+            if overflow > 0:
+                for _, _, path in live_entries[:overflow]:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                print(f"DEBUG: Session store '{self.directory}' evicted {overflow} least recently used entries.")
+
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_session_store(namespace='session'):
+    """Returns the process-wide store for `namespace`, creating it on first use."""
+    with _STORES_LOCK:
+        if namespace not in _STORES:
+            settings = SESSION_STORE_CONFIG['namespaces'].get(namespace, SESSION_STORE_CONFIG['namespaces']['session'])
+            _STORES[namespace] = DiskSessionStore(
+                os.path.join(SESSION_STORE_CONFIG['directory'], namespace),
+                ttl_seconds=settings['ttl_seconds'],
+                max_entries=settings['max_entries'],
+                max_bytes=settings.get('max_bytes')
+            )
+        return _STORES[namespace]
+
+
+def store_value(value, namespace='session', key=None):
+    """Stores `value` server-side and returns the key to place in a dcc.Store."""
+    return get_session_store(namespace).put(value, key=key)
+
+
+def load_value(handle, namespace='session', default=None):
+    """
+    Resolves the content of a dcc.Store back to its server-side value.
+    Payloads written inline before the server-side store existed (JSON strings, dicts, lists)
+    are still accepted so existing browser local storage keeps working.
+    """
+    if handle is None:
+        return default
+    if is_session_key(handle):
+        return get_session_store(namespace).get(handle, default)
+    return handle
+
+
+_LOADED_INDEXES = OrderedDict()
+_LOADED_INDEXES_LOCK = threading.Lock()
+
+
+def load_index_value(handle, namespace='session'):
+    """
+    load_value for read-only indexes that are queried repeatedly (journeys, door profiles): the most
+    recently used ones stay in memory, so a lookup does not unpickle the whole index again.
+    """
+    if not is_session_key(handle):
+        return load_value(handle, namespace)
+    cache_key = (namespace, handle)
+    with _LOADED_INDEXES_LOCK:
+        if cache_key in _LOADED_INDEXES:
+            _LOADED_INDEXES.move_to_end(cache_key)
+            return _LOADED_INDEXES[cache_key]
+    value = load_value(handle, namespace)
+    if value is not None:
+        with _LOADED_INDEXES_LOCK:
+            _LOADED_INDEXES[cache_key] = value
+            while len(_LOADED_INDEXES) > SESSION_STORE_CONFIG['loaded_index_entries']:
+                _LOADED_INDEXES.popitem(last=False)
+    return value
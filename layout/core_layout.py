@@ -5,6 +5,8 @@ import dash_bootstrap_components as dbc
 
 # ✅ Import COLORS from your updated style_config
 from styles.style_config import COLORS, UI_VISIBILITY, UI_COMPONENTS
+from data_io.live_tail import LIVE_TAIL_CONFIG
+from processing.temporal_windows import TEMPORAL_WINDOW_CONFIG
 from styles.graph_styles import (
     upload_icon_img_style,
     upload_style_initial,
@@ -40,13 +42,22 @@ def create_main_layout(app_instance, main_logo_path, icon_upload_default):
             id='upload-data',
             children=html.Img(id='upload-icon', src=icon_upload_default, style=upload_icon_img_style),
             style=upload_style_initial, # This is from graph_styles.py, will update there
-            multiple=False,
-            accept='.csv'
+            multiple=True,
+            accept='.csv,.gz,.zip'
         ),
 
         html.Div(id='upload-status-text', children="Please upload a CSV file.",
                  style={'textAlign': 'center', 'marginBottom': '10px', 'fontSize': '0.9em', 'color': COLORS['text_light']}), # Use 'text_light'
 
+        # Resumable chunked upload for very large exports (handled by assets/chunked_upload.js)
+        html.Div(style={'textAlign': 'center', 'marginBottom': '10px', 'fontSize': '0.85em', 'color': COLORS['text_light']}, children=[
+            html.Span("Large export? ", style={'marginRight': '5px'}),
+            html.Button('Resumable Upload...', id='chunked-upload-button', n_clicks=0,
+                        style={'backgroundColor': COLORS['surface'], 'color': COLORS['text_dark'],
+                               'border': f'1px solid {COLORS["border"]}', 'borderRadius': '4px', 'padding': '2px 8px'}),
+            html.Div(id='chunked-upload-progress')
+        ]),
+
         html.Div(id='interactive-setup-container', style={
             'display': 'none', 'padding': '15px',
             'backgroundColor': COLORS['surface'], # Use 'surface' for this section's background
@@ -139,6 +150,16 @@ def create_main_layout(app_instance, main_logo_path, icon_upload_default):
 
         html.Div(id='processing-status', style={'marginTop': '10px', 'color': COLORS['accent'], 'textAlign': 'center'}), # Use 'accent'
 
+        # Live mode follows the server-configured log (LIVE_TAIL_CONFIG['source']) and updates the graph in place
+        html.Div(id='live-tail-controls',
+                 style={'marginTop': '10px', 'textAlign': 'center'} if LIVE_TAIL_CONFIG['source'] else {'display': 'none'},
+                 children=[
+            dcc.Checklist(id='live-tail-toggle', options=[{'label': ' Live mode', 'value': 'live'}], value=[],
+                          inline=True, style={'color': COLORS['text_light']}),
+            html.Div(id='live-tail-status', style={'color': COLORS['text_light'], 'fontSize': '0.9em'})
+        ]),
+        dcc.Interval(id='live-tail-interval', interval=2000, disabled=True),
+
         # Using the style dict from style_config directly
         html.Div(id='yosai-custom-header', style=UI_VISIBILITY['show_header'], children=[
             html.Img(src=main_logo_path, style={'height': '40px', 'marginRight': '20px'}),
@@ -173,8 +194,78 @@ def create_main_layout(app_instance, main_logo_path, icon_upload_default):
                 'boxShadow': '0 2px 5px rgba(0,0,0,0.2)'}),
         ]),
 
+        # Door x date x hour traffic: heatmaps and peak hours, filtered by layer/floor/door and the model date range
+        html.Div(id='traffic-heatmap-container', style={'display': 'none'}, children=[
+            html.H3("Traffic by hour", style={'color': COLORS['text_dark']}),
+            dcc.RadioItems(id='traffic-view',
+                           options=[{'label': ' Date × hour', 'value': 'date-hour'},
+                                    {'label': ' Door × hour', 'value': 'door-hour'},
+                                    {'label': ' Hour of day', 'value': 'hour'}],
+                           value='date-hour', inline=True, inputStyle={'marginLeft': '12px'},
+                           style={'color': COLORS['text_light']}),
+            html.Div(style={'display': 'flex', 'gap': '10px', 'marginTop': '10px'}, children=[
+                dcc.Dropdown(id='traffic-layer-filter', options=[], value=[], multi=True, placeholder="All layers",
+                             style={'flex': '1', 'color': '#000'}),
+                dcc.Dropdown(id='traffic-floor-filter', options=[], value=[], multi=True, placeholder="All floors",
+                             style={'flex': '1', 'color': '#000'}),
+                dcc.Dropdown(id='traffic-door-filter', options=[], value=[], multi=True, placeholder="All doors",
+                             style={'flex': '2', 'color': '#000'})
+            ]),
+            dcc.Graph(id='traffic-heatmap', config={'displaylogo': False}),
+            html.Div(id='traffic-peak-hours', style={'color': COLORS['text_light'], 'fontSize': '0.9em'})
+        ]),
+
+        # People present per onion layer over time, and how long they stay (from consecutive events per user-day)
+        html.Div(id='occupancy-container', style={'display': 'none'}, children=[
+            html.H3("Occupancy by layer", style={'color': COLORS['text_dark']}),
+            dcc.RadioItems(id='occupancy-view',
+                           options=[{'label': ' People present', 'value': 'series'},
+                                    {'label': ' Dwell time', 'value': 'dwell'}],
+                           value='series', inline=True, inputStyle={'marginLeft': '12px'},
+                           style={'color': COLORS['text_light']}),
+            dcc.Graph(id='occupancy-graph', config={'displaylogo': False}),
+            html.Div(id='occupancy-summary', style={'color': COLORS['text_light'], 'fontSize': '0.9em'})
+        ]),
+
         html.Div(id='graph-output-container', style={'display': 'none'}, children=[
             html.H2("Area Layout Model", id="area-layout-model-title", style={'textAlign': 'center', 'color': COLORS['text_dark'], 'marginBottom': '20px', 'fontSize': '1.8rem'}), # Use 'text_dark'
+            # Compare the shown model with an earlier saved version (model snapshots of the same export format)
+            html.Div(id='model-diff-controls', style={'width': '60%', 'margin': '0 auto 10px auto', 'textAlign': 'center'}, children=[
+                dcc.Dropdown(id='model-diff-baseline', options=[], value=None, clearable=True,
+                             placeholder="Compare with a saved model...", style={'color': '#000'}),
+                html.Div(id='model-diff-summary', style={'color': COLORS['text_light'], 'fontSize': '0.9em', 'marginTop': '5px'})
+            ]),
+            # Step through the model in rolling day windows (shown when per-day aggregates are available)
+            html.Div(id='time-window-controls', style={'display': 'none'}, children=[
+                dcc.RadioItems(id='time-window-days',
+                               options=[{'label': ' All days', 'value': 0}] +
+                                       [{'label': f' {n} days', 'value': n} for n in TEMPORAL_WINDOW_CONFIG['window_days_options']],
+                               value=0, inline=True, inputStyle={'marginLeft': '12px'}, style={'color': COLORS['text_light']}),
+                dcc.Slider(id='time-window-slider', min=0, max=0, step=1, value=None, marks={}, updatemode='mouseup'),
+                html.Div(id='time-window-label', style={'color': COLORS['text_light'], 'fontSize': '0.9em'})
+            ]),
+            # Regenerate the model and stats for a date range from the cached, cleaned events
+            html.Div(id='model-date-range-controls', style={'display': 'none'}, children=[
+                dcc.DatePickerRange(id='model-date-range', display_format='DD.MM.YYYY', clearable=True,
+                                    start_date_placeholder_text="From", end_date_placeholder_text="To"),
+                dcc.Checklist(id='model-date-range-compare', options=[{'label': ' Compare with the previous period', 'value': 'compare'}],
+                              value=[], inline=True, style={'color': COLORS['text_light'], 'marginTop': '5px'}),
+                html.Div(id='model-date-range-status', style={'color': COLORS['text_light'], 'fontSize': '0.9em', 'marginTop': '5px'})
+            ]),
+            # Trace one person's path through the graph (all days or one day)
+            html.Div(id='journey-controls', style={'display': 'none'}, children=[
+                html.Div(style={'display': 'flex', 'gap': '10px'}, children=[
+                    dcc.Dropdown(id='journey-user', options=[], value=None, placeholder="Trace a person (type the start of a UserID)...",
+                                 style={'flex': '2', 'color': '#000'}),
+                    dcc.Dropdown(id='journey-day', options=[], value=None, placeholder="All days",
+                                 style={'flex': '1', 'color': '#000'})
+                ]),
+                html.Div(id='journey-status', style={'color': COLORS['text_light'], 'fontSize': '0.9em', 'marginTop': '5px'}),
+                # Highlight one of the most frequent multi-door routes
+                dcc.Dropdown(id='frequent-route', options=[], value=None, placeholder="Highlight a frequent route...",
+                             style={'color': '#000', 'marginTop': '5px'}),
+                html.Div(id='frequent-route-status', style={'color': COLORS['text_light'], 'fontSize': '0.9em', 'marginTop': '5px'})
+            ]),
             html.Div(id='cytoscape-graphs-area', style=centered_graph_box_style, children=[ # From graph_styles.py
                 cyto.Cytoscape(
                     id='onion-graph',
@@ -188,6 +279,7 @@ def create_main_layout(app_instance, main_logo_path, icon_upload_default):
         ]),
 
         dcc.Store(id='uploaded-file-store'),
+        dcc.Store(id='chunked-upload-store'),
         dcc.Store(id='csv-headers-store', storage_type='session'),
         dcc.Store(id='column-mapping-store', storage_type='local'),
         dcc.Store(id='ranked-doors-store', storage_type='session'),
@@ -195,6 +287,17 @@ def create_main_layout(app_instance, main_logo_path, icon_upload_default):
         dcc.Store(id='manual-door-classifications-store', storage_type='local'),
         dcc.Store(id='num-floors-store', storage_type='session', data=1),
         dcc.Store(id='all-doors-from-csv-store', storage_type='session'),
+        dcc.Store(id='live-tail-store'),
+        dcc.Store(id='model-snapshot-store'),
+        dcc.Store(id='time-window-store'),
+        dcc.Store(id='event-index-store'),
+        dcc.Store(id='journey-index-store'),
+        dcc.Store(id='door-profile-store'),
+        dcc.Store(id='traffic-cube-store'),
+        dcc.Store(id='occupancy-store'),
+        # Progressive runs: key of the background full-model job, polled until the preview is replaced
+        dcc.Store(id='progressive-job-store'),
+        dcc.Interval(id='progressive-refine-interval', interval=1000, disabled=True),
     ], style={'backgroundColor': COLORS['background'], 'padding': '20px', 'minHeight': '100vh', 'fontFamily': 'Arial, sans-serif'}) # Use new 'background'
 
     return layout
\ No newline at end of file
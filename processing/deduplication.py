@@ -0,0 +1,133 @@
+# processing/deduplication.py
+
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+
+# Exact duplicate events (the same row exported twice by overlapping export windows) are dropped
+# before any sorting: each (user, door, timestamp, event type) tuple is reduced to one 64-bit hash in
+# a vectorized pass, and rows whose hash was already seen - earlier in the frame, or in events kept
+# before (an EventHashSet) - are removed. With 64-bit hashes, two different events collide with
+# probability ~n^2 / 2^65 (about 1 in 3,700 for 100 million events).
+TIMESTAMP_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+USERID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['UserID']
+DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
+EVENTTYPE_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['EventType']
+EVENT_KEY_COLUMNS = [USERID_COL_DISPLAY, DOORID_COL_DISPLAY, TIMESTAMP_COL_DISPLAY, EVENTTYPE_COL_DISPLAY]
+
+_NO_DAY = np.iinfo(np.int64).min
+
+
+def event_hashes(event_df):
+    """uint64 hash of every row's (user, door, timestamp, event type); identical tuples hash identically."""
+    return pd.util.hash_pandas_object(event_df[EVENT_KEY_COLUMNS], index=False).to_numpy()
+
+
+def _day_numbers(event_df):
+    """Days since the epoch of each row's timestamp (_NO_DAY where it is missing or unparsable)."""
+    timestamps = event_df[TIMESTAMP_COL_DISPLAY]
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps, errors='coerce')
+    return timestamps.to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+class EventHashSet:
+    """
+    Hashes of the events kept so far, as one sorted array per calendar day. Duplicates share their
+    timestamp, so a lookup only searches its own day, and days that are replaced (re-uploaded
+    partitions) can be forgotten without touching the rest.
+    """
+
+    def __init__(self):
+        self.days = {}
+
+    def __len__(self):
+        return sum(len(hashes) for hashes in self.days.values())
+
+    @staticmethod
+    def _day_groups(hashes, day_numbers):
+        """(day, rows) per day, the rows of each day in hash order."""
+        # Same order as lexsort((hashes, day_numbers)), but two plain sorts are faster on uint64 keys.
+        order = np.argsort(hashes)
+        order = order[np.argsort(day_numbers[order], kind='stable')]
+        bounds = np.flatnonzero(np.diff(day_numbers[order])) + 1
+        for rows in np.split(order, bounds):
+            if len(rows) and day_numbers[rows[0]] != _NO_DAY:
+                yield pd.Timestamp(np.datetime64(int(day_numbers[rows[0]]), 'D')).date(), rows
+
+    @staticmethod
+    def _unique_sorted(values):
+        keep = np.ones(len(values), dtype=bool)
+        keep[1:] = values[1:] != values[:-1]
+        return values[keep]
+
+    def contains(self, hashes, day_numbers):
+        """Bool mask of the hashes already in the set (rows without a day are never seen)."""
+        seen = np.zeros(len(hashes), dtype=bool)
+        for day, rows in self._day_groups(hashes, day_numbers):
+            stored = self.days.get(day)
+            if stored is not None and len(stored):
+                positions = np.minimum(np.searchsorted(stored, hashes[rows]), len(stored) - 1)
+                seen[rows] = stored[positions] == hashes[rows]
+        return seen
+
+    def add(self, hashes, day_numbers):
+        for day, rows in self._day_groups(hashes, day_numbers):
+            stored = self.days.get(day)
+            # Two sorted runs: the stable (merge) sort only has to merge them.
+            merged = hashes[rows] if stored is None else np.sort(np.concatenate([stored, hashes[rows]]), kind='stable')
+            self.days[day] = self._unique_sorted(merged)
+
+    def add_events(self, event_df):
+        if not event_df.empty:
+            self.add(event_hashes(event_df), _day_numbers(event_df))
+
+    def drop_days(self, days):
+        for day in days:
+            self.days.pop(day, None)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as fh:
+            pickle.dump(self.days, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """The saved set at `path`, or an empty set if there is none."""
+        hash_set = cls()
+        if os.path.exists(path):
+            with open(path, 'rb') as fh:
+                hash_set.days = pickle.load(fh)
+        return hash_set
+
+
+def drop_duplicate_events(event_df, hash_set=None):
+    """
+    Removes exact duplicate events, keeping the first occurrence and the original row order. With a
+    `hash_set`, events already in it are removed too and the kept events are added to it.
+    Returns (deduplicated_df, report) where report has 'events', 'duplicates' and 'previously_seen'.
+    """
+    report = {'events': len(event_df), 'duplicates': 0, 'previously_seen': 0}
+    if event_df.empty or not all(col in event_df.columns for col in EVENT_KEY_COLUMNS):
+        return event_df, report
+
+    hashes = event_hashes(event_df)
+    # Hash-table lookup, no sort: the first occurrence of each hash is kept.
+    duplicated = pd.Index(hashes).duplicated(keep='first')
+    report['duplicates'] = int(duplicated.sum())
+    if hash_set is not None:
+        day_numbers = _day_numbers(event_df)
+        seen = hash_set.contains(hashes, day_numbers) & ~duplicated
+        report['previously_seen'] = int(seen.sum())
+        duplicated |= seen
+        hash_set.add(hashes[~duplicated], day_numbers[~duplicated])
+
+    removed = report['duplicates'] + report['previously_seen']
+    seen_note = f" ({report['previously_seen']:,} already seen before)" if hash_set is not None else ""
+    print(f"Cleaning: Removed {removed:,} exact duplicate events of {len(event_df):,}{seen_note}.")
+    return (event_df[~duplicated] if removed else event_df), report
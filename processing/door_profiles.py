@@ -0,0 +1,145 @@
+# processing/door_profiles.py
+
+import numpy as np
+import pandas as pd
+
+from processing.model_aggregates import (TIMESTAMP_COL_DISPLAY, USERID_COL_DISPLAY, DOORID_COL_DISPLAY,
+                                         DATE_COL_NAME, DEPTH_COL_NAME)
+
+# Per-door activity profiles for the tap details, computed once from the enriched events.
+# Everything is held as arrays indexed by door code: fixed-width rows for counts and the hour/weekday
+# histograms, and CSR slices (offsets[i]:offsets[i + 1]) for the variable-length parts (depths seen,
+# top neighbours). Looking up a door is a hash lookup plus a few slices, whatever the number of doors.
+DOOR_PROFILE_CONFIG = {
+    'top_neighbours': 3,   # inbound/outbound doors kept per door
+}
+
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def _grouped_counts(group_codes, value_codes, num_groups, weights=None):
+    """
+    CSR (offsets, values, counts) of the distinct values per group, values ascending within a group.
+    Each row counts once, or `weights` times when given.
+    """
+    num_values = int(value_codes.max()) + 1 if len(value_codes) else 1
+    keys = group_codes.astype(np.int64) * num_values + value_codes
+    if weights is None:
+        keys, counts = np.unique(keys, return_counts=True)
+    else:
+        keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, weights=weights, minlength=len(keys)).astype(np.int64)
+    groups, values = keys // num_values, keys % num_values
+    offsets = np.searchsorted(groups, np.arange(num_groups + 1))
+    return offsets, values, counts
+
+
+def _top_neighbours(from_codes, to_codes, num_doors, top_k, weights=None):
+    """CSR (offsets, neighbour codes, counts) of the `top_k` most frequent neighbours of each door."""
+    offsets, neighbours, counts = _grouped_counts(from_codes, to_codes, num_doors, weights)
+    groups = np.repeat(np.arange(num_doors), np.diff(offsets))
+    order = np.lexsort((neighbours, -counts, groups))  # per door: most frequent first, ties by door order
+    rank = np.arange(len(order)) - offsets[groups[order]]
+    kept = order[rank < top_k]
+    kept_offsets = np.searchsorted(groups[kept], np.arange(num_doors + 1))
+    return kept_offsets, neighbours[kept].astype(np.int32), counts[kept]
+
+
+class DoorProfileIndex:
+    def __init__(self, enriched_event_df, top_k=None):
+        top_k = top_k or DOOR_PROFILE_CONFIG['top_neighbours']
+        df = enriched_event_df
+        door_codes, doors = pd.factorize(df[DOORID_COL_DISPLAY].astype(str), sort=True)
+        # Codes of sorted uniques keep the (user, date, depth) order, so the sequence sort runs on integers.
+        user_codes, _ = pd.factorize(df[USERID_COL_DISPLAY], sort=True)
+        date_codes, _ = pd.factorize(df[DATE_COL_NAME], sort=True)
+        depths = df[DEPTH_COL_NAME].to_numpy(dtype=np.int64)
+        timestamps = pd.to_datetime(df[TIMESTAMP_COL_DISPLAY])
+        num_doors = len(doors)
+
+        self.doors = pd.Index(doors)
+        self.event_counts = np.bincount(door_codes, minlength=num_doors)
+        self.user_counts = np.diff(_grouped_counts(door_codes, user_codes, num_doors)[0])
+        self.hourly = np.bincount(door_codes * 24 + timestamps.dt.hour.to_numpy(),
+                                  minlength=num_doors * 24).reshape(num_doors, 24).astype(np.int32)
+        self.weekday = np.bincount(door_codes * 7 + timestamps.dt.weekday.to_numpy(),
+                                   minlength=num_doors * 7).reshape(num_doors, 7).astype(np.int32)
+
+        # DeviceDepthPerDay histogram per door (what FinalGlobalDeviceDepth takes the mode of).
+        self.depth_offsets, self.depth_values, self.depth_counts = _grouped_counts(door_codes, depths, num_doors)
+
+        # Consecutive doors within a user-day, as in compute_model_aggregates.
+        order = np.lexsort((depths, date_codes, user_codes))
+        door_codes, user_codes, date_codes = door_codes[order], user_codes[order], date_codes[order]
+        same_sequence = (user_codes[:-1] == user_codes[1:]) & (date_codes[:-1] == date_codes[1:])
+        sources, targets = door_codes[:-1][same_sequence], door_codes[1:][same_sequence]
+        self.outbound_offsets, self.outbound_doors, self.outbound_counts = _top_neighbours(sources, targets, num_doors, top_k)
+        self.inbound_offsets, self.inbound_doors, self.inbound_counts = _top_neighbours(targets, sources, num_doors, top_k)
+
+    @classmethod
+    def merge(cls, profiles, top_k=None):
+        """
+        One index from indexes of disjoint sets of users (e.g. the shards of a sharded run). Their top
+        neighbour lists must be complete (built with top_k >= number of doors) for the merged ones to be exact.
+        """
+        top_k = top_k or DOOR_PROFILE_CONFIG['top_neighbours']
+        profiles = [p for p in profiles if len(p)]
+        merged = cls.__new__(cls)
+        merged.doors = pd.Index(sorted(set().union(*(p.doors for p in profiles))))
+        num_doors = len(merged.doors)
+        codes = [merged.doors.get_indexer(p.doors) for p in profiles]
+
+        def summed(name, width=None):
+            total = np.zeros(num_doors if width is None else (num_doors, width), dtype=np.int64)
+            for p, door_codes in zip(profiles, codes):
+                np.add.at(total, door_codes, getattr(p, name))
+            return total
+
+        def triples(offsets_name, values_name, counts_name, map_values):
+            """(door, value, count) rows of a CSR part of every index, on the merged door codes."""
+            rows = [(door_codes[np.repeat(np.arange(len(p)), np.diff(getattr(p, offsets_name)))],
+                     door_codes[getattr(p, values_name)] if map_values else getattr(p, values_name),
+                     getattr(p, counts_name)) for p, door_codes in zip(profiles, codes)]
+            if not rows:
+                return (np.zeros(0, dtype=np.int64),) * 3
+            return tuple(np.concatenate(part).astype(np.int64) for part in zip(*rows))
+
+        merged.event_counts = summed('event_counts')
+        merged.user_counts = summed('user_counts')  # users are disjoint across the indexes
+        merged.hourly = summed('hourly', 24).astype(np.int32)
+        merged.weekday = summed('weekday', 7).astype(np.int32)
+        door_codes, depths, counts = triples('depth_offsets', 'depth_values', 'depth_counts', False)
+        merged.depth_offsets, merged.depth_values, merged.depth_counts = _grouped_counts(door_codes, depths, num_doors, counts)
+        sources, targets, counts = triples('outbound_offsets', 'outbound_doors', 'outbound_counts', True)
+        merged.outbound_offsets, merged.outbound_doors, merged.outbound_counts = _top_neighbours(
+            sources, targets, num_doors, top_k, counts)
+        merged.inbound_offsets, merged.inbound_doors, merged.inbound_counts = _top_neighbours(
+            targets, sources, num_doors, top_k, counts)
+        return merged
+
+    def __len__(self):
+        return len(self.doors)
+
+    def _neighbours(self, offsets, codes, counts, door_code):
+        lo, hi = offsets[door_code], offsets[door_code + 1]
+        return [(self.doors[code], int(count)) for code, count in zip(codes[lo:hi], counts[lo:hi])]
+
+    def profile(self, door):
+        """Activity profile of `door` as a dict, or None if it has no events."""
+        try:
+            code = self.doors.get_loc(str(door))
+        except KeyError:
+            return None
+        depth_lo, depth_hi = self.depth_offsets[code], self.depth_offsets[code + 1]
+        return {
+            'events': int(self.event_counts[code]),
+            'users': int(self.user_counts[code]),
+            'hourly': self.hourly[code],
+            'weekday': self.weekday[code],
+            'peak_hour': int(self.hourly[code].argmax()),
+            'peak_weekday': WEEKDAY_NAMES[int(self.weekday[code].argmax())],
+            'top_inbound': self._neighbours(self.inbound_offsets, self.inbound_doors, self.inbound_counts, code),
+            'top_outbound': self._neighbours(self.outbound_offsets, self.outbound_doors, self.outbound_counts, code),
+            'depth_distribution': list(zip(self.depth_values[depth_lo:depth_hi].tolist(),
+                                           self.depth_counts[depth_lo:depth_hi].tolist())),
+        }
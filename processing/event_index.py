@@ -0,0 +1,106 @@
+# processing/event_index.py
+
+import numpy as np
+import pandas as pd
+
+from processing.model_aggregates import (compute_model_aggregates, build_onion_model_from_aggregates,
+                                         enriched_event_stats, TIMESTAMP_COL_DISPLAY, USERID_COL_DISPLAY,
+                                         DOORID_COL_DISPLAY)
+from processing.onion_model import empty_model_outputs
+from constants import REQUIRED_INTERNAL_COLUMNS
+
+# Cleaned (enriched) events kept sorted by timestamp, with the offset of each day's first event.
+# A date range is located with two binary searches, so the model and stats for any slice only
+# touch the k events inside it, and the cleaning/sequencing done for the full upload is reused as is.
+
+EVENTTYPE_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['EventType']
+# Repetitive string columns are held as categoricals while cached and turned back into strings per slice.
+_CATEGORY_COLUMNS = [USERID_COL_DISPLAY, DOORID_COL_DISPLAY, EVENTTYPE_COL_DISPLAY, 'EventType_UserDay']
+
+
+class EventTimeIndex:
+    def __init__(self, enriched_event_df, raw_event_df=None):
+        """
+        `enriched_event_df` is the pipeline's enriched frame (complete user-days); `raw_event_df`, the frame
+        fed to the pipeline, provides raw event counts for the stats panel.
+        """
+        timestamps = pd.to_datetime(enriched_event_df[TIMESTAMP_COL_DISPLAY]).to_numpy(dtype='datetime64[ns]')
+        order = np.argsort(timestamps, kind='stable')
+        events = enriched_event_df.iloc[order].reset_index(drop=True)
+        for col in _CATEGORY_COLUMNS:
+            if col in events.columns:
+                events[col] = events[col].astype('category')
+        self.events = events
+        self.timestamps = timestamps[order]
+
+        # days[i] starts at day_offsets[i]; day_offsets[-1] == number of events (CSR-style).
+        event_days = self.timestamps.astype('datetime64[D]')
+        self.days, first_positions = np.unique(event_days, return_index=True)
+        self.day_offsets = np.append(first_positions, len(self.timestamps))
+
+        raw_timestamps = self.timestamps if raw_event_df is None else \
+            pd.to_datetime(raw_event_df[TIMESTAMP_COL_DISPLAY], errors='coerce').dropna().to_numpy(dtype='datetime64[ns]')
+        self.raw_timestamps = np.sort(raw_timestamps)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def first_day(self):
+        return pd.Timestamp(self.days[0]).date() if len(self.days) else None
+
+    @property
+    def last_day(self):
+        return pd.Timestamp(self.days[-1]).date() if len(self.days) else None
+
+    @staticmethod
+    def _bounds(start, end):
+        """[start, end) as datetime64[ns]; a date-only `end` includes that whole day."""
+        lower = np.datetime64(pd.Timestamp(start), 'ns') if start is not None else None
+        upper = None
+        if end is not None:
+            end_ts = pd.Timestamp(end)
+            upper = np.datetime64(end_ts + pd.Timedelta(days=1), 'ns') if len(str(end)) <= 10 else np.datetime64(end_ts, 'ns') + 1
+        return lower, upper
+
+    def slice_positions(self, start=None, end=None):
+        """(lo, hi) event positions of [start, end] by binary search. Whole-day bounds use the day offsets."""
+        if len(str(start or '')) <= 10 and len(str(end or '')) <= 10:
+            lo = 0 if start is None else self.day_offsets[np.searchsorted(self.days, np.datetime64(pd.Timestamp(start).date(), 'D'))]
+            hi = len(self) if end is None else self.day_offsets[np.searchsorted(self.days, np.datetime64(pd.Timestamp(end).date(), 'D'), side='right')]
+            return int(lo), int(hi)
+        lower, upper = self._bounds(start, end)
+        lo = 0 if lower is None else np.searchsorted(self.timestamps, lower, side='left')
+        hi = len(self) if upper is None else np.searchsorted(self.timestamps, upper, side='left')
+        return int(lo), int(max(lo, hi))
+
+    def select(self, start=None, end=None):
+        """The enriched events in [start, end], with plain string columns (as produced by the pipeline)."""
+        lo, hi = self.slice_positions(start, end)
+        events = self.events.iloc[lo:hi].reset_index(drop=True)
+        for col in _CATEGORY_COLUMNS:
+            if col in events.columns:
+                events[col] = events[col].astype(str)
+        return events
+
+    def raw_event_count(self, start=None, end=None):
+        lower, upper = self._bounds(start, end)
+        lo = 0 if lower is None else np.searchsorted(self.raw_timestamps, lower, side='left')
+        hi = len(self.raw_timestamps) if upper is None else np.searchsorted(self.raw_timestamps, upper, side='left')
+        return int(max(0, hi - lo))
+
+    def range_model(self, config_params, start=None, end=None, confirmed_official_entrances=None,
+                    detailed_door_classifications=None):
+        """
+        Model and stats-panel values for the events in [start, end]; the stats are exact counts over the
+        slice. Returns (event_stats, device_attributes_df, path_viz_data_df, all_paths_df); event_stats is
+        None if the range is empty.
+        """
+        events = self.select(start, end)
+        aggregates = compute_model_aggregates(events)
+        aggregates['raw_event_count'] = self.raw_event_count(start, end)
+        if not aggregates['event_count']:
+            return (None,) + empty_model_outputs()
+        outputs = build_onion_model_from_aggregates(aggregates, config_params, confirmed_official_entrances,
+                                                    detailed_door_classifications)
+        return (enriched_event_stats(events, aggregates['raw_event_count']),) + outputs
@@ -7,7 +7,8 @@ GRAPH_PROCESSING_CONFIG = {
     'invalid_phrases_exact': ["INVALID ACCESS LEVEL"],
     'invalid_phrases_contain': ["NO ENTRY MADE"],
     'same_door_scan_threshold_seconds': 10,
-    'ping_pong_threshold_minutes': 1
+    'ping_pong_threshold_minutes': 1,
+    'drop_exact_duplicates': True
 }
 
 # graph_config.py
@@ -19,7 +20,8 @@ GRAPH_PROCESSING_CONFIG = {
     'invalid_phrases_exact': ["INVALID ACCESS LEVEL"],
     'invalid_phrases_contain': ["NO ENTRY MADE"],
     'same_door_scan_threshold_seconds': 10,
-    'ping_pong_threshold_minutes': 1
+    'ping_pong_threshold_minutes': 1,
+    'drop_exact_duplicates': True
 }
 
 # ✅ Add UI display constants here:
@@ -0,0 +1,158 @@
+# processing/incremental.py
+
+import os
+import pickle
+import datetime
+import pandas as pd
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+from processing.deduplication import EventHashSet, drop_duplicate_events
+from processing.onion_model import prepare_enriched_events, empty_model_outputs, normalize_door_ids
+from processing.model_aggregates import (compute_model_aggregates, merge_model_aggregates,
+                                         build_onion_model_from_aggregates, empty_model_aggregates, DATE_COL_NAME)
+
+# Incremental model updates: the mergeable aggregates are kept per calendar day, so a new daily export
+# only runs the pipeline on its own events. The state also keeps the per-day hashes of every event
+# folded in (an EventHashSet), so re-uploading a day or an overlapping export window only adds the
+# events that are new, and those are merged into the day's aggregates rather than replacing them.
+INCREMENTAL_CONFIG = {
+    'state_directory': os.environ.get('YOSAI_MODEL_STATE_DIR', os.path.join(os.getcwd(), 'model_state')),
+}
+
+# Settings that change how events are cleaned; per-day aggregates built with different values cannot be mixed.
+CLEANING_CONFIG_KEYS = ['drop_exact_duplicates', 'primary_positive_indicator', 'invalid_phrases_exact',
+                        'invalid_phrases_contain', 'same_door_scan_threshold_seconds', 'ping_pong_threshold_minutes']
+
+TIMESTAMP_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
+
+
+def _cleaning_config(config_params):
+    return {key: config_params.get(key) for key in CLEANING_CONFIG_KEYS}
+
+
+def empty_model_state(config_params):
+    return {'cleaning_config': _cleaning_config(config_params), 'days': {}, 'hashes': EventHashSet()}
+
+
+def _day_aggregates(raw_df, config_params):
+    """{day: aggregates} of a raw event frame; days whose events were all cleaned away are kept empty."""
+    raw_timestamps = pd.to_datetime(raw_df[TIMESTAMP_COL_DISPLAY], errors='coerce')
+    raw_counts_per_day = raw_timestamps.dt.date.value_counts()
+
+    enriched_df, completed = prepare_enriched_events(raw_df, config_params)
+    day_aggregates = {}
+    if completed:
+        for day, day_df in enriched_df.groupby(DATE_COL_NAME, sort=True):
+            day_aggregates[day] = compute_model_aggregates(day_df)
+    for day, raw_count in raw_counts_per_day.items():
+        day_aggregates.setdefault(day, empty_model_aggregates())['raw_event_count'] = int(raw_count)
+    return day_aggregates
+
+
+def update_model_state(state, new_raw_df, config_params):
+    """
+    Folds new raw events (display-name columns, as from load_csv_event_log) into `state`.
+    Events already folded in before (same user, door, timestamp and event type) are dropped, and only
+    the remaining ones are cleaned and sequenced; their per-day aggregates are merged into the days
+    already in the state. Cleaning steps that look across midnight (rapid scans, ping-pong) and the
+    user-day sequencing only see the events of the upload itself, so a user-day split across two
+    uploads is sequenced as two; replace_days_in_state recomputes such days from their full events.
+    Returns the sorted list of days that received new events.
+    """
+    if new_raw_df is None or new_raw_df.empty:
+        print("Warning: No new events to fold into the model state.")
+        return []
+    if state['cleaning_config'] != _cleaning_config(config_params):
+        raise ValueError("Cleaning settings differ from the ones the model state was built with; rebuild the state.")
+
+    # Door ids are hashed as the pipeline and the event store normalize them, so both feeds dedupe alike.
+    new_raw_df = normalize_door_ids(new_raw_df.copy(), door_id_col=DOORID_COL_DISPLAY)
+    new_raw_df, report = drop_duplicate_events(new_raw_df, state.setdefault('hashes', EventHashSet()))
+    if new_raw_df.empty:
+        print(f"Model state: all {report['events']:,} events were already folded in; nothing to update.")
+        return []
+
+    day_aggregates = _day_aggregates(new_raw_df, config_params)
+    merged = sorted(day for day in day_aggregates if day in state['days'])
+    for day in merged:
+        day_aggregates[day] = merge_model_aggregates([state['days'][day], day_aggregates[day]])
+    state['days'].update(day_aggregates)
+    print(f"Model state: folded {len(new_raw_df):,} new events into {len(day_aggregates)} day(s)"
+          f"{f', merged into {len(merged)} existing day(s)' if merged else ''}; {len(state['days'])} day(s) total.")
+    return sorted(day_aggregates)
+
+
+def replace_days_in_state(state, day_raw_df, days, config_params):
+    """
+    Replaces `days` in the state with the aggregates of `day_raw_df`, which must hold every event of
+    those days (e.g. read back from the event store). Returns the sorted list of replaced days.
+    """
+    if state['cleaning_config'] != _cleaning_config(config_params):
+        raise ValueError("Cleaning settings differ from the ones the model state was built with; rebuild the state.")
+    days = sorted(set(days))
+    remove_days_from_state(state, days)
+    if day_raw_df is None or day_raw_df.empty:
+        return days
+    day_raw_df = day_raw_df[pd.to_datetime(day_raw_df[TIMESTAMP_COL_DISPLAY], errors='coerce').dt.date.isin(days)]
+    # Hashed with normalized door ids, as update_model_state does, so later folds of these rows dedupe.
+    day_raw_df = normalize_door_ids(day_raw_df.copy(), door_id_col=DOORID_COL_DISPLAY)
+    day_aggregates = _day_aggregates(day_raw_df, config_params)
+    state['days'].update({day: day_aggregates[day] for day in days if day in day_aggregates})
+    state['hashes'].add_events(day_raw_df)
+    print(f"Model state: recomputed {len(days)} day(s) from their full events; {len(state['days'])} day(s) total.")
+    return days
+
+
+def remove_days_from_state(state, days):
+    for day in days:
+        state['days'].pop(day, None)
+    state.setdefault('hashes', EventHashSet()).drop_days(days)
+
+
+def model_from_state(state, config_params, confirmed_official_entrances=None, detailed_door_classifications=None,
+                     start=None, end=None):
+    """
+    Builds the model from the stored per-day aggregates, optionally limited to days in [start, end].
+    Returns (aggregates, device_attributes_df, path_viz_data_df, all_paths_df).
+    """
+    start_day = pd.Timestamp(start).date() if start is not None else datetime.date.min
+    end_day = pd.Timestamp(end).date() if end is not None else datetime.date.max
+    selected = [aggregates for day, aggregates in sorted(state['days'].items()) if start_day <= day <= end_day]
+    aggregates = merge_model_aggregates(selected)
+    if not aggregates['event_count']:
+        print("Warning: Model state has no events in the selected days.")
+        return (aggregates,) + empty_model_outputs()
+    return (aggregates,) + build_onion_model_from_aggregates(
+        aggregates, config_params, confirmed_official_entrances, detailed_door_classifications)
+
+
+# --- Persistence ---
+
+def _state_path(dataset, directory=None):
+    from data_io.event_store import dataset_path  # same dataset naming rules as the event store
+    return dataset_path(dataset, directory or INCREMENTAL_CONFIG['state_directory']) + '.model_state.pkl'
+
+
+def load_model_state(dataset, config_params, directory=None):
+    """Loads the saved state for `dataset`; returns a fresh state if none exists or the cleaning settings changed."""
+    path = _state_path(dataset, directory)
+    if not os.path.exists(path):
+        return empty_model_state(config_params)
+    with open(path, 'rb') as fh:
+        state = pickle.load(fh)
+    if state.get('cleaning_config') != _cleaning_config(config_params):
+        print(f"Warning: Model state for '{dataset}' was built with different cleaning settings; starting a new state.")
+        return empty_model_state(config_params)
+    state.setdefault('hashes', EventHashSet())
+    return state
+
+
+def save_model_state(state, dataset, directory=None):
+    path = _state_path(dataset, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as fh:
+        pickle.dump(state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path
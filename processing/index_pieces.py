@@ -0,0 +1,42 @@
+# processing/index_pieces.py
+
+from processing.model_aggregates import DOORID_COL_DISPLAY
+from processing.temporal_windows import TemporalModelIndex, day_model_aggregates, merge_day_aggregates
+from processing.journey_index import UserJourneyIndex
+from processing.door_profiles import DoorProfileIndex
+from processing.traffic_cube import TrafficCube
+
+# Indexes for the sharded and out-of-core pipelines, whose workers never hand the enriched events back.
+# Each worker reduces its users' events to mergeable pieces (per-day aggregates, a journey index, door
+# profiles with every neighbour kept and a traffic cube), and the pieces of all workers are merged into
+# the same indexes the in-memory path builds. Workers hold disjoint sets of users, so per-door user
+# counts add up exactly. Layer occupancy needs the final model's door layers before a stay can be cut,
+# and the date-range event index needs the events themselves, so neither is built from pieces: date
+# ranges fall back to the per-day aggregates (TemporalModelIndex.window_model).
+UNAVAILABLE_FROM_PIECES = ['occupancy', 'event_index']
+
+
+def enriched_index_pieces(enriched_event_df, raw_event_df=None):
+    """Mergeable index pieces of one worker's enriched events (and the raw events fed to it)."""
+    return {
+        'day_aggregates': day_model_aggregates(enriched_event_df, raw_event_df),
+        'journey_index': UserJourneyIndex(enriched_event_df),
+        # Complete neighbour lists, so the merged top neighbours are exact.
+        'door_profiles': DoorProfileIndex(enriched_event_df, top_k=max(1, enriched_event_df[DOORID_COL_DISPLAY].nunique())),
+        'traffic_cube': TrafficCube(enriched_event_df),
+    }
+
+
+def merge_index_pieces(pieces, device_attributes_df):
+    """{temporal_index, journey_index, door_profiles, traffic_cube} from the workers' pieces (None if there are none)."""
+    pieces = [piece for piece in pieces if piece]
+    if not pieces:
+        return {'temporal_index': None, 'journey_index': None, 'door_profiles': None, 'traffic_cube': None}
+    return {
+        'temporal_index': TemporalModelIndex(merge_day_aggregates(piece['day_aggregates'] for piece in pieces)),
+        # Pieces may have dropped their journey index (OUT_OF_CORE_CONFIG['max_journey_events']).
+        'journey_index': UserJourneyIndex.merge(piece['journey_index'] for piece in pieces)
+        if all(piece['journey_index'] is not None for piece in pieces) else None,
+        'door_profiles': DoorProfileIndex.merge(piece['door_profiles'] for piece in pieces),
+        'traffic_cube': TrafficCube.merge([piece['traffic_cube'] for piece in pieces], device_attributes_df),
+    }
@@ -0,0 +1,108 @@
+# processing/journey_index.py
+
+import numpy as np
+import pandas as pd
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+
+# Cleaned events sorted by (user, timestamp) with CSR offsets: user i's events are rows
+# offsets[i]:offsets[i + 1]. A journey lookup is a hash lookup of the user plus a slice, and one day
+# of it is a binary search inside that slice, so no query ever scans the event frame.
+
+TIMESTAMP_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+USERID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['UserID']
+DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
+_ONE_DAY = np.timedelta64(1, 'D')
+
+JOURNEY_INDEX_CONFIG = {
+    'max_user_matches': 50,   # users offered per search in the journey picker
+}
+
+
+class UserJourneyIndex:
+    def __init__(self, enriched_event_df):
+        user_codes, users = pd.factorize(enriched_event_df[USERID_COL_DISPLAY].astype(str), sort=True)
+        door_codes, doors = pd.factorize(enriched_event_df[DOORID_COL_DISPLAY].astype(str), sort=True)
+        timestamps = pd.to_datetime(enriched_event_df[TIMESTAMP_COL_DISPLAY]).to_numpy(dtype='datetime64[ns]')
+
+        order = np.lexsort((timestamps, user_codes))
+        self.users = pd.Index(users)
+        self.doors = pd.Index(doors)
+        self.timestamps = timestamps[order]
+        self.door_codes = door_codes[order].astype(np.int32)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(user_codes, minlength=len(users)))])
+
+    @classmethod
+    def merge(cls, indexes):
+        """One index from indexes of disjoint sets of users (e.g. the shards of a sharded run)."""
+        indexes = [index for index in indexes if len(index.users)]
+        merged = cls.__new__(cls)
+        merged.doors = pd.Index(sorted(set().union(*(index.doors for index in indexes))))
+        if not indexes:
+            merged.users = pd.Index([])
+            merged.timestamps = np.zeros(0, dtype='datetime64[ns]')
+            merged.door_codes = np.zeros(0, dtype=np.int32)
+            merged.offsets = np.zeros(1, dtype=np.int64)
+            return merged
+
+        users = np.concatenate([index.users.to_numpy(dtype=object) for index in indexes])
+        lengths = np.concatenate([np.diff(index.offsets) for index in indexes])
+        bases = np.cumsum([0] + [len(index.timestamps) for index in indexes[:-1]])
+        starts = np.concatenate([index.offsets[:-1] + base for index, base in zip(indexes, bases)])
+        timestamps = np.concatenate([index.timestamps for index in indexes])
+        door_codes = np.concatenate([merged.doors.get_indexer(index.doors)[index.door_codes] for index in indexes])
+
+        # Users in sorted order, each taking its slice of the concatenated rows.
+        order = np.argsort(users, kind='stable')
+        lengths = lengths[order]
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        rows = np.repeat(starts[order] - offsets[:-1], lengths) + np.arange(offsets[-1])
+        merged.users = pd.Index(users[order])
+        merged.timestamps = timestamps[rows]
+        merged.door_codes = door_codes[rows].astype(np.int32)
+        merged.offsets = offsets
+        return merged
+
+    def __contains__(self, user):
+        return str(user) in self.users
+
+    def users_with_prefix(self, prefix, limit=None):
+        """Up to `limit` users whose id starts with `prefix`, in order (a binary search in the sorted users)."""
+        limit = limit or JOURNEY_INDEX_CONFIG['max_user_matches']
+        lo = int(self.users.searchsorted(str(prefix or ''), side='left'))
+        candidates = self.users[lo:lo + limit]
+        return [user for user in candidates if user.startswith(str(prefix or ''))]
+
+    def _user_rows(self, user, day=None):
+        """(lo, hi) rows of `user`, optionally limited to one calendar day; (0, 0) for unknown users."""
+        try:
+            code = self.users.get_loc(str(user))
+        except KeyError:
+            return 0, 0
+        lo, hi = int(self.offsets[code]), int(self.offsets[code + 1])
+        if day is not None:
+            day_start = np.datetime64(pd.Timestamp(day).date(), 'ns')
+            user_timestamps = self.timestamps[lo:hi]
+            lo, hi = (lo + int(np.searchsorted(user_timestamps, day_start, side='left')),
+                      lo + int(np.searchsorted(user_timestamps, day_start + _ONE_DAY, side='left')))
+        return lo, hi
+
+    def journey_days(self, user):
+        """Days on which `user` has events, in order."""
+        lo, hi = self._user_rows(user)
+        return [pd.Timestamp(d).date() for d in np.unique(self.timestamps[lo:hi].astype('datetime64[D]'))]
+
+    def journey(self, user, day=None):
+        """The user's events (timestamp, door) in time order, for all days or one `day`."""
+        lo, hi = self._user_rows(user, day)
+        return pd.DataFrame({TIMESTAMP_COL_DISPLAY: self.timestamps[lo:hi],
+                             DOORID_COL_DISPLAY: self.doors[self.door_codes[lo:hi]]})
+
+    def journey_transitions(self, user, day=None):
+        """Consecutive (source, target) door moves within each day of the journey, in order."""
+        lo, hi = self._user_rows(user, day)
+        days = self.timestamps[lo:hi].astype('datetime64[D]')
+        codes = self.door_codes[lo:hi]
+        same_day = days[:-1] == days[1:]
+        sources, targets = self.doors[codes[:-1][same_day]], self.doors[codes[1:][same_day]]
+        return list(zip(sources, targets))
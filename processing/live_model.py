@@ -0,0 +1,232 @@
+# processing/live_model.py
+
+import json
+import time
+import uuid
+import threading
+import pandas as pd
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+from data_io.csv_loader import standardize_event_frame
+from data_io.live_tail import CsvTailFollower, start_follower_thread
+from processing.onion_model import prepare_enriched_events
+from processing.model_aggregates import (compute_model_aggregates, merge_model_aggregates,
+                                         build_onion_model_from_aggregates, empty_model_aggregates)
+from processing.out_of_core import user_partition_ids
+from processing.incremental import empty_model_state, update_model_state
+from processing.cytoscape_prep import prepare_cytoscape_elements
+
+# Tailed events are kept in user-hash buckets. A refresh re-runs the pipeline only for buckets that
+# received events since the previous refresh, and refreshes are throttled, so a burst of events costs
+# at most one recomputation of the touched buckets per 'min_refresh_seconds'. The recomputation is not
+# limited to the new rows: cleaning and user-day sequencing look at a user's whole day, so every buffered
+# event of a touched bucket is re-run (about 1/num_buckets of the last 'max_buffered_days' per bucket).
+# Raising 'num_buckets' makes a refresh cheaper at the cost of more, smaller pipeline runs.
+LIVE_MODEL_CONFIG = {
+    'num_buckets': 32,
+    'min_refresh_seconds': 5.0,
+    # Older days are folded into the per-day model state and their raw rows dropped from the buffers.
+    'max_buffered_days': 1,
+    # Follower threads per server process: the least recently polled session is stopped beyond this,
+    # and sessions no client has polled for 'idle_seconds' are stopped too.
+    'max_sessions': 4,
+    'idle_seconds': 300,
+}
+
+TIMESTAMP_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+USERID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['UserID']
+
+
+def diff_elements(old_elements, new_elements):
+    """
+    Index -> element changes between two Cytoscape element lists with the same ids in the same order,
+    or None when nodes/edges were added, removed or reordered (the caller then sends the full list).
+    """
+    if len(old_elements) != len(new_elements):
+        return None
+    changes = {}
+    for index, (old, new) in enumerate(zip(old_elements, new_elements)):
+        if old['data'].get('id') != new['data'].get('id'):
+            return None
+        if old != new:
+            changes[index] = new
+    return changes
+
+
+class LiveModelSession:
+    def __init__(self, source, column_mapping, config_params, base_state=None,
+                 confirmed_official_entrances=None, detailed_door_classifications=None):
+        self.source = source
+        self.column_mapping = column_mapping
+        self.config_params = config_params
+        self.confirmed_official_entrances = confirmed_official_entrances
+        self.detailed_door_classifications = detailed_door_classifications
+        self.base_state = base_state or empty_model_state(config_params)
+
+        num_buckets = LIVE_MODEL_CONFIG['num_buckets']
+        self._bucket_events = [[] for _ in range(num_buckets)]
+        self._bucket_aggregates = [empty_model_aggregates() for _ in range(num_buckets)]
+        self._dirty_buckets = set()
+        self._buffered_days = set()
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()            # buffers and bucket aggregates
+        self._snapshot_lock = threading.Lock()   # published elements/status, read by callbacks
+        self.session_id = uuid.uuid4().hex
+
+        self.version = 0
+        self.elements = []
+        self.previous_version = None
+        self.previous_elements = []
+        self.status = "Waiting for events..."
+        self.follower = CsvTailFollower(source)
+        self._stop_event = None
+        self.clients = 0
+        self.last_polled = time.monotonic()
+
+    def start(self):
+        if self._stop_event is None:
+            print(f"DEBUG: Live tail started for '{self.source}'.")
+            self._stop_event = start_follower_thread(self.follower, self.on_new_rows, on_error=self.on_follower_error)
+
+    def stop(self):
+        if self._stop_event is not None:
+            print(f"DEBUG: Live tail stopped for '{self.source}'.")
+            self._stop_event.set()
+            self._stop_event = None
+
+    def on_new_rows(self, raw_rows):
+        """Follower callback (runs on the watcher thread): buffer new rows, then refresh if due."""
+        if raw_rows is not None and not raw_rows.empty:
+            self.add_events(raw_rows)
+        self.refresh()
+
+    def on_follower_error(self, error):
+        """Follower callback for a failed poll: the status read by the callbacks reports it until the next refresh."""
+        with self._snapshot_lock:
+            self.status = f"Live tail error: {error}. Still following the log..."
+
+    def add_events(self, raw_rows):
+        event_df = standardize_event_frame(raw_rows, self.column_mapping)
+        if event_df is None or event_df.empty:
+            return
+        bucket_ids = user_partition_ids(event_df[USERID_COL_DISPLAY], len(self._bucket_events))
+        with self._lock:
+            self._buffered_days.update(event_df[TIMESTAMP_COL_DISPLAY].dt.date.unique())
+            for bucket_id, bucket_df in event_df.groupby(bucket_ids, sort=False):
+                self._bucket_events[bucket_id].append(bucket_df)
+                self._dirty_buckets.add(bucket_id)
+
+    def _fold_old_days(self):
+        """Moves buffered days beyond 'max_buffered_days' into the per-day base state."""
+        if len(self._buffered_days) <= LIVE_MODEL_CONFIG['max_buffered_days']:
+            return
+        days = sorted(self._buffered_days)
+        old_days = days[:-LIVE_MODEL_CONFIG['max_buffered_days']]
+        self._buffered_days = set(days[-LIVE_MODEL_CONFIG['max_buffered_days']:])
+        frames = [pd.concat(events, ignore_index=True) if events else None for events in self._bucket_events]
+        old_rows = []
+        for bucket_id, df in enumerate(frames):
+            if df is None:
+                continue
+            is_old = df[TIMESTAMP_COL_DISPLAY].dt.date.isin(old_days)
+            if is_old.any():
+                old_rows.append(df[is_old])
+                self._bucket_events[bucket_id] = [df[~is_old]]
+                self._dirty_buckets.add(bucket_id)
+        update_model_state(self.base_state, pd.concat(old_rows, ignore_index=True), self.config_params)
+
+    def refresh(self, force=False):
+        """Recomputes dirty buckets and the graph elements; throttled unless `force`. Returns True if refreshed."""
+        with self._lock:
+            if not self._dirty_buckets or (not force and time.monotonic() - self._last_refresh < LIVE_MODEL_CONFIG['min_refresh_seconds']):
+                return False
+            self._last_refresh = time.monotonic()
+            self._fold_old_days()
+            dirty, self._dirty_buckets = sorted(self._dirty_buckets), set()
+            for bucket_id in dirty:
+                events = self._bucket_events[bucket_id]
+                bucket_df = pd.concat(events, ignore_index=True)
+                self._bucket_events[bucket_id] = [bucket_df]  # keep one compact frame per bucket
+                enriched_df, completed = prepare_enriched_events(bucket_df, self.config_params)
+                self._bucket_aggregates[bucket_id] = compute_model_aggregates(enriched_df) if completed else empty_model_aggregates()
+                self._bucket_aggregates[bucket_id]['raw_event_count'] = len(bucket_df)
+            live_aggregates = merge_model_aggregates(self._bucket_aggregates)
+
+        # Stored days that are also being tailed are replaced by the live events.
+        history = [aggregates for day, aggregates in self.base_state['days'].items() if day not in live_aggregates['dates']]
+        aggregates = merge_model_aggregates(history + [live_aggregates])
+        if not aggregates['event_count']:
+            return False
+        device_attrs, path_viz, all_paths = build_onion_model_from_aggregates(
+            aggregates, self.config_params, self.confirmed_official_entrances, self.detailed_door_classifications)
+        nodes, edges = prepare_cytoscape_elements(device_attrs, path_viz, all_paths)
+        new_elements = nodes + edges
+
+        with self._snapshot_lock:
+            if new_elements != self.elements:
+                self.previous_version, self.previous_elements = self.version, self.elements
+                self.version += 1
+                self.elements = new_elements
+            self.status = (f"Live: {aggregates['raw_event_count']:,} events, ~{aggregates['stats'].distinct_users():,} tokens, "
+                           f"last event {aggregates['max_timestamp']:%d.%m.%Y %H:%M:%S}.")
+        return True
+
+    def snapshot(self):
+        self.last_polled = time.monotonic()
+        with self._snapshot_lock:
+            return {'version': self.version, 'elements': self.elements, 'status': self.status,
+                    'previous_version': self.previous_version, 'previous_elements': self.previous_elements}
+
+
+_LIVE_SESSIONS = {}
+_LIVE_SESSIONS_GUARD = threading.Lock()
+
+
+def _evict_sessions(keep_key=None):
+    """Stops idle sessions and the least recently polled ones beyond 'max_sessions' (caller holds the guard)."""
+    now = time.monotonic()
+    for key, session in list(_LIVE_SESSIONS.items()):
+        if key != keep_key and now - session.last_polled > LIVE_MODEL_CONFIG['idle_seconds']:
+            _LIVE_SESSIONS.pop(key).stop()
+    by_age = sorted((key for key in _LIVE_SESSIONS if key != keep_key), key=lambda k: _LIVE_SESSIONS[k].last_polled)
+    overflow = len(_LIVE_SESSIONS) - LIVE_MODEL_CONFIG['max_sessions']
+    for key in by_age[:max(overflow, 0)]:
+        _LIVE_SESSIONS.pop(key).stop()
+
+
+def get_live_session(source, column_mapping, config_params, confirmed_official_entrances=None,
+                     detailed_door_classifications=None):
+    """
+    One running session per (source, mapping, config, classifications) in this server process, shared by
+    all clients. Each call counts as one client until release_live_session.
+    """
+    key = json.dumps([source, column_mapping, config_params, confirmed_official_entrances, detailed_door_classifications],
+                     sort_keys=True, default=str)
+    with _LIVE_SESSIONS_GUARD:
+        session = _LIVE_SESSIONS.get(key)
+        if session is None:
+            session = LiveModelSession(source, column_mapping, config_params,
+                                       confirmed_official_entrances=confirmed_official_entrances,
+                                       detailed_door_classifications=detailed_door_classifications)
+            _LIVE_SESSIONS[key] = session
+            session.start()
+        session.clients += 1
+        session.last_polled = time.monotonic()
+        _evict_sessions(keep_key=key)
+        return session
+
+
+def release_live_session(session_id):
+    """Drops one client of the session; the session is stopped when it was the last one."""
+    with _LIVE_SESSIONS_GUARD:
+        for key, session in list(_LIVE_SESSIONS.items()):
+            if session.session_id == session_id:
+                session.clients -= 1
+                if session.clients <= 0:
+                    _LIVE_SESSIONS.pop(key).stop()
+                return
+
+
+def find_live_session(session_id):
+    with _LIVE_SESSIONS_GUARD:
+        return next((s for s in _LIVE_SESSIONS.values() if s.session_id == session_id), None)
@@ -0,0 +1,241 @@
+# processing/model_aggregates.py
+
+import numpy as np
+import pandas as pd
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+from processing.onion_model import (summarize_transition_counts, resolve_official_entrances,
+                                     assemble_onion_model, empty_model_outputs)
+from processing.stats_sketches import EventStatsSketch
+
+# Modules 2 and 3 only need a few counts from the enriched events. Those counts are computed here per
+# user-complete subset (a partition, a shard, a batch of days) and summed, so the model can be built
+# without ever holding the full enriched frame. Ties are broken with the same "first appearance in
+# (user, date, depth) order" rule the in-memory pipeline follows, which keeps the outputs identical.
+
+TIMESTAMP_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+USERID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['UserID']
+DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
+DATE_COL_NAME = 'Date'
+DEPTH_COL_NAME = 'DeviceDepthPerDay'
+
+SEQUENCE_KEY_COLUMNS = [USERID_COL_DISPLAY, DATE_COL_NAME, DEPTH_COL_NAME]
+
+
+def empty_model_aggregates():
+    return {
+        # Histogram of DeviceDepthPerDay per door (over all doors; entrances are excluded at build time).
+        'depth_counts': pd.DataFrame(columns=[DOORID_COL_DISPLAY, DEPTH_COL_NAME, 'Count']),
+        # Consecutive door pairs within a user-day.
+        'transition_counts': pd.DataFrame(columns=['SourceDoor', 'TargetDoor', 'TransitionFrequency']),
+        # First event of each user-day, with the (user, date) of its first occurrence for tie-breaking.
+        'first_event_counts': pd.DataFrame(columns=[DOORID_COL_DISPLAY, 'Count', USERID_COL_DISPLAY, DATE_COL_NAME]),
+        # Earliest (user, date, depth) at which each door appears: the device row order.
+        'door_first_seen': pd.DataFrame(columns=[DOORID_COL_DISPLAY] + SEQUENCE_KEY_COLUMNS),
+        'event_count': 0,        # enriched (cleaned) events
+        'raw_event_count': 0,    # events fed to the pipeline, set by the caller that owns the raw rows
+        'min_timestamp': pd.NaT,
+        'max_timestamp': pd.NaT,
+        'dates': set(),
+        # Distinct users and events per day, in bounded memory.
+        'stats': EventStatsSketch(),
+    }
+
+
+def compute_model_aggregates(enriched_event_df):
+    """
+    Reduces an enriched event frame (output of prepare_enriched_events) to mergeable aggregates.
+    The frame must contain complete user-days; any subset of users is fine.
+    """
+    aggregates = empty_model_aggregates()
+    if enriched_event_df is None or enriched_event_df.empty:
+        return aggregates
+
+    df = enriched_event_df[[TIMESTAMP_COL_DISPLAY, DOORID_COL_DISPLAY] + SEQUENCE_KEY_COLUMNS].sort_values(
+        SEQUENCE_KEY_COLUMNS, kind='stable', ignore_index=True)
+    df[DOORID_COL_DISPLAY] = df[DOORID_COL_DISPLAY].astype(str)
+
+    aggregates['depth_counts'] = df.groupby([DOORID_COL_DISPLAY, DEPTH_COL_NAME]).size().reset_index(name='Count')
+
+    # Next door within the same user-day, from shifted arrays instead of a per-group shift.
+    users = df[USERID_COL_DISPLAY].to_numpy()
+    dates = df[DATE_COL_NAME].to_numpy()
+    doors = df[DOORID_COL_DISPLAY].to_numpy()
+    same_sequence = (users[:-1] == users[1:]) & (dates[:-1] == dates[1:])
+    transitions = pd.DataFrame({'SourceDoor': doors[:-1][same_sequence], 'TargetDoor': doors[1:][same_sequence]})
+    aggregates['transition_counts'] = transitions.groupby(['SourceDoor', 'TargetDoor']).size().reset_index(name='TransitionFrequency')
+
+    first_events = df[df[DEPTH_COL_NAME] == 1]
+    first_seen_entry = first_events.drop_duplicates(DOORID_COL_DISPLAY)[[DOORID_COL_DISPLAY, USERID_COL_DISPLAY, DATE_COL_NAME]]
+    entry_counts = first_events.groupby(DOORID_COL_DISPLAY).size().rename('Count').reset_index()
+    aggregates['first_event_counts'] = entry_counts.merge(first_seen_entry, on=DOORID_COL_DISPLAY, how='left')
+
+    aggregates['door_first_seen'] = df.drop_duplicates(DOORID_COL_DISPLAY)[[DOORID_COL_DISPLAY] + SEQUENCE_KEY_COLUMNS].reset_index(drop=True)
+
+    aggregates['event_count'] = len(df)
+    aggregates['min_timestamp'] = df[TIMESTAMP_COL_DISPLAY].min()
+    aggregates['max_timestamp'] = df[TIMESTAMP_COL_DISPLAY].max()
+    aggregates['dates'] = set(pd.unique(dates))
+    aggregates['stats'] = EventStatsSketch().update(users, dates)
+    return aggregates
+
+
+def _earliest_rows(frames, key_columns):
+    """Concatenates frames and keeps, per door, the row with the smallest sort key."""
+    combined = pd.concat(frames, ignore_index=True)
+    return combined.sort_values(key_columns, kind='stable').drop_duplicates(DOORID_COL_DISPLAY).reset_index(drop=True)
+
+
+def merge_model_aggregates(aggregates_list):
+    """Sums a list of aggregates (as returned by compute_model_aggregates) into one."""
+    raw_event_count = sum(a.get('raw_event_count', 0) for a in aggregates_list if a)
+    parts = [a for a in aggregates_list if a and a['event_count']]
+    if not parts:
+        return dict(empty_model_aggregates(), raw_event_count=raw_event_count)
+    if len(parts) == 1:
+        return dict(parts[0], raw_event_count=raw_event_count)
+
+    depth_counts = pd.concat([p['depth_counts'] for p in parts], ignore_index=True)
+    transition_counts = pd.concat([p['transition_counts'] for p in parts], ignore_index=True)
+    first_event_counts = [p['first_event_counts'] for p in parts if not p['first_event_counts'].empty]
+
+    merged = {
+        'depth_counts': depth_counts.groupby([DOORID_COL_DISPLAY, DEPTH_COL_NAME])['Count'].sum().reset_index(),
+        'transition_counts': transition_counts.groupby(['SourceDoor', 'TargetDoor'])['TransitionFrequency'].sum().reset_index(),
+        'door_first_seen': _earliest_rows([p['door_first_seen'] for p in parts], SEQUENCE_KEY_COLUMNS),
+        'event_count': sum(p['event_count'] for p in parts),
+        'raw_event_count': raw_event_count,
+        'min_timestamp': min(p['min_timestamp'] for p in parts),
+        'max_timestamp': max(p['max_timestamp'] for p in parts),
+        'dates': set().union(*(p['dates'] for p in parts)),
+        'stats': EventStatsSketch.merged(p.get('stats') for p in parts),
+    }
+    if first_event_counts:
+        totals = pd.concat(first_event_counts, ignore_index=True).groupby(DOORID_COL_DISPLAY)['Count'].sum()
+        earliest = _earliest_rows(first_event_counts, [USERID_COL_DISPLAY, DATE_COL_NAME]).drop(columns='Count')
+        merged['first_event_counts'] = earliest.merge(totals.reset_index(), on=DOORID_COL_DISPLAY)[
+            [DOORID_COL_DISPLAY, 'Count', USERID_COL_DISPLAY, DATE_COL_NAME]]
+    else:
+        merged['first_event_counts'] = empty_model_aggregates()['first_event_counts']
+    return merged
+
+
+# --- Model building from aggregates (mirrors Modules 1-3 of onion_model) ---
+
+def heuristic_entrances_from_aggregates(aggregates, top_n_entrances=5):
+    """Equivalent of determine_heuristic_entrances: most frequent first doors of a user-day."""
+    print(f"\nDetermining heuristic entrances from aggregates (top {top_n_entrances})...")
+    counts = aggregates['first_event_counts']
+    if counts.empty:
+        return []
+    ranked = counts.sort_values([USERID_COL_DISPLAY, DATE_COL_NAME], kind='stable') \
+                   .sort_values('Count', ascending=False, kind='stable')
+    heuristic_entrance_list = ranked[DOORID_COL_DISPLAY].head(top_n_entrances).tolist()
+    print(f"Heuristic official entrances: {heuristic_entrance_list}")
+    return heuristic_entrance_list
+
+
+def device_depths_from_aggregates(aggregates, official_entrance_door_ids):
+    """Equivalent of calculate_final_global_device_depths, using the depth histograms."""
+    print("\nCalculating Final Global Device Depths from aggregates...")
+    standardized_official_entrances = {str(d_id).upper().strip() for d_id in official_entrance_door_ids}
+    all_devices = ordered_devices_from_aggregates(aggregates)
+
+    depth_counts = aggregates['depth_counts']
+    depth_counts = depth_counts[~depth_counts[DOORID_COL_DISPLAY].isin(standardized_official_entrances)]
+    # Mode per door; on equal counts the smallest depth wins, as with scipy.stats.mode.
+    modes = depth_counts.sort_values([DOORID_COL_DISPLAY, 'Count', DEPTH_COL_NAME], ascending=[True, False, True]) \
+                        .drop_duplicates(DOORID_COL_DISPLAY).set_index(DOORID_COL_DISPLAY)[DEPTH_COL_NAME]
+
+    device_layer_info_list = []
+    for device_id in all_devices:
+        is_official_entrance = device_id in standardized_official_entrances
+        if is_official_entrance:
+            final_depth = 1
+        elif device_id in modes.index:
+            final_depth = int(modes[device_id]) + 1
+        else:
+            final_depth = 99
+            print(f"Info: Device '{device_id}' using fallback depth {final_depth} (was -1 or -2).")
+        device_layer_info_list.append({
+            DOORID_COL_DISPLAY: device_id, 'FinalGlobalDeviceDepth': final_depth,
+            'IsOfficialEntrance': is_official_entrance})
+    return pd.DataFrame(device_layer_info_list)
+
+
+def ordered_devices_from_aggregates(aggregates):
+    """Doors in order of first appearance, matching enriched_event_df[door].unique()."""
+    first_seen = aggregates['door_first_seen'].sort_values(SEQUENCE_KEY_COLUMNS, kind='stable')
+    return first_seen[DOORID_COL_DISPLAY].to_numpy(dtype=object)
+
+
+def transition_paths_from_aggregates(aggregates):
+    """Equivalent of find_most_common_next_doors: returns (all_paths_df, most_common_next_df)."""
+    print("\nFinding Most Common Next Doors from aggregates...")
+    counts = aggregates['transition_counts']
+    if counts.empty:
+        print("No transitions found after identifying next doors.")
+        return pd.DataFrame(columns=['SourceDoor', 'TargetDoor', 'TransitionFrequency']), \
+               pd.DataFrame(columns=['SourceDoor', 'MostCommonNextDoor', 'FrequencyOfMostCommon'])
+    path_frequencies = counts.sort_values(['SourceDoor', 'TargetDoor'], ignore_index=True)
+    path_frequencies['TransitionFrequency'] = path_frequencies['TransitionFrequency'].astype(np.int64)
+    return summarize_transition_counts(path_frequencies)
+
+
+def build_onion_model_from_aggregates(aggregates, config_params, confirmed_official_entrances=None,
+                                      detailed_door_classifications=None):
+    """
+    Modules 2-4 from merged aggregates. Returns (device_attributes_df, path_viz_data_df, all_paths_df),
+    identical to what run_onion_model_processing returns for the same events.
+    """
+    if not aggregates['event_count']:
+        print("Error: No enriched events in the aggregates. Exiting pipeline.")
+        return empty_model_outputs()
+
+    official_entrance_door_ids = resolve_official_entrances(
+        confirmed_official_entrances,
+        lambda: heuristic_entrances_from_aggregates(aggregates, config_params.get('top_n_heuristic_entrances', 3))
+    )
+    device_attributes_df = device_depths_from_aggregates(aggregates, official_entrance_door_ids)
+    all_paths_df, most_common_paths_df = transition_paths_from_aggregates(aggregates)
+    return assemble_onion_model(device_attributes_df, all_paths_df, most_common_paths_df, official_entrance_door_ids,
+                                ordered_devices_from_aggregates(aggregates), detailed_door_classifications)
+
+
+def aggregate_summary_stats(aggregates, top_n_doors=5):
+    """
+    Stats panel values (date range, days, distinct users, busiest doors) from the aggregates, without
+    the event frame. Door counts are exact (summed from the depth histograms); distinct users are an
+    estimate from the stats sketch.
+    """
+    stats = aggregates['stats']
+    door_events = aggregates['depth_counts'].groupby(DOORID_COL_DISPLAY)['Count'].sum()
+    return {
+        'raw_event_count': aggregates['raw_event_count'],
+        'event_count': aggregates['event_count'],
+        'min_timestamp': aggregates['min_timestamp'],
+        'max_timestamp': aggregates['max_timestamp'],
+        'days': len(stats.day_counts),
+        'users': stats.distinct_users(),
+        'users_estimated': True,
+        'top_doors': [(door, int(count)) for door, count in
+                      door_events.sort_values(ascending=False, kind='stable').head(top_n_doors).items()],
+    }
+
+
+def enriched_event_stats(enriched_df, raw_event_count):
+    """Stats panel figures of the cleaned events (same keys as aggregate_summary_stats)."""
+    timestamp_col, user_col, door_col = TIMESTAMP_COL_DISPLAY, USERID_COL_DISPLAY, DOORID_COL_DISPLAY
+    event_stats = {'raw_event_count': raw_event_count, 'min_timestamp': pd.NaT, 'max_timestamp': pd.NaT,
+                   'days': 0, 'users': 0, 'top_doors': []}
+    if not enriched_df.empty and timestamp_col in enriched_df.columns:
+        if not pd.api.types.is_datetime64_any_dtype(enriched_df[timestamp_col]):
+            enriched_df[timestamp_col] = pd.to_datetime(enriched_df[timestamp_col], errors='coerce')
+        event_stats['min_timestamp'] = enriched_df[timestamp_col].min()
+        event_stats['max_timestamp'] = enriched_df[timestamp_col].max()
+        event_stats['days'] = enriched_df[timestamp_col].dt.date.nunique()
+        if user_col in enriched_df.columns:
+            event_stats['users'] = enriched_df[user_col].nunique()
+        if door_col in enriched_df.columns:
+            event_stats['top_doors'] = list(enriched_df[door_col].value_counts().nlargest(5).items())
+    return event_stats
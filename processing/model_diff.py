@@ -0,0 +1,204 @@
+# processing/model_diff.py
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+
+# Two models are compared on one shared door index: per-door attributes become aligned arrays
+# (one slot per door code) and transitions become sparse door x door frequency matrices, so every
+# comparison is an array or sparse-matrix operation instead of a row-wise DataFrame merge.
+MODEL_DIFF_CONFIG = {
+    'max_frequency_changes': 20,   # largest frequency shifts of transitions present in both models
+}
+
+DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
+LAYER_COL = 'FinalGlobalDeviceDepth'
+NEXT_DOOR_COL = 'MostCommonNextDoor'
+
+
+def door_index(*device_attribute_frames):
+    """Sorted union of the doors of all models; a door's position is its code in every aligned array."""
+    doors = set()
+    for device_attrs in device_attribute_frames:
+        if device_attrs is not None and not device_attrs.empty:
+            doors.update(device_attrs[DOORID_COL_DISPLAY].astype(str))
+    return pd.Index(sorted(doors))
+
+
+def aligned_door_values(device_attrs, doors, column, fill_value):
+    """Values of `column` as an array aligned to `doors`; doors missing from the model get `fill_value`."""
+    values = np.full(len(doors), fill_value, dtype=object)
+    if device_attrs is None or device_attrs.empty or column not in device_attrs.columns:
+        return values
+    codes = doors.get_indexer(device_attrs[DOORID_COL_DISPLAY].astype(str))
+    values[codes] = device_attrs[column].where(device_attrs[column].notna(), fill_value).to_numpy(dtype=object)
+    return values
+
+
+def transition_matrix(all_paths_df, doors):
+    """Sparse (source code, target code) -> transition frequency matrix over `doors`."""
+    n = len(doors)
+    if all_paths_df is None or all_paths_df.empty:
+        return sparse.csr_matrix((n, n), dtype=np.int64)
+    rows = doors.get_indexer(all_paths_df['SourceDoor'].astype(str))
+    cols = doors.get_indexer(all_paths_df['TargetDoor'].astype(str))
+    known = (rows >= 0) & (cols >= 0)
+    frequencies = all_paths_df['TransitionFrequency'].to_numpy(dtype=np.int64)[known]
+    # Duplicate coordinates are summed by the constructor.
+    return sparse.csr_matrix((frequencies, (rows[known], cols[known])), shape=(n, n), dtype=np.int64)
+
+
+def _matrix_entries(matrix, doors, value_columns):
+    """COO entries of a sparse matrix as [SourceDoor, TargetDoor, *value_columns] (values from `value_columns`)."""
+    coo = matrix.tocoo()
+    frame = pd.DataFrame({'SourceDoor': doors[coo.row], 'TargetDoor': doors[coo.col]})
+    if not coo.nnz:
+        # Sparse fancy indexing with empty coordinates returns a (1, 0) matrix, not an empty vector.
+        return frame.reindex(columns=['SourceDoor', 'TargetDoor'] + list(value_columns))
+    for column, values in value_columns.items():
+        frame[column] = values(coo.row, coo.col) if callable(values) else coo.data
+    return frame
+
+
+def diff_models(before, after, max_frequency_changes=None):
+    """
+    Compares two models, each a dict with 'device_attributes' and 'all_paths' (as returned by
+    run_onion_model_processing or stored in a model snapshot). Returns a dict of DataFrames/lists:
+    added_doors, removed_doors, layer_changes, next_door_changes, added_transitions,
+    removed_transitions and frequency_changes (the largest shifts among transitions in both models).
+    """
+    max_frequency_changes = max_frequency_changes or MODEL_DIFF_CONFIG['max_frequency_changes']
+    doors = door_index(before['device_attributes'], after['device_attributes'])
+
+    layers_before = aligned_door_values(before['device_attributes'], doors, LAYER_COL, 0).astype(np.int64)
+    layers_after = aligned_door_values(after['device_attributes'], doors, LAYER_COL, 0).astype(np.int64)
+    next_before = aligned_door_values(before['device_attributes'], doors, NEXT_DOOR_COL, '').astype(str)
+    next_after = aligned_door_values(after['device_attributes'], doors, NEXT_DOOR_COL, '').astype(str)
+    in_before, in_after = layers_before > 0, layers_after > 0
+
+    in_both = in_before & in_after
+    layer_changed = in_both & (layers_before != layers_after)
+    next_changed = in_both & (next_before != next_after)
+
+    matrix_before = transition_matrix(before['all_paths'], doors)
+    matrix_after = transition_matrix(after['all_paths'], doors)
+    present_before, present_after = matrix_before.astype(bool), matrix_after.astype(bool)
+    added = matrix_after - matrix_after.multiply(present_before)
+    removed = matrix_before - matrix_before.multiply(present_after)
+    # Transitions present in both models: frequency change (after - before), zeros dropped.
+    shared = present_before.multiply(present_after)
+    change = (matrix_after - matrix_before).multiply(shared).tocsr()
+    change.eliminate_zeros()
+
+    frequency_changes = _matrix_entries(change, doors, {
+        'FrequencyBefore': lambda r, c: np.asarray(matrix_before[r, c]).ravel(),
+        'FrequencyAfter': lambda r, c: np.asarray(matrix_after[r, c]).ravel(),
+        'Change': None,
+    })
+    frequency_changes = frequency_changes.reindex(
+        frequency_changes['Change'].abs().sort_values(ascending=False, kind='stable').index).head(max_frequency_changes)
+
+    return {
+        'added_doors': doors[in_after & ~in_before].tolist(),
+        'removed_doors': doors[in_before & ~in_after].tolist(),
+        'layer_changes': pd.DataFrame({DOORID_COL_DISPLAY: doors[layer_changed], 'LayerBefore': layers_before[layer_changed],
+                                       'LayerAfter': layers_after[layer_changed]}),
+        'next_door_changes': pd.DataFrame({DOORID_COL_DISPLAY: doors[next_changed], 'NextDoorBefore': next_before[next_changed],
+                                           'NextDoorAfter': next_after[next_changed]}),
+        'added_transitions': _matrix_entries(added, doors, {'TransitionFrequency': None}),
+        'removed_transitions': _matrix_entries(removed, doors, {'TransitionFrequency': None}),
+        'frequency_changes': frequency_changes.reset_index(drop=True),
+    }
+
+
+def diff_date_ranges(temporal_index, config_params, range_before, range_after, confirmed_official_entrances=None,
+                     detailed_door_classifications=None):
+    """
+    Diffs the models of two (start, end) day ranges of a TemporalModelIndex (no pipeline re-run; use
+    TemporalModelIndex.from_model_state for an incremental model state).
+    """
+    models = []
+    for start, end in (range_before, range_after):
+        _, device_attrs, _, all_paths = temporal_index.window_model(config_params, start, end, confirmed_official_entrances,
+                                                                    detailed_door_classifications)
+        models.append({'device_attributes': device_attrs, 'all_paths': all_paths})
+    return diff_models(*models)
+
+
+def previous_period(start, end):
+    """The (start, end) ISO dates of the equally long period that ends the day before `start`."""
+    start_day, end_day = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    length = end_day - start_day + pd.Timedelta(days=1)
+    return (start_day - length).date().isoformat(), (start_day - pd.Timedelta(days=1)).date().isoformat()
+
+
+def diff_summary(diff):
+    """One-line description of a diff for the status text."""
+    parts = [f"{len(diff['layer_changes'])} door(s) changed layer",
+             f"{len(diff['next_door_changes'])} changed most common next door",
+             f"{len(diff['added_transitions'])} new / {len(diff['removed_transitions'])} disappeared transition(s)"]
+    if diff['added_doors'] or diff['removed_doors']:
+        parts.append(f"{len(diff['added_doors'])} new / {len(diff['removed_doors'])} missing door(s)")
+    return "; ".join(parts) + "."
+
+
+def apply_diff_overlay(elements, diff):
+    """
+    Marks the differences on Cytoscape elements of the newer model with classes styled in
+    graph_styles: diff-added, diff-layer-changed, diff-next-changed on nodes; diff-added on new edges;
+    disappeared transitions between doors still on the graph are added as diff-removed edges.
+    """
+    added_doors = set(diff['added_doors'])
+    layer_before = dict(zip(diff['layer_changes'][DOORID_COL_DISPLAY], diff['layer_changes']['LayerBefore']))
+    next_before = dict(zip(diff['next_door_changes'][DOORID_COL_DISPLAY], diff['next_door_changes']['NextDoorBefore']))
+    added_edges = set(zip(diff['added_transitions']['SourceDoor'], diff['added_transitions']['TargetDoor']))
+
+    overlaid, node_layers = [], {}
+    for element in elements:
+        data = element['data']
+        classes = []
+        if 'source' in data:
+            if (data['source'], data['target']) in added_edges:
+                classes.append('diff-added')
+        elif not data.get('is_layer_parent'):
+            node_layers[data['id']] = data.get('layer')
+            if data['id'] in added_doors:
+                classes.append('diff-added')
+            if data['id'] in layer_before:
+                classes.append('diff-layer-changed')
+                data = dict(data, previous_layer=int(layer_before[data['id']]))
+            if data['id'] in next_before:
+                classes.append('diff-next-changed')
+                data = dict(data, previous_most_common_next=next_before[data['id']] or None)
+        if classes:
+            classes = [element['classes']] + classes if element.get('classes') else classes
+            element = dict(element, data=data, classes=' '.join(classes))
+        overlaid.append(element)
+
+    for row in diff['removed_transitions'].itertuples(index=False):
+        if row.SourceDoor in node_layers and row.TargetDoor in node_layers:
+            overlaid.append({'data': {'id': f"removed_{row.SourceDoor}_to_{row.TargetDoor}", 'source': row.SourceDoor,
+                                      'target': row.TargetDoor, 'width': 1.0, 'actual_frequency': 0,
+                                      'previous_frequency': int(row.TransitionFrequency),
+                                      'source_layer': node_layers[row.SourceDoor], 'target_layer': node_layers[row.TargetDoor]},
+                             'classes': 'diff-removed'})
+    return overlaid
+
+
+def clear_diff_overlay(elements):
+    """Elements with the marks of apply_diff_overlay removed (its diff-removed edges dropped)."""
+    cleared = []
+    for element in elements:
+        classes = (element.get('classes') or '').split()
+        if 'diff-removed' in classes:
+            continue
+        if any(c.startswith('diff-') for c in classes):
+            element = {key: value for key, value in element.items() if key != 'classes'}
+            element['data'] = {k: v for k, v in element['data'].items() if k not in ('previous_layer', 'previous_most_common_next')}
+            kept = [c for c in classes if not c.startswith('diff-')]
+            if kept:
+                element['classes'] = ' '.join(kept)
+        cleared.append(element)
+    return cleared
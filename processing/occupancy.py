@@ -0,0 +1,115 @@
+# processing/occupancy.py
+
+import numpy as np
+import pandas as pd
+
+from processing.model_aggregates import TIMESTAMP_COL_DISPLAY, USERID_COL_DISPLAY, DOORID_COL_DISPLAY, DATE_COL_NAME
+
+# Who is in which onion layer, and for how long. Within a user-day, the time between one event and the
+# next is spent in the layer (FinalGlobalDeviceDepth) of the first event's door; an EXIT or ENTRANCE_EXIT
+# event (EventType_UserDay) ends the visit. Consecutive intervals in the same layer form one stay.
+# Occupancy at time t is (#stays started <= t) - (#stays ended <= t), answered by binary search over the
+# sorted start and end times of each layer; all steps are sorts or linear passes, O(n log n) overall.
+OCCUPANCY_CONFIG = {
+    'bin_minutes': 15,                                             # resolution of the occupancy time series
+    'dwell_bin_edges_minutes': [0, 5, 15, 30, 60, 120, 240, 480],  # last bin is open-ended
+}
+
+EVENTTYPE_USERDAY_COL = 'EventType_UserDay'
+_VISIT_END_TYPES = ['EXIT', 'ENTRANCE_EXIT']
+
+
+def layer_stays(enriched_event_df, device_attributes_df):
+    """(layers, start_ns, end_ns) arrays of every stay, in (user, date, time) order."""
+    door_layers = pd.to_numeric(device_attributes_df.drop_duplicates(DOORID_COL_DISPLAY)
+                                .set_index(DOORID_COL_DISPLAY)['FinalGlobalDeviceDepth'], errors='coerce')
+    user_codes, _ = pd.factorize(enriched_event_df[USERID_COL_DISPLAY])
+    date_codes, _ = pd.factorize(enriched_event_df[DATE_COL_NAME])
+    timestamps = pd.to_datetime(enriched_event_df[TIMESTAMP_COL_DISPLAY]).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    layers = door_layers.reindex(enriched_event_df[DOORID_COL_DISPLAY].astype(str)).fillna(-1).to_numpy(dtype=np.int64)
+    visit_ends = enriched_event_df[EVENTTYPE_USERDAY_COL].isin(_VISIT_END_TYPES).to_numpy() \
+        if EVENTTYPE_USERDAY_COL in enriched_event_df.columns else np.zeros(len(enriched_event_df), dtype=bool)
+
+    order = np.lexsort((timestamps, date_codes, user_codes))
+    user_codes, date_codes, timestamps = user_codes[order], date_codes[order], timestamps[order]
+    layers, visit_ends = layers[order], visit_ends[order]
+
+    # Interval i runs from event i to event i + 1 of the same user-day.
+    same_sequence = (user_codes[:-1] == user_codes[1:]) & (date_codes[:-1] == date_codes[1:])
+    valid = same_sequence & ~visit_ends[:-1] & (layers[:-1] >= 0)
+    starts, ends, interval_layers = timestamps[:-1], timestamps[1:], layers[:-1]
+
+    # A stay starts where an interval does not continue the previous one in the same layer.
+    continues = np.zeros(len(valid), dtype=bool)
+    continues[1:] = valid[:-1] & same_sequence[:-1] & (interval_layers[1:] == interval_layers[:-1])
+    positions = np.flatnonzero(valid)
+    stay_first = positions[~continues[positions]]
+    stay_last = np.append(np.searchsorted(positions, stay_first[1:]) - 1, len(positions) - 1).astype(np.int64)
+    if not len(positions):
+        stay_last = stay_last[:0]
+    return interval_layers[stay_first], starts[stay_first], ends[positions[stay_last]]
+
+
+class LayerOccupancy:
+    def __init__(self, enriched_event_df, device_attributes_df):
+        layers, starts, ends = layer_stays(enriched_event_df, device_attributes_df)
+        self.layers = sorted(int(layer) for layer in np.unique(layers))
+        # Per layer, sorted start and end times (CSR: layer i owns rows layer_offsets[i]:layer_offsets[i + 1]).
+        order = np.lexsort((starts, layers))
+        self.layer_offsets = np.append(np.searchsorted(layers[order], self.layers), len(layers))
+        self.sorted_starts = starts[order]
+        self.sorted_ends = ends[np.lexsort((ends, layers))]
+        self.durations = (ends - starts)[order]
+        self.first_time = int(starts.min()) if len(starts) else None
+        self.last_time = int(ends.max()) if len(ends) else None
+
+    def _spans(self):
+        return zip(self.layer_offsets[:-1], self.layer_offsets[1:])
+
+    def __len__(self):
+        return len(self.sorted_starts)
+
+    def occupancy_series(self, start=None, end=None, bin_minutes=None):
+        """DataFrame of people present per layer (columns) at each bin time (index) in [start, end]."""
+        if self.first_time is None:
+            return pd.DataFrame()
+        bin_ns = int(pd.Timedelta(minutes=bin_minutes or OCCUPANCY_CONFIG['bin_minutes']).value)
+        lower = self.first_time if start is None else pd.Timestamp(start).value
+        if end is None:
+            upper = self.last_time
+        else:  # a date-only end includes that whole day
+            upper = (pd.Timestamp(end) + pd.Timedelta(days=1)).value if len(str(end)) <= 10 else pd.Timestamp(end).value
+        edges = np.arange(lower - lower % bin_ns, upper + 1, bin_ns, dtype=np.int64)
+        present = {layer: np.searchsorted(self.sorted_starts[lo:hi], edges, side='right')
+                   - np.searchsorted(self.sorted_ends[lo:hi], edges, side='right')
+                   for layer, (lo, hi) in zip(self.layers, self._spans())}
+        return pd.DataFrame(present, index=pd.to_datetime(edges))
+
+    def peak_occupancy(self):
+        """{layer: (people, time)} at the moment each layer was fullest (ends count before starts at equal times)."""
+        peaks = {}
+        for layer, (lo, hi) in zip(self.layers, self._spans()):
+            times = np.concatenate([self.sorted_ends[lo:hi], self.sorted_starts[lo:hi]])
+            deltas = np.concatenate([np.full(hi - lo, -1), np.ones(hi - lo, dtype=np.int64)])
+            order = np.lexsort((deltas, times))
+            running = np.cumsum(deltas[order])
+            best = int(running.argmax())
+            peaks[layer] = (int(running[best]), pd.Timestamp(int(times[order][best])))
+        return peaks
+
+    def dwell_summary(self):
+        """Per-layer stay counts and dwell-time statistics in minutes."""
+        rows = []
+        for layer, (lo, hi) in zip(self.layers, self._spans()):
+            minutes = self.durations[lo:hi] / 60e9
+            rows.append({'Layer': layer, 'Stays': hi - lo, 'MeanMinutes': float(minutes.mean()),
+                         'MedianMinutes': float(np.median(minutes)), 'P90Minutes': float(np.percentile(minutes, 90))})
+        return pd.DataFrame(rows, columns=['Layer', 'Stays', 'MeanMinutes', 'MedianMinutes', 'P90Minutes'])
+
+    def dwell_histogram(self, layer, bin_edges_minutes=None):
+        """Stay counts of `layer` per dwell-time bin (the last bin is open-ended)."""
+        edges = np.asarray(bin_edges_minutes or OCCUPANCY_CONFIG['dwell_bin_edges_minutes'], dtype=float)
+        position = self.layers.index(int(layer))
+        lo, hi = self.layer_offsets[position], self.layer_offsets[position + 1]
+        bins = np.searchsorted(edges, self.durations[lo:hi] / 60e9, side='right') - 1
+        return np.bincount(np.clip(bins, 0, len(edges) - 1), minlength=len(edges))
@@ -7,6 +7,8 @@ import traceback
 # Import other necessary functions from your project structure
 # Ensure this import path is correct
 from processing.cytoscape_prep import prepare_path_visualization_data 
+from processing.stage_scheduler import run_stage_graph
+from processing.deduplication import drop_duplicate_events
 from constants import REQUIRED_INTERNAL_COLUMNS # Needed for constants like EventType display name
 
 # --- Helper Data Cleaning and Feature Engineering Functions ---
@@ -118,8 +120,9 @@ def determine_heuristic_entrances(df, user_id_col='UserID (Person Identifier)',
 
         first_event_indices = df.groupby([user_id_col, date_col], group_keys=False, observed=False)[timestamp_col].idxmin()
         first_events_df = df.loc[first_event_indices].copy() # Use .copy() to avoid SettingWithCopyWarning
-        entrance_counts = first_events_df[door_id_col].value_counts()
-        heuristic_entrance_list = entrance_counts.nlargest(top_n_entrances).index.tolist()
+        # Ties keep first-appearance order (stable sort), so chunked/out-of-core runs pick the same doors.
+        entrance_counts = first_events_df[door_id_col].value_counts(sort=False).sort_values(ascending=False, kind='stable')
+        heuristic_entrance_list = entrance_counts.head(top_n_entrances).index.tolist()
         print(f"Heuristic official entrances: {heuristic_entrance_list}")
         return heuristic_entrance_list
     except Exception as e:
@@ -178,19 +181,22 @@ def calculate_final_global_device_depths(enriched_event_df, official_entrance_do
 
     standardized_official_entrances = {str(d_id).upper().strip() for d_id in official_entrance_door_ids}
     
-    # Ensure DoorID is string type for comparison
-    enriched_event_df[door_id_col] = enriched_event_df[door_id_col].astype(str)
+    # Compare DoorIDs as strings without writing to the input frame (it may be shared with concurrent stages)
+    door_ids = enriched_event_df[door_id_col].astype(str)
 
-    all_devices_in_events = enriched_event_df[door_id_col].unique()
+    all_devices_in_events = door_ids.unique()
     device_layer_info_list = []
     
-    non_entrance_devices_df = enriched_event_df[~enriched_event_df[door_id_col].isin(standardized_official_entrances)].copy()
+    non_entrance_mask = ~door_ids.isin(standardized_official_entrances)
+    non_entrance_devices_df = pd.DataFrame({door_id_col: door_ids[non_entrance_mask],
+                                            device_depth_per_day_col: enriched_event_df.loc[non_entrance_mask, device_depth_per_day_col]})
     provisional_depths_non_entrances = pd.DataFrame(columns=[door_id_col, 'ProvisionalGlobalDeviceDepth', 'ModeCount'])
 
     if not non_entrance_devices_df.empty and device_depth_per_day_col in non_entrance_devices_df.columns:
-        grouped_modes = non_entrance_devices_df.groupby(door_id_col, group_keys=False, observed=False)[device_depth_per_day_col]
+        grouped_modes = non_entrance_devices_df.groupby(door_id_col, observed=False)[device_depth_per_day_col]
         if grouped_modes.ngroups > 0:
-            temp_modes_df = grouped_modes.apply(get_mode_robust).reset_index()
+            # apply() stacks each helper Series under its door key; unstack to get 'mode'/'count' columns.
+            temp_modes_df = grouped_modes.apply(get_mode_robust).unstack().reset_index()
             if 'mode' in temp_modes_df.columns and 'count' in temp_modes_df.columns:
                 temp_modes_df.rename(columns={'mode': 'ProvisionalGlobalDeviceDepth', 'count': 'ModeCount'}, inplace=True)
                 temp_modes_df['ProvisionalGlobalDeviceDepth'] = pd.to_numeric(temp_modes_df['ProvisionalGlobalDeviceDepth'], errors='coerce')
@@ -290,6 +296,14 @@ def find_most_common_next_doors(enriched_event_df, user_id_col='UserID (Person I
     
     # Calculate transition frequencies
     path_frequencies = transitions_df.groupby(['SourceDoor', 'TargetDoor'], observed=False).size().reset_index(name='TransitionFrequency')
+    return summarize_transition_counts(path_frequencies)
+
+
+def summarize_transition_counts(path_frequencies):
+    """
+    Turns per-(SourceDoor, TargetDoor) counts, ordered by source then target, into the
+    (all_paths_df, most_common_next_df) pair. Shared by the in-memory and aggregate-based paths.
+    """
     path_frequencies = path_frequencies.sort_values(by=['SourceDoor', 'TransitionFrequency'], ascending=[True, False])
     
     most_common_next = pd.DataFrame(columns=['SourceDoor', 'MostCommonNextDoor', 'FrequencyOfMostCommon'])
@@ -313,29 +327,20 @@ def find_most_common_next_doors(enriched_event_df, user_id_col='UserID (Person I
 
 
 # --- Main Processing Orchestrator ---
-def run_onion_model_processing(raw_df, config_params, confirmed_official_entrances=None, detailed_door_classifications=None):
-    print("\n--- Starting Onion Model Data Processing Pipeline ---")
-    if raw_df is None or raw_df.empty:
-        print("Error: Input DataFrame to pipeline is empty or None. Exiting pipeline.")
-        cols_dev_attrs = ['DoorID (Device Name)', 'FinalGlobalDeviceDepth', 'IsOfficialEntrance', 'IsGloballyCritical', 'MostCommonNextDoor', 'Floor', 'IsStaircase', 'SecurityLevel']
-        cols_path_viz = ['SourceDoor', 'TargetDoor', 'PathWidth'] # Renamed Door1/Door2 to Source/Target for consistency
-        cols_all_paths = ['SourceDoor', 'TargetDoor', 'TransitionFrequency', 'is_to_inner_default']
-        return raw_df, pd.DataFrame(columns=cols_dev_attrs), pd.DataFrame(columns=cols_path_viz), pd.DataFrame(columns=cols_all_paths)
+# The pipeline is split into phases so alternative executors (out-of-core, sharded, incremental)
+# can run the per-user cleaning/sequencing on subsets and share the final model assembly:
+#   prepare_enriched_events -> resolve_official_entrances -> Modules 2/3 -> assemble_onion_model
 
-    processed_df = raw_df.copy()
-    print(f"DEBUG: Initial DataFrame size: {len(processed_df)} rows.")
+def empty_model_outputs():
+    cols_dev_attrs = ['DoorID (Device Name)', 'FinalGlobalDeviceDepth', 'IsOfficialEntrance', 'IsGloballyCritical', 'MostCommonNextDoor', 'Floor', 'IsStaircase', 'SecurityLevel']
+    cols_path_viz = ['SourceDoor', 'TargetDoor', 'PathWidth'] # Renamed Door1/Door2 to Source/Target for consistency
+    cols_all_paths = ['SourceDoor', 'TargetDoor', 'TransitionFrequency', 'is_to_inner_default']
+    return pd.DataFrame(columns=cols_dev_attrs), pd.DataFrame(columns=cols_path_viz), pd.DataFrame(columns=cols_all_paths)
 
-    # Define display names once at the top of the function for clarity
-    TIMESTAMP_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['Timestamp']
-    USERID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['UserID']
-    DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
-    EVENTTYPE_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['EventType']
-    DATE_COL_NAME = 'Date' # This is an internal name, derived within the pipeline
 
-    # Module 1 Steps (Data Cleaning, Initial Feature Engineering)
-    print("\n--- Module 1: Initial Event Filtering & Feature Engineering ---")
-    
-    # EventType Filtering
+def filter_access_events(processed_df, config_params):
+    """EventType filtering: keeps granted events and drops the configured invalid phrases."""
+    EVENTTYPE_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['EventType']
     if EVENTTYPE_COL_DISPLAY not in processed_df.columns:
         print(f"Error: '{EVENTTYPE_COL_DISPLAY}' column missing for filtering. Skipping EventType filter.")
     else:
@@ -356,10 +361,37 @@ def run_onion_model_processing(raw_df, config_params, confirmed_official_entranc
             processed_df = processed_df[~(processed_df[EVENTTYPE_COL_DISPLAY].str.upper().str.contains(phrase.upper()))].copy()
             print(f"DEBUG: After contains filter '{phrase}': {len(processed_df)} rows. Removed {initial_len - len(processed_df)}.")
             initial_len = len(processed_df)
+    return processed_df
+
+
+def prepare_enriched_events(raw_df, config_params):
+    """
+    Module 1 up to user-day sequencing: exact duplicate removal, event-type filtering, door normalization,
+    rapid-scan and ping-pong removal, Date derivation, DeviceDepthPerDay and EventType_UserDay.
+    Every step is row-wise or per user, so it can run on any user-complete subset of the events.
+    Returns (enriched_event_df, completed); `completed` is False when the pipeline had to stop early.
+    """
+    processed_df = raw_df.copy()
+    print(f"DEBUG: Initial DataFrame size: {len(processed_df)} rows.")
+
+    # Define display names once at the top of the function for clarity
+    TIMESTAMP_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+    USERID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['UserID']
+    DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
+    DATE_COL_NAME = 'Date' # This is an internal name, derived within the pipeline
+
+    # Module 1 Steps (Data Cleaning, Initial Feature Engineering)
+    print("\n--- Module 1: Initial Event Filtering & Feature Engineering ---")
+
+    # Overlapping export windows repeat rows; they are dropped before any sorting.
+    if config_params.get('drop_exact_duplicates', True):
+        processed_df, _ = drop_duplicate_events(processed_df)
+
+    processed_df = filter_access_events(processed_df, config_params)
 
     if processed_df.empty:
         print("No events after initial event type filtering. Exiting pipeline.")
-        return processed_df, pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return processed_df, False
 
     processed_df = normalize_door_ids(processed_df, door_id_col=DOORID_COL_DISPLAY)
     
@@ -370,7 +402,7 @@ def run_onion_model_processing(raw_df, config_params, confirmed_official_entranc
                                                  timestamp_col=TIMESTAMP_COL_DISPLAY, 
                                                  time_threshold_seconds=config_params.get('same_door_scan_threshold_seconds', 10))
     print(f"DEBUG: After rapid same-door scans removal: {len(processed_df)} rows. Removed {initial_len - len(processed_df)}.")
-    if processed_df.empty: print("No events after rapid scan removal. Exiting pipeline."); return processed_df, pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    if processed_df.empty: print("No events after rapid scan removal. Exiting pipeline."); return processed_df, False
 
     initial_len = len(processed_df)
     processed_df = flag_ping_pong_scans(processed_df,
@@ -382,12 +414,12 @@ def run_onion_model_processing(raw_df, config_params, confirmed_official_entranc
         num_flagged = processed_df['IsPingPongAffected'].sum()
         processed_df = processed_df[~processed_df['IsPingPongAffected']].copy()
         print(f"DEBUG: Removed {num_flagged} ping-pong affected events. Current rows: {len(processed_df)}.")
-    if processed_df.empty: print("No events after ping-pong removal. Exiting pipeline."); return processed_df, pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    if processed_df.empty: print("No events after ping-pong removal. Exiting pipeline."); return processed_df, False
 
     # Ensure timestamp column (display name) is datetime type
     if TIMESTAMP_COL_DISPLAY not in processed_df.columns:
         print(f"Error: '{TIMESTAMP_COL_DISPLAY}' column missing for timestamp processing. Exiting pipeline.")
-        return processed_df, pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return processed_df, False
     
     if not pd.api.types.is_datetime64_any_dtype(processed_df[TIMESTAMP_COL_DISPLAY]):
         print(f"DEBUG: Converting '{TIMESTAMP_COL_DISPLAY}' to datetime.")
@@ -395,7 +427,7 @@ def run_onion_model_processing(raw_df, config_params, confirmed_official_entranc
         initial_len = len(processed_df)
         processed_df.dropna(subset=[TIMESTAMP_COL_DISPLAY], inplace=True) # Drop rows where timestamp conversion failed
         print(f"DEBUG: After Timestamp NaN drop: {len(processed_df)} rows. Removed {initial_len - len(processed_df)}.")
-    if processed_df.empty: print("No events after timestamp cleaning. Exiting pipeline."); return processed_df, pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    if processed_df.empty: print("No events after timestamp cleaning. Exiting pipeline."); return processed_df, False
 
 
     # Ensure 'Date' column exists, deriving from Timestamp (display name)
@@ -405,12 +437,12 @@ def run_onion_model_processing(raw_df, config_params, confirmed_official_entranc
             processed_df[DATE_COL_NAME] = processed_df[TIMESTAMP_COL_DISPLAY].dt.date
         else:
             print(f"Error: Neither '{DATE_COL_NAME}' nor '{TIMESTAMP_COL_DISPLAY}' found to derive date. Exiting pipeline.")
-            return processed_df, pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+            return processed_df, False
     
     # Calculate DeviceDepthPerDay and EventType_UserDay
     req_cols_daily = [USERID_COL_DISPLAY, DATE_COL_NAME, TIMESTAMP_COL_DISPLAY]
     if not all(col in processed_df.columns for col in req_cols_daily):
-        print(f"Error: Missing one of {req_cols_daily} for daily processing. Exiting pipeline."); return processed_df, pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        print(f"Error: Missing one of {req_cols_daily} for daily processing. Exiting pipeline."); return processed_df, False
     
     processed_df.sort_values(by=req_cols_daily, inplace=True)
     grouped_events = processed_df.groupby([USERID_COL_DISPLAY, DATE_COL_NAME], group_keys=False, observed=False)
@@ -424,39 +456,36 @@ def run_onion_model_processing(raw_df, config_params, confirmed_official_entranc
         if 'EventType_UserDay' not in enriched_event_df.columns: enriched_event_df['EventType_UserDay'] = ''
         print("No user-date groups found for depth/event type classification, or DataFrame was empty before apply. Using processed_df as enriched_event_df.")
     
-    if enriched_event_df.empty: print("DataFrame empty after daily processing. Exiting pipeline."); return enriched_event_df, pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    if enriched_event_df.empty: print("DataFrame empty after daily processing. Exiting pipeline."); return enriched_event_df, False
+    return enriched_event_df, True
 
-    # Determine and use official entrances
+
+def resolve_official_entrances(confirmed_official_entrances, heuristic_fallback):
+    """User-confirmed entrances win; otherwise `heuristic_fallback()` supplies the heuristic list."""
     if confirmed_official_entrances is not None and len(confirmed_official_entrances) > 0:
         official_entrance_door_ids = [str(d).upper().strip() for d in confirmed_official_entrances]
         print(f"\nUsing USER-CONFIRMED official entrances: {official_entrance_door_ids}")
     else:
         print("\nWarning: No user-confirmed entrances. Falling back to heuristic.")
-        official_entrance_door_ids = determine_heuristic_entrances(
-            enriched_event_df,
-            user_id_col=USERID_COL_DISPLAY,
-            date_col=DATE_COL_NAME,
-            door_id_col=DOORID_COL_DISPLAY,
-            timestamp_col=TIMESTAMP_COL_DISPLAY,
-            top_n_entrances=config_params.get('top_n_heuristic_entrances', 3)
-        )
-    
-    enriched_event_df = flag_unexpected_entry_points(enriched_event_df, official_entrance_door_ids,
-                                                     door_id_col=DOORID_COL_DISPLAY) 
-    print("Module 1 (Initial Processing & Feature Engineering) Complete.")
-    print(f"DEBUG: Enriched DataFrame size before Module 2: {len(enriched_event_df)} rows.")
+        official_entrance_door_ids = heuristic_fallback()
+    return official_entrance_door_ids
+
+
+def assemble_onion_model(device_attributes_df, all_paths_df, most_common_paths_df, official_entrance_door_ids,
+                         all_devices, detailed_door_classifications=None):
+    """
+    Remainder of Modules 2-4 once device depths and transition counts are known: fallback depths,
+    critical flags, most-common-next merge, manual classifications and path visualization data.
+    `all_devices` lists every door seen in the enriched events, in order of first appearance.
+    Returns (device_attributes_df, path_viz_data_df, all_paths_df).
+    """
+    DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
 
-    # Module 2 Steps (Core Onion Layer Generation)
-    device_attributes_df = calculate_final_global_device_depths(
-        enriched_event_df, official_entrance_door_ids,
-        door_id_col=DOORID_COL_DISPLAY, 
-        device_depth_per_day_col='DeviceDepthPerDay' # This remains internal
-    )
     if device_attributes_df.empty or \
        ('FinalGlobalDeviceDepth' in device_attributes_df.columns and (device_attributes_df['FinalGlobalDeviceDepth'] < 0).any()) or \
        DOORID_COL_DISPLAY not in device_attributes_df.columns: 
         print("Warning or Error in global depths. Re-creating basic device_attributes_df.")
-        all_devs = enriched_event_df[DOORID_COL_DISPLAY].unique() if DOORID_COL_DISPLAY in enriched_event_df.columns else []
+        all_devs = all_devices
         device_attributes_df = pd.DataFrame({
             DOORID_COL_DISPLAY: all_devs, 
             'FinalGlobalDeviceDepth': 1, # Fallback depth
@@ -470,15 +499,6 @@ def run_onion_model_processing(raw_df, config_params, confirmed_official_entranc
     print("Module 2 (Core Layer Generation) Complete.")
     print(f"DEBUG: Device Attributes DataFrame size: {len(device_attributes_df)} rows. Columns: {device_attributes_df.columns.tolist()}")
 
-
-    # Module 3 Steps ("Yellow Door" Placement Logic)
-    all_paths_df, most_common_paths_df = find_most_common_next_doors(
-        enriched_event_df,
-        user_id_col=USERID_COL_DISPLAY, 
-        date_col=DATE_COL_NAME,
-        timestamp_col=TIMESTAMP_COL_DISPLAY, 
-        door_id_col=DOORID_COL_DISPLAY 
-    )
     if DOORID_COL_DISPLAY in device_attributes_df.columns and not most_common_paths_df.empty:
         device_attributes_df = pd.merge(device_attributes_df, most_common_paths_df[['SourceDoor', 'MostCommonNextDoor']],
                                         left_on=DOORID_COL_DISPLAY, right_on='SourceDoor', how='left')
@@ -545,10 +565,74 @@ def run_onion_model_processing(raw_df, config_params, confirmed_official_entranc
 
     print("Module 4 (Path Visualization Data Prep) Complete.")
     
+    return device_attributes_df, path_viz_data_df, all_paths_df
+
+
+def run_onion_model_processing(raw_df, config_params, confirmed_official_entrances=None, detailed_door_classifications=None):
+    print("\n--- Starting Onion Model Data Processing Pipeline ---")
+    if raw_df is None or raw_df.empty:
+        print("Error: Input DataFrame to pipeline is empty or None. Exiting pipeline.")
+        return (raw_df,) + empty_model_outputs()
+
+    # Define display names once at the top of the function for clarity
+    TIMESTAMP_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+    USERID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['UserID']
+    DOORID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['DoorID']
+    DATE_COL_NAME = 'Date' # This is an internal name, derived within the pipeline
+
+    enriched_event_df, completed = prepare_enriched_events(raw_df, config_params)
+    if not completed:
+        return enriched_event_df, pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+
+    # Modules 1-3 stages that only read enriched_event_df run concurrently (see stage_scheduler):
+    # entrance resolution and transition counting in parallel, device depths once entrances are known.
+    stage_results = run_stage_graph({
+        'entrances': (lambda: resolve_official_entrances(
+            confirmed_official_entrances,
+            lambda: determine_heuristic_entrances(
+                enriched_event_df,
+                user_id_col=USERID_COL_DISPLAY,
+                date_col=DATE_COL_NAME,
+                door_id_col=DOORID_COL_DISPLAY,
+                timestamp_col=TIMESTAMP_COL_DISPLAY,
+                top_n_entrances=config_params.get('top_n_heuristic_entrances', 3)
+            )
+        ), []),
+        # Module 2 Steps (Core Onion Layer Generation)
+        'device_depths': (lambda entrances: calculate_final_global_device_depths(
+            enriched_event_df, entrances,
+            door_id_col=DOORID_COL_DISPLAY, 
+            device_depth_per_day_col='DeviceDepthPerDay' # This remains internal
+        ), ['entrances']),
+        # Module 3 Steps ("Yellow Door" Placement Logic)
+        'transitions': (lambda: find_most_common_next_doors(
+            enriched_event_df,
+            user_id_col=USERID_COL_DISPLAY, 
+            date_col=DATE_COL_NAME,
+            timestamp_col=TIMESTAMP_COL_DISPLAY, 
+            door_id_col=DOORID_COL_DISPLAY 
+        ), []),
+    })
+    official_entrance_door_ids = stage_results['entrances']
+    device_attributes_df = stage_results['device_depths']
+    all_paths_df, most_common_paths_df = stage_results['transitions']
+
+    # Joined: flagging writes to enriched_event_df, so it runs after the concurrent stages.
+    enriched_event_df = flag_unexpected_entry_points(enriched_event_df, official_entrance_door_ids,
+                                                     door_id_col=DOORID_COL_DISPLAY) 
+    print("Module 1 (Initial Processing & Feature Engineering) Complete.")
+    print(f"DEBUG: Enriched DataFrame size before Module 2: {len(enriched_event_df)} rows.")
+
+    all_devices = enriched_event_df[DOORID_COL_DISPLAY].unique() if DOORID_COL_DISPLAY in enriched_event_df.columns else []
+    device_attributes_df, path_viz_data_df, all_paths_df = assemble_onion_model(
+        device_attributes_df, all_paths_df, most_common_paths_df, official_entrance_door_ids,
+        all_devices, detailed_door_classifications
+    )
+    
     print("\n--- All Data Processing Pipeline Complete ---")
     print(f"DEBUG: Final enriched_event_df rows: {len(enriched_event_df) if enriched_event_df is not None else 'None'}")
     print(f"DEBUG: Final device_attributes_df rows: {len(device_attributes_df) if device_attributes_df is not None else 'None'}")
     print(f"DEBUG: Final path_viz_data_df rows: {len(path_viz_data_df) if path_viz_data_df is not None else 'None'}")
     print(f"DEBUG: Final all_paths_df rows: {len(all_paths_df) if all_paths_df is not None else 'None'}")
 
-    return enriched_event_df, device_attributes_df, path_viz_data_df, all_paths_df
\ No newline at end of file
+    return enriched_event_df, device_attributes_df, path_viz_data_df, all_paths_df
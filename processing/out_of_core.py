@@ -0,0 +1,129 @@
+# processing/out_of_core.py
+
+import os
+import shutil
+import tempfile
+import traceback
+import numpy as np
+import pandas as pd
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+from processing.onion_model import prepare_enriched_events, empty_model_outputs
+from processing.model_aggregates import (compute_model_aggregates, merge_model_aggregates,
+                                         build_onion_model_from_aggregates, empty_model_aggregates)
+from processing.index_pieces import enriched_index_pieces, merge_index_pieces
+
+# Out-of-core execution for event logs that do not fit in memory. Raw events are hash-partitioned by
+# UserID into spill files on disk; every partition then holds complete user histories, so cleaning and
+# user-day sequencing run one partition at a time and only the small model aggregates are kept.
+OUT_OF_CORE_CONFIG = {
+    'num_partitions': 16,
+    'chunk_rows': 500_000,
+    'work_directory': None,      # None -> system temp directory
+    # Uploads with at least this many rows (from the upload prescan) are processed out of core.
+    'min_rows': 5_000_000,
+    # The merged journey index keeps 12 bytes per cleaned event in memory; above this many events it is
+    # dropped (journeys and route mining are then unavailable) while the other indexes are still built.
+    'max_journey_events': 100_000_000,
+}
+
+USERID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['UserID']
+
+
+def user_partition_ids(user_ids, num_partitions):
+    """Stable partition number per row: a hash of the UserID string, independent of chunking."""
+    hashes = pd.util.hash_array(np.asarray(user_ids, dtype=object))
+    return (hashes % np.uint64(num_partitions)).astype(np.int64)
+
+
+def partition_events_to_disk(event_chunks, work_directory, num_partitions):
+    """
+    Spills each chunk's rows into per-partition pickle files, keeping the original row order.
+    Returns (list of file lists, one per partition; number of raw rows written).
+    """
+    partition_files = [[] for _ in range(num_partitions)]
+    raw_rows = 0
+    for chunk_index, chunk_df in enumerate(event_chunks):
+        if chunk_df is None or chunk_df.empty:
+            continue
+        raw_rows += len(chunk_df)
+        partition_ids = user_partition_ids(chunk_df[USERID_COL_DISPLAY], num_partitions)
+        for partition_id, part_df in chunk_df.groupby(partition_ids, sort=False):
+            path = os.path.join(work_directory, f"p{partition_id:04d}-c{chunk_index:06d}.pkl")
+            part_df.to_pickle(path)
+            partition_files[partition_id].append(path)
+        print(f"DEBUG: Partitioned chunk {chunk_index} ({len(chunk_df):,} rows); {raw_rows:,} rows spilled so far.")
+    return partition_files, raw_rows
+
+
+def _process_partition(files, config_params, with_indexes=False):
+    """
+    Loads one partition, runs Module 1 up to sequencing on it and reduces it to
+    (aggregates, index pieces or None).
+    """
+    raw_df = pd.concat([pd.read_pickle(path) for path in files], ignore_index=True)
+    enriched_df, completed = prepare_enriched_events(raw_df, config_params)
+    aggregates = compute_model_aggregates(enriched_df) if completed else empty_model_aggregates()
+    aggregates['raw_event_count'] = len(raw_df)
+    pieces = enriched_index_pieces(enriched_df, raw_df) if with_indexes and completed and not enriched_df.empty else None
+    return aggregates, pieces
+
+
+def run_out_of_core_processing(event_chunks, config_params, confirmed_official_entrances=None,
+                               detailed_door_classifications=None, num_partitions=None, work_directory=None,
+                               with_indexes=False):
+    """
+    Out-of-core counterpart of run_onion_model_processing. `event_chunks` is an iterable of raw event
+    frames (display-name columns, e.g. from iter_csv_event_chunks); peak memory is one chunk plus one
+    partition. Returns (aggregates, device_attributes_df, path_viz_data_df, all_paths_df): the model
+    frames are identical to the in-memory pipeline's, and the merged aggregates replace the enriched frame.
+    With `with_indexes`, each partition also yields index pieces and a fifth item holds the merged
+    indexes (see merge_index_pieces).
+    """
+    print("\n--- Starting Out-of-Core Onion Model Processing ---")
+    num_partitions = num_partitions or OUT_OF_CORE_CONFIG['num_partitions']
+    base_directory = work_directory or OUT_OF_CORE_CONFIG['work_directory']
+    if base_directory:
+        os.makedirs(base_directory, exist_ok=True)
+    spill_directory = tempfile.mkdtemp(prefix='yosai_ooc_', dir=base_directory)
+    try:
+        partition_files, raw_rows = partition_events_to_disk(event_chunks, spill_directory, num_partitions)
+        if raw_rows == 0:
+            print("Error: No events to process out of core. Exiting pipeline.")
+            return (empty_model_aggregates(),) + empty_model_outputs() + ((merge_index_pieces([], None),) if with_indexes else ())
+
+        partition_aggregates, partition_pieces, journey_events = [], [], 0
+        for partition_id, files in enumerate(partition_files):
+            if not files:
+                continue
+            print(f"\nDEBUG: Processing partition {partition_id + 1}/{num_partitions} ({len(files)} spill file(s))...")
+            aggregates, pieces = _process_partition(files, config_params, with_indexes)
+            partition_aggregates.append(aggregates)
+            if pieces is not None:
+                journey_events += len(pieces['journey_index'].timestamps)
+                partition_pieces.append(pieces)
+            if journey_events > OUT_OF_CORE_CONFIG['max_journey_events']:
+                for pieces in partition_pieces:
+                    pieces['journey_index'] = None
+            for path in files:
+                os.remove(path)
+        aggregates = merge_model_aggregates(partition_aggregates)
+    except Exception as e:
+        print(f"Error in out-of-core processing: {e}")
+        traceback.print_exc()
+        raise
+    finally:
+        shutil.rmtree(spill_directory, ignore_errors=True)
+
+    device_attributes_df, path_viz_data_df, all_paths_df = build_onion_model_from_aggregates(
+        aggregates, config_params, confirmed_official_entrances, detailed_door_classifications)
+
+    print("\n--- Out-of-Core Processing Complete ---")
+    print(f"DEBUG: {aggregates['raw_event_count']:,} raw events, {aggregates['event_count']:,} enriched events, "
+          f"{len(device_attributes_df)} devices, {len(all_paths_df)} paths.")
+    if with_indexes:
+        if journey_events > OUT_OF_CORE_CONFIG['max_journey_events']:
+            print(f"Warning: {journey_events:,} cleaned events exceed the journey index limit; journeys are not indexed.")
+        indexes = merge_index_pieces(partition_pieces, device_attributes_df)
+        return aggregates, device_attributes_df, path_viz_data_df, all_paths_df, indexes
+    return aggregates, device_attributes_df, path_viz_data_df, all_paths_df
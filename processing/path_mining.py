@@ -0,0 +1,146 @@
+# processing/path_mining.py
+
+import numpy as np
+import pandas as pd
+
+from processing.stats_sketches import SpaceSaving
+
+# Most frequent multi-door routes (e.g. lobby -> elevator -> floor 3 -> server room), the multi-step
+# counterpart of find_most_common_next_doors. The events of a UserJourneyIndex are already in
+# (user, time) order as door codes; the code of every route of n consecutive doors is built with array
+# shifts, one door per step (code_n = code_{n-1} * base + door), and kept where all n doors fall in the
+# same user-day. With base = doors + 1 the codes are exact while base^n fits 64 bits, and a polynomial
+# hash (mod 2^64) otherwise. Each route counts once per user-day (its support). Events are mined in
+# chunks of whole users, whose counts are folded into one Space-Saving top-k per route length, so memory
+# stays bounded. Merged Space-Saving counts are only upper bounds, so a second pass over the chunks
+# counts the surviving `capacity` candidates exactly (user-days are deduplicated on the (user-day, route
+# code) pair itself, so only a collision of two routes' 64-bit hash codes could merge their supports),
+# and the top_k are the true top routes unless a route dropped in the first pass beat them.
+PATH_MINING_CONFIG = {
+    'route_lengths': (3, 4, 5),
+    'top_k': 10,              # routes returned per length
+    'capacity': 256,          # Space-Saving counters per length
+    'chunk_rows': 1_000_000,  # events mined at a time (rounded to whole users)
+}
+
+ROUTE_COLUMNS = ['Length', 'Route', 'Support']
+
+_HASH_BASE = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _chunk_bounds(offsets, chunk_rows):
+    """Row bounds of chunks of about `chunk_rows` events, cut at user boundaries."""
+    total = int(offsets[-1])
+    cuts = offsets[np.searchsorted(offsets, np.arange(chunk_rows, total, chunk_rows))]
+    return np.unique(np.concatenate([[0], cuts, [total]])).astype(np.int64)
+
+
+def _sequence_ids(offsets, day_numbers, lo, hi):
+    """Id of the user-day of each row in lo:hi (ids increase along the rows)."""
+    starts = np.zeros(hi - lo, dtype=bool)
+    starts[0] = True
+    starts[1:] = day_numbers[lo + 1:hi] != day_numbers[lo:hi - 1]
+    user_starts = offsets[(offsets > lo) & (offsets < hi)] - lo
+    starts[user_starts] = True
+    return np.cumsum(starts)
+
+
+def _first_occurrences(values):
+    """(labels, positions of the first occurrence of each label) of a hash factorization (no sort)."""
+    labels, _ = pd.factorize(values)
+    # Labels are numbered in order of appearance, so a label is new where it exceeds all earlier ones.
+    new = np.ones(len(labels), dtype=bool)
+    new[1:] = labels[1:] > np.maximum.accumulate(labels)[:-1]
+    return labels, np.flatnonzero(new)
+
+
+def _first_per_sequence(codes, sequence_ids):
+    """Positions of the first occurrence of each (user-day, route) pair, in row order."""
+    # Dense route labels make the pair key exact: user-day id * routes + label stays far below 2^63.
+    labels, routes = pd.factorize(codes)
+    _, first = _first_occurrences(sequence_ids.astype(np.int64) * len(routes) + labels)
+    return first
+
+
+def _count_routes(codes, sequence_ids, positions, capacity):
+    """(counts Series of the `capacity` + 1 best-supported routes, {route: start position})."""
+    kept = _first_per_sequence(codes, sequence_ids)  # one occurrence per user-day
+    labels, first = _first_occurrences(codes[kept])
+    routes, support, starts = codes[kept][first], np.bincount(labels), positions[kept][first]
+    if len(routes) > capacity + 1:
+        best = np.argpartition(-support, capacity)[:capacity + 1]
+        routes, support, starts = routes[best], support[best], starts[best]
+    return pd.Series(support, index=routes), dict(zip(routes.tolist(), starts.tolist()))
+
+
+def _chunk_routes(journey_index, route_lengths, chunk_rows):
+    """Yields (length, route codes, user-day ids, start rows) of the in-sequence routes, chunk by chunk."""
+    door_codes = journey_index.door_codes
+    day_numbers = journey_index.timestamps.astype('datetime64[D]').astype(np.int64)
+    offsets = journey_index.offsets.astype(np.int64)
+    exact = (len(journey_index.doors) + 1) ** route_lengths[-1] < 2 ** 64
+    base = np.uint64(len(journey_index.doors) + 1) if exact else _HASH_BASE
+
+    bounds = _chunk_bounds(offsets, chunk_rows)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        sequence_ids = _sequence_ids(offsets, day_numbers, lo, hi)
+        digits = door_codes[lo:hi].astype(np.uint64) + np.uint64(1)
+        codes = digits
+        for length in range(2, route_lengths[-1] + 1):
+            if len(codes) < 2:
+                break
+            codes = codes[:-1] * base + digits[length - 1:]
+            if length not in route_lengths:
+                continue
+            in_sequence = np.flatnonzero(sequence_ids[:len(codes)] == sequence_ids[length - 1:])
+            if len(in_sequence):
+                yield length, codes[in_sequence], sequence_ids[in_sequence], in_sequence + lo
+
+
+def frequent_routes(journey_index, route_lengths=None, top_k=None, capacity=None, chunk_rows=None):
+    """
+    Most frequent routes of each length in `route_lengths` (consecutive doors within one user-day), as a
+    DataFrame with ROUTE_COLUMNS: Route is the tuple of door names and Support the number of user-days
+    that took it. Sorted by length, then support.
+    """
+    route_lengths = sorted(set(route_lengths or PATH_MINING_CONFIG['route_lengths']))
+    top_k = top_k or PATH_MINING_CONFIG['top_k']
+    capacity = max(capacity or PATH_MINING_CONFIG['capacity'], top_k)
+    chunk_rows = chunk_rows or PATH_MINING_CONFIG['chunk_rows']
+    if journey_index is None or not len(journey_index.door_codes) or not route_lengths or route_lengths[0] < 2:
+        return pd.DataFrame(columns=ROUTE_COLUMNS)
+
+    # First pass: the `capacity` candidate routes per length (merged Space-Saving counts are upper bounds).
+    top = {length: SpaceSaving(capacity) for length in route_lengths}
+    starts = {length: {} for length in route_lengths}
+    for length, codes, sequence_ids, positions in _chunk_routes(journey_index, route_lengths, chunk_rows):
+        support, route_starts = _count_routes(codes, sequence_ids, positions, capacity)
+        top[length].add_counts(support)
+        for route, start in route_starts.items():
+            starts[length].setdefault(route, start)
+
+    # Second pass: exact supports of the candidates only.
+    candidates = {length: top[length].counts.index.to_numpy(dtype=np.uint64) for length in route_lengths}
+    exact = {length: pd.Series(0, index=top[length].counts.index, dtype=np.int64) for length in route_lengths}
+    for length, codes, sequence_ids, _ in _chunk_routes(journey_index, route_lengths, chunk_rows):
+        tracked = np.isin(codes, candidates[length])
+        if not tracked.any():
+            continue
+        kept = _first_per_sequence(codes[tracked], sequence_ids[tracked])
+        counts = pd.Series(codes[tracked][kept]).value_counts(sort=False)
+        exact[length] = exact[length].add(counts, fill_value=0).astype(np.int64)
+
+    rows = []
+    for length in route_lengths:
+        ranked = exact[length].sort_values(ascending=False, kind='stable')
+        # A route dropped in the first pass has support <= floor; above it the top_k are certain.
+        if len(ranked) and int(ranked.iloc[min(top_k, len(ranked)) - 1]) <= top[length].floor:
+            print(f"Warning: Routes of {length} doors dropped while mining may have up to {top[length].floor:,} "
+                  f"supports; raise PATH_MINING_CONFIG['capacity'] for a certain top {top_k}.")
+        for route, support in ranked.head(top_k).items():
+            start = starts[length][route]
+            rows.append({'Length': length, 'Route': tuple(journey_index.doors[journey_index.door_codes[start:start + length]]),
+                         'Support': int(support)})
+    routes = pd.DataFrame(rows, columns=ROUTE_COLUMNS)
+    print(f"Path mining: {len(routes)} frequent routes of {route_lengths} doors over {len(journey_index.door_codes):,} events.")
+    return routes
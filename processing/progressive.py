@@ -0,0 +1,95 @@
+# processing/progressive.py
+
+import numpy as np
+import pandas as pd
+
+from processing.model_aggregates import USERID_COL_DISPLAY, DOORID_COL_DISPLAY
+from processing.model_diff import door_index, aligned_door_values, transition_matrix, LAYER_COL
+
+# Progressive model generation for large in-memory uploads: the pipeline first runs on a stratified
+# sample of people, so a preview graph is shown within seconds, and the full model is built in the
+# background. People are stratified by activity (log2 of their event count) and by their most used
+# door; ordering them by stratum and taking every k-th one allocates the sample proportionally, so
+# both the busy and the occasional people of every area are represented.
+PROGRESSIVE_CONFIG = {
+    'min_rows': 200_000,          # loaded frames with at least this many rows get a preview first
+    'sample_fraction': 0.1,       # share of the people in the preview
+    'min_sample_users': 200,
+    'seed': 0,
+    # The background job's process rewrites its heartbeat every `heartbeat_seconds`; a job without one for
+    # `stale_after_seconds` (its process died or restarted) or running past `max_job_seconds` is failed.
+    'heartbeat_seconds': 10,
+    'stale_after_seconds': 60,
+    'max_job_seconds': 4 * 3600,
+}
+
+
+def stratified_user_sample(event_df, fraction=None, min_users=None, seed=None):
+    """Bool mask of the rows of `event_df` belonging to the sampled people."""
+    fraction = fraction or PROGRESSIVE_CONFIG['sample_fraction']
+    min_users = min_users or PROGRESSIVE_CONFIG['min_sample_users']
+    rng = np.random.default_rng(PROGRESSIVE_CONFIG['seed'] if seed is None else seed)
+
+    user_codes, users = pd.factorize(event_df[USERID_COL_DISPLAY])
+    door_codes, doors = pd.factorize(event_df[DOORID_COL_DISPLAY])
+    num_users, num_doors = len(users), max(len(doors), 1)
+    fraction = min(1.0, max(fraction, min_users / max(num_users, 1)))
+    if fraction >= 1.0:
+        return np.ones(len(event_df), dtype=bool)
+
+    # Most used door of each person: (user, door) counts, busiest door first within each user.
+    pairs, pair_counts = np.unique(user_codes.astype(np.int64) * num_doors + door_codes, return_counts=True)
+    pair_users = pairs // num_doors
+    by_user = np.lexsort((-pair_counts, pair_users))
+    first_of_user = np.ones(len(by_user), dtype=bool)
+    first_of_user[1:] = pair_users[by_user][1:] != pair_users[by_user][:-1]
+    main_doors = pairs[by_user][first_of_user] % num_doors
+
+    activity = np.log2(np.bincount(user_codes, minlength=num_users)).astype(np.int64)
+    strata = activity * num_doors + main_doors
+    ordered_users = np.lexsort((rng.random(num_users), strata))
+
+    step = 1.0 / fraction
+    positions = (rng.random() * step + step * np.arange(int(num_users * fraction) + 1)).astype(np.int64)
+    sampled = np.zeros(num_users, dtype=bool)
+    sampled[ordered_users[positions[positions < num_users]]] = True
+    return sampled[user_codes]
+
+
+def model_stability(preview_device_attrs, preview_all_paths, final_device_attrs, final_all_paths):
+    """
+    How much of the final model the preview already showed: share of the final doors present in the
+    preview and of those placed in the same layer, Jaccard overlap of the edge sets, share of the final
+    transition traffic on edges the preview had, and whether the official entrances are the same.
+    """
+    doors = door_index(preview_device_attrs, final_device_attrs)
+    layers_preview = aligned_door_values(preview_device_attrs, doors, LAYER_COL, 0).astype(np.int64)
+    layers_final = aligned_door_values(final_device_attrs, doors, LAYER_COL, 0).astype(np.int64)
+    in_final, in_both = layers_final > 0, (layers_final > 0) & (layers_preview > 0)
+
+    edges_preview = transition_matrix(preview_all_paths, doors).astype(bool)
+    edges_final = transition_matrix(final_all_paths, doors)
+    present_final = edges_final.astype(bool)
+    shared_edges = present_final.multiply(edges_preview).nnz
+    union_edges = present_final.nnz + edges_preview.nnz - shared_edges
+
+    def entrances(device_attrs):
+        if device_attrs is None or device_attrs.empty:
+            return set()
+        return set(device_attrs.loc[device_attrs['IsOfficialEntrance'].astype(bool), DOORID_COL_DISPLAY].astype(str))
+
+    return {
+        'door_coverage': float(in_both.sum() / in_final.sum()) if in_final.any() else 1.0,
+        'layer_agreement': float((layers_preview[in_both] == layers_final[in_both]).mean()) if in_both.any() else 1.0,
+        'edge_jaccard': shared_edges / union_edges if union_edges else 1.0,
+        'traffic_covered': float(edges_final.multiply(edges_preview).sum() / edges_final.sum()) if edges_final.nnz else 1.0,
+        'same_entrances': entrances(preview_device_attrs) == entrances(final_device_attrs),
+    }
+
+
+def stability_summary(stability):
+    """One-line description of model_stability for the status text."""
+    return (f"The preview had {stability['door_coverage']:.0%} of the doors, {stability['layer_agreement']:.0%} of them "
+            f"in the same layer, and {stability['edge_jaccard']:.0%} of the edges (carrying "
+            f"{stability['traffic_covered']:.0%} of the transitions); entrances "
+            f"{'unchanged' if stability['same_entrances'] else 'changed'}.")
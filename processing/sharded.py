@@ -0,0 +1,112 @@
+# processing/sharded.py
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+from processing.onion_model import prepare_enriched_events, empty_model_outputs
+from processing.model_aggregates import (compute_model_aggregates, merge_model_aggregates,
+                                         build_onion_model_from_aggregates, empty_model_aggregates)
+from processing.out_of_core import user_partition_ids
+from processing.index_pieces import enriched_index_pieces, merge_index_pieces
+
+# Parallel execution of the per-user stages (cleaning, ping-pong, user-day sequencing, transition
+# extraction) for event frames that fit in memory. Users are hash-sharded across a process pool;
+# each worker returns only its model aggregates, which are merged centrally. The pool is created on
+# first use and kept for the life of the process, so Generate clicks (Dash callback threads, the
+# progressive refinement thread) do not pay for spawning and importing workers every time.
+SHARDED_CONFIG = {
+    'max_workers': None,        # None -> os.cpu_count()
+    # More shards than workers evens out shards with a few very active users.
+    'shards_per_worker': 4,
+    # Loaded frames with at least this many rows use the process pool in generate_model_final.
+    'min_rows': 500_000,
+}
+
+USERID_COL_DISPLAY = REQUIRED_INTERNAL_COLUMNS['UserID']
+
+_POOL = None
+_POOL_WORKERS = 0
+_POOL_GUARD = threading.Lock()
+
+
+def _shard_pool(workers):
+    """The shared worker pool, (re)created when the worker count changes or a worker died."""
+    global _POOL, _POOL_WORKERS
+    with _POOL_GUARD:
+        if _POOL is not None and _POOL_WORKERS != workers:
+            _POOL.shutdown(wait=False)
+            _POOL = None
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=workers)
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def _discard_pool(pool):
+    global _POOL
+    with _POOL_GUARD:
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False)
+
+
+def shard_events_by_user(raw_df, num_shards):
+    """Splits an event frame into user-complete shards, keeping each shard's original row order."""
+    shard_ids = user_partition_ids(raw_df[USERID_COL_DISPLAY], num_shards)
+    return [shard_df for _, shard_df in raw_df.groupby(shard_ids, sort=True)]
+
+
+def _process_shard(shard_df, config_params, with_indexes=False):
+    """Process-pool worker: Module 1 up to sequencing on one shard, reduced to (aggregates, index pieces or None)."""
+    enriched_df, completed = prepare_enriched_events(shard_df, config_params)
+    aggregates = compute_model_aggregates(enriched_df) if completed else empty_model_aggregates()
+    aggregates['raw_event_count'] = len(shard_df)
+    pieces = enriched_index_pieces(enriched_df, shard_df) if with_indexes and completed and not enriched_df.empty else None
+    return aggregates, pieces
+
+
+def run_sharded_onion_model_processing(raw_df, config_params, confirmed_official_entrances=None,
+                                       detailed_door_classifications=None, max_workers=None, with_indexes=False):
+    """
+    Multi-core counterpart of run_onion_model_processing. Returns
+    (aggregates, device_attributes_df, path_viz_data_df, all_paths_df), with model frames identical
+    to the single-process pipeline's. With `with_indexes`, the workers also return index pieces and a
+    fifth item holds the merged indexes (see merge_index_pieces).
+    """
+    print("\n--- Starting Sharded Onion Model Processing ---")
+    if raw_df is None or raw_df.empty:
+        print("Error: Input DataFrame to pipeline is empty or None. Exiting pipeline.")
+        return (empty_model_aggregates(),) + empty_model_outputs() + ((merge_index_pieces([], None),) if with_indexes else ())
+
+    workers = max_workers or SHARDED_CONFIG['max_workers'] or os.cpu_count() or 1
+    shards = shard_events_by_user(raw_df, workers * SHARDED_CONFIG['shards_per_worker'])
+    print(f"DEBUG: {len(raw_df):,} events in {len(shards)} user shards across {min(workers, len(shards))} worker processes.")
+
+    if workers == 1 or len(shards) == 1:
+        shard_results = [_process_shard(shard_df, config_params, with_indexes) for shard_df in shards]
+    else:
+        pool = _shard_pool(workers)
+        # Largest shards first, so a big shard does not start last and become the tail.
+        ordered = sorted(shards, key=len, reverse=True)
+        try:
+            shard_results = list(pool.map(_process_shard, ordered, [config_params] * len(ordered),
+                                          [with_indexes] * len(ordered)))
+        except BrokenProcessPool:
+            # A worker was killed (e.g. out of memory): drop the pool so the next run starts a fresh one.
+            _discard_pool(pool)
+            raise
+    aggregates = merge_model_aggregates([shard_aggregates for shard_aggregates, _ in shard_results])
+
+    device_attributes_df, path_viz_data_df, all_paths_df = build_onion_model_from_aggregates(
+        aggregates, config_params, confirmed_official_entrances, detailed_door_classifications)
+
+    print("\n--- Sharded Processing Complete ---")
+    print(f"DEBUG: {aggregates['raw_event_count']:,} raw events, {aggregates['event_count']:,} enriched events, "
+          f"{len(device_attributes_df)} devices, {len(all_paths_df)} paths.")
+    if with_indexes:
+        indexes = merge_index_pieces([pieces for _, pieces in shard_results], device_attributes_df)
+        return aggregates, device_attributes_df, path_viz_data_df, all_paths_df, indexes
+    return aggregates, device_attributes_df, path_viz_data_df, all_paths_df
@@ -0,0 +1,128 @@
+# processing/stats_sketches.py
+
+import numpy as np
+import pandas as pd
+
+# Bounded-memory summaries for chunked, sharded, out-of-core and incremental runs, which never hold
+# every user id at once. Each one merges with others of the same configuration, so per-chunk, per-shard
+# and per-day summaries combine in any order:
+#   - HyperLogLog for distinct users (registers merge by maximum),
+#   - Space-Saving for the most frequent items of a stream too large to count exactly (counts are upper
+#     bounds; merges keep the `top_k_capacity` largest),
+#   - exact per-day event counters (a few hundred days at most).
+# Door and transition counts need no sketch: the model aggregates already hold them exactly.
+# Values are hashed with pd.util.hash_array, whose fixed key makes the hashes identical across processes.
+STATS_SKETCH_CONFIG = {
+    'hll_precision': 13,        # 2^13 one-byte registers: ~1.2% standard error on distinct users
+    'top_k_capacity': 64,       # default number of Space-Saving counters
+}
+
+
+def _bit_lengths(values):
+    """Bit length of each uint64, from the float exponents of its two exact 32-bit halves."""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+def value_hashes(values):
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+class HyperLogLog:
+    def __init__(self, precision=None):
+        self.precision = precision or STATS_SKETCH_CONFIG['hll_precision']
+        self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        register_bits = 64 - self.precision
+        index = (hashes >> np.uint64(register_bits)).astype(np.int64)
+        # Rank: position of the first 1 bit in the remaining bits (register_bits + 1 if they are all 0).
+        rest = hashes << np.uint64(self.precision)
+        ranks = np.minimum(64 - _bit_lengths(rest) + 1, register_bits + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, ranks)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog sketches with different precisions cannot be merged.")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * np.log(m / zeros)))   # linear counting for small cardinalities
+        return int(round(raw))
+
+
+class SpaceSaving:
+    """
+    Top-k counters in the mergeable form: `counts` (upper bounds) and `errors` per tracked key, and
+    `floor`, an upper bound on the count of every key that is not tracked.
+    """
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity or STATS_SKETCH_CONFIG['top_k_capacity']
+        self.counts = pd.Series(dtype=np.int64)
+        self.errors = pd.Series(dtype=np.int64)
+        self.floor = 0
+
+    def add_counts(self, counts):
+        """Folds in exact counts of one batch (a Series indexed by key)."""
+        batch = SpaceSaving(self.capacity)
+        counts = counts.sort_values(ascending=False, kind='stable').astype(np.int64)
+        batch.counts = counts.iloc[:self.capacity]
+        batch.errors = pd.Series(0, index=batch.counts.index, dtype=np.int64)
+        batch.floor = int(counts.iloc[self.capacity]) if len(counts) > self.capacity else 0
+        self.merge(batch)
+
+    def merge(self, other):
+        keys = self.counts.index.union(other.counts.index)
+        counts = self.counts.reindex(keys, fill_value=self.floor) + other.counts.reindex(keys, fill_value=other.floor)
+        errors = self.errors.reindex(keys, fill_value=self.floor) + other.errors.reindex(keys, fill_value=other.floor)
+        counts = counts.sort_values(ascending=False, kind='stable')
+        floor = self.floor + other.floor
+        if len(counts) > self.capacity:
+            floor = max(floor, int(counts.iloc[self.capacity]))
+        self.counts = counts.iloc[:self.capacity].astype(np.int64)
+        self.errors = errors.reindex(self.counts.index).astype(np.int64)
+        self.floor = floor
+
+
+class EventStatsSketch:
+    """Mergeable stats of enriched events: distinct users and events per day."""
+
+    def __init__(self):
+        self.event_count = 0
+        self.users = HyperLogLog()
+        self.day_counts = {}
+
+    def update(self, users, dates):
+        """Adds events given as arrays of user ids and dates."""
+        if not len(users):
+            return self
+        self.event_count += len(users)
+        self.users.add_hashes(value_hashes(pd.unique(users)))
+        for day, count in pd.Series(dates).value_counts(sort=False).items():
+            self.day_counts[day] = self.day_counts.get(day, 0) + int(count)
+        return self
+
+    def merge(self, other):
+        self.event_count += other.event_count
+        self.users.merge(other.users)
+        for day, count in other.day_counts.items():
+            self.day_counts[day] = self.day_counts.get(day, 0) + count
+        return self
+
+    @classmethod
+    def merged(cls, sketches):
+        combined = cls()
+        for sketch in sketches:
+            if sketch is not None:
+                combined.merge(sketch)
+        return combined
+
+    def distinct_users(self):
+        return self.users.estimate()
@@ -0,0 +1,210 @@
+# processing/temporal_windows.py
+
+import datetime
+import numpy as np
+import pandas as pd
+
+from processing.model_aggregates import (compute_model_aggregates, merge_model_aggregates, build_onion_model_from_aggregates,
+                                         empty_model_aggregates, TIMESTAMP_COL_DISPLAY, DOORID_COL_DISPLAY, USERID_COL_DISPLAY,
+                                         DATE_COL_NAME, DEPTH_COL_NAME, SEQUENCE_KEY_COLUMNS)
+from processing.onion_model import empty_model_outputs
+from processing.stats_sketches import EventStatsSketch
+
+# Models for arbitrary day windows (rolling 7/30 days) from per-day aggregates built once.
+# The additive parts (depth histograms, transition counts, entrance counts, event counts) are kept as
+# prefix sums over days, so any window is cum[end + 1] - cum[start] regardless of its length. The
+# "first appearance" tie-break keys are rank-encoded per door and day; a window takes their minimum.
+TEMPORAL_WINDOW_CONFIG = {
+    'window_days_options': [7, 30],
+    'step_days': 1,
+}
+
+
+def _prefix_sums(day_codes, item_codes, values, num_days, num_items):
+    """(num_days + 1, num_items) cumulative matrix of `values` summed per (day, item)."""
+    dense = np.zeros((num_days, num_items), dtype=np.int64)
+    np.add.at(dense, (day_codes, item_codes), values)
+    return np.vstack([np.zeros((1, num_items), dtype=np.int64), dense.cumsum(axis=0)])
+
+
+def _stack_day_frames(day_aggregates, key):
+    frames = [aggregates[key].assign(_day=day_index) for day_index, aggregates in enumerate(day_aggregates)
+              if not aggregates[key].empty]
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+def day_model_aggregates(enriched_event_df, raw_event_df=None):
+    """{datetime.date: aggregates} of an enriched frame, with raw event counts from `raw_event_df`."""
+    day_aggregates = {}
+    if enriched_event_df is not None and not enriched_event_df.empty:
+        day_aggregates = {day: compute_model_aggregates(day_df)
+                          for day, day_df in enriched_event_df.groupby(DATE_COL_NAME, sort=True)}
+    if raw_event_df is not None and not raw_event_df.empty:
+        raw_days = pd.to_datetime(raw_event_df[TIMESTAMP_COL_DISPLAY], errors='coerce').dt.date
+        for day, raw_count in raw_days.value_counts().items():
+            day_aggregates.setdefault(day, empty_model_aggregates())['raw_event_count'] = int(raw_count)
+    return day_aggregates
+
+
+def merge_day_aggregates(day_aggregates_list):
+    """Merges {day: aggregates} mappings (e.g. of disjoint sets of users) day by day."""
+    by_day = {}
+    for day_aggregates in day_aggregates_list:
+        for day, aggregates in day_aggregates.items():
+            by_day.setdefault(day, []).append(aggregates)
+    return {day: merge_model_aggregates(parts) for day, parts in by_day.items()}
+
+
+class TemporalModelIndex:
+    """Per-day model aggregates arranged for O(1)-in-window-length range merges."""
+
+    def __init__(self, day_aggregates):
+        """`day_aggregates` maps datetime.date -> aggregates (as kept in an incremental model state)."""
+        self.days = sorted(day_aggregates)
+        per_day = [day_aggregates[day] for day in self.days]
+        num_days = len(self.days)
+
+        self.cum_event_count = np.concatenate([[0], np.cumsum([a['event_count'] for a in per_day])])
+        self.cum_raw_event_count = np.concatenate([[0], np.cumsum([a.get('raw_event_count', 0) for a in per_day])])
+        self.min_timestamps = pd.Series([a['min_timestamp'] for a in per_day], dtype='datetime64[ns]')
+        self.max_timestamps = pd.Series([a['max_timestamp'] for a in per_day], dtype='datetime64[ns]')
+        self.day_stats = [a.get('stats') for a in per_day]
+        self.day_dates = [a['dates'] for a in per_day]
+
+        # Depth histograms: one column per (door, depth) pair seen on any day.
+        depth_counts = _stack_day_frames(per_day, 'depth_counts')
+        if depth_counts is None:
+            self.depth_pairs = pd.DataFrame(columns=[DOORID_COL_DISPLAY, DEPTH_COL_NAME])
+            self.cum_depth_counts = np.zeros((num_days + 1, 0), dtype=np.int64)
+        else:
+            pair_codes, pairs = pd.MultiIndex.from_frame(depth_counts[[DOORID_COL_DISPLAY, DEPTH_COL_NAME]]).factorize()
+            self.depth_pairs = pairs.set_names([DOORID_COL_DISPLAY, DEPTH_COL_NAME]).to_frame(index=False)
+            self.cum_depth_counts = _prefix_sums(depth_counts['_day'].to_numpy(), pair_codes,
+                                                 depth_counts['Count'].to_numpy(dtype=np.int64), num_days, len(pairs))
+
+        transitions = _stack_day_frames(per_day, 'transition_counts')
+        if transitions is None:
+            self.transition_pairs = pd.DataFrame(columns=['SourceDoor', 'TargetDoor'])
+            self.cum_transitions = np.zeros((num_days + 1, 0), dtype=np.int64)
+        else:
+            pair_codes, pairs = pd.MultiIndex.from_frame(transitions[['SourceDoor', 'TargetDoor']]).factorize()
+            self.transition_pairs = pairs.set_names(['SourceDoor', 'TargetDoor']).to_frame(index=False)
+            self.cum_transitions = _prefix_sums(transitions['_day'].to_numpy(), pair_codes,
+                                                transitions['TransitionFrequency'].to_numpy(dtype=np.int64),
+                                                num_days, len(pairs))
+
+        self.entry_doors, self.cum_entry_counts, self.entry_keys, self.entry_key_ranks = \
+            self._ranked_first_rows(per_day, 'first_event_counts', [USERID_COL_DISPLAY, DATE_COL_NAME], 'Count')
+        self.seen_doors, _, self.seen_keys, self.seen_key_ranks = \
+            self._ranked_first_rows(per_day, 'door_first_seen', SEQUENCE_KEY_COLUMNS, None)
+
+    @staticmethod
+    def _ranked_first_rows(per_day, key, key_columns, count_column):
+        """
+        For per-door "earliest occurrence" rows: (doors, prefix sums of `count_column` or None,
+        the sorted distinct keys, a (days, doors) matrix of key ranks with -1 where a door is absent).
+        """
+        num_days = len(per_day)
+        rows = _stack_day_frames(per_day, key)
+        if rows is None:
+            return pd.Index([]), np.zeros((num_days + 1, 0), dtype=np.int64), pd.DataFrame(columns=key_columns), \
+                np.full((num_days, 0), -1, dtype=np.int64)
+        door_codes, doors = pd.factorize(rows[DOORID_COL_DISPLAY])
+        # Ranks follow the same sort the merge uses, so min(rank) picks the row merge_model_aggregates keeps.
+        keys = rows[key_columns].sort_values(key_columns, kind='stable')
+        ranks = np.empty(len(rows), dtype=np.int64)
+        ranks[keys.index.to_numpy()] = np.arange(len(rows))
+        rank_matrix = np.full((num_days, len(doors)), -1, dtype=np.int64)
+        rank_matrix[rows['_day'].to_numpy(), door_codes] = ranks
+        cum_counts = None
+        if count_column is not None:
+            cum_counts = _prefix_sums(rows['_day'].to_numpy(), door_codes, rows[count_column].to_numpy(dtype=np.int64),
+                                      num_days, len(doors))
+        return pd.Index(doors), cum_counts, keys.reset_index(drop=True), rank_matrix
+
+    @classmethod
+    def from_model_state(cls, state):
+        return cls(state['days'])
+
+    @classmethod
+    def from_enriched_events(cls, enriched_event_df, raw_event_df=None):
+        """
+        One vectorized aggregate pass per day of an enriched frame (as from run_onion_model_processing).
+        `raw_event_df` (the frame fed to the pipeline) supplies the per-day raw event counts.
+        """
+        return cls(day_model_aggregates(enriched_event_df, raw_event_df))
+
+    # --- Windows ---
+
+    def day_range(self, start=None, end=None):
+        """Inclusive (first, last) day positions covering [start, end]; last < first when no day falls inside."""
+        first = 0 if start is None else int(np.searchsorted(self.days, pd.Timestamp(start).date(), side='left'))
+        last = len(self.days) - 1 if end is None else int(np.searchsorted(self.days, pd.Timestamp(end).date(), side='right')) - 1
+        return first, last
+
+    def _window_earliest(self, doors, key_ranks, keys, first, last, extra_columns=None):
+        window_ranks = key_ranks[first:last + 1]
+        window_ranks = np.where(window_ranks < 0, np.iinfo(np.int64).max, window_ranks)
+        best = window_ranks.min(axis=0) if len(window_ranks) else np.array([], dtype=np.int64)
+        present = best < np.iinfo(np.int64).max
+        frame = keys.iloc[best[present]].reset_index(drop=True)
+        frame.insert(0, DOORID_COL_DISPLAY, doors[present])
+        for column, values in (extra_columns or {}).items():
+            frame[column] = values[present]
+        return frame.sort_values(list(keys.columns), kind='stable', ignore_index=True)
+
+    def window_aggregates(self, start=None, end=None):
+        """Aggregates of the days in [start, end], equal to merge_model_aggregates over those days."""
+        first, last = self.day_range(start, end)
+        aggregates = empty_model_aggregates()
+        if last < first:
+            return aggregates
+        aggregates['raw_event_count'] = int(self.cum_raw_event_count[last + 1] - self.cum_raw_event_count[first])
+        event_count = int(self.cum_event_count[last + 1] - self.cum_event_count[first])
+        if not event_count:
+            return aggregates
+
+        depth_counts = self.cum_depth_counts[last + 1] - self.cum_depth_counts[first]
+        nonzero = depth_counts > 0
+        aggregates['depth_counts'] = self.depth_pairs[nonzero].assign(Count=depth_counts[nonzero]).reset_index(drop=True)
+
+        transitions = self.cum_transitions[last + 1] - self.cum_transitions[first]
+        nonzero = transitions > 0
+        aggregates['transition_counts'] = self.transition_pairs[nonzero].assign(
+            TransitionFrequency=transitions[nonzero]).reset_index(drop=True)
+
+        entry_counts = self.cum_entry_counts[last + 1] - self.cum_entry_counts[first]
+        entries = self._window_earliest(self.entry_doors, self.entry_key_ranks, self.entry_keys, first, last,
+                                        {'Count': entry_counts})
+        aggregates['first_event_counts'] = entries[[DOORID_COL_DISPLAY, 'Count', USERID_COL_DISPLAY, DATE_COL_NAME]]
+        aggregates['door_first_seen'] = self._window_earliest(self.seen_doors, self.seen_key_ranks, self.seen_keys, first, last)
+
+        aggregates['event_count'] = event_count
+        aggregates['min_timestamp'] = self.min_timestamps.iloc[first:last + 1].min()
+        aggregates['max_timestamp'] = self.max_timestamps.iloc[first:last + 1].max()
+        aggregates['dates'] = set().union(*self.day_dates[first:last + 1])
+        aggregates['stats'] = EventStatsSketch.merged(self.day_stats[first:last + 1])
+        return aggregates
+
+    def window_model(self, config_params, start=None, end=None, confirmed_official_entrances=None,
+                     detailed_door_classifications=None):
+        """(aggregates, device_attributes_df, path_viz_data_df, all_paths_df) for the days in [start, end]."""
+        aggregates = self.window_aggregates(start, end)
+        if not aggregates['event_count']:
+            return (aggregates,) + empty_model_outputs()
+        return (aggregates,) + build_onion_model_from_aggregates(
+            aggregates, config_params, confirmed_official_entrances, detailed_door_classifications)
+
+    def rolling_windows(self, window_days, step_days=None):
+        """Calendar windows [(start, end)] of `window_days` days, stepping by `step_days`, over the indexed days."""
+        if not self.days:
+            return []
+        step_days = step_days or TEMPORAL_WINDOW_CONFIG['step_days']
+        last_start = max(self.days[0], self.days[-1] - datetime.timedelta(days=window_days - 1))
+        windows, start = [], self.days[0]
+        while start <= last_start:
+            windows.append((start, start + datetime.timedelta(days=window_days - 1)))
+            start += datetime.timedelta(days=step_days)
+        return windows
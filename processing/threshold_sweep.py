@@ -0,0 +1,124 @@
+# processing/threshold_sweep.py
+
+import itertools
+import numpy as np
+import pandas as pd
+
+from processing.onion_model import filter_access_events, normalize_door_ids
+from processing.deduplication import drop_duplicate_events
+from processing.model_aggregates import (compute_model_aggregates, build_onion_model_from_aggregates,
+                                         TIMESTAMP_COL_DISPLAY, USERID_COL_DISPLAY, DOORID_COL_DISPLAY,
+                                         DATE_COL_NAME, DEPTH_COL_NAME)
+
+# Sensitivity of the model to the two cleaning thresholds. The event frame is filtered and sorted once;
+# the gap to the previous scan of the same (user, door) is computed once, so each rapid-scan threshold
+# is a comparison, and for each of those the A->B->A spans are computed once, so each ping-pong threshold
+# is a comparison too. Every combination then goes through the aggregate model build (Modules 2-4).
+SENSITIVITY_SWEEP_CONFIG = {
+    'same_door_scan_threshold_seconds': [5, 10, 30, 60],
+    'ping_pong_threshold_minutes': [0.5, 1, 2, 5],
+}
+
+SWEEP_COLUMNS = ['same_door_scan_threshold_seconds', 'ping_pong_threshold_minutes', 'RapidScansRemoved',
+                 'PingPongRemoved', 'EnrichedEvents', 'Devices', 'Paths', 'Layers', 'Entrances',
+                 'LayerChangesVsCurrent', 'DoorLayers']
+
+
+def _sequence_depths(user_codes, date_codes):
+    """1-based position of each row within its (user, date) run; rows must already be in sequence order."""
+    starts = np.ones(len(user_codes), dtype=bool)
+    starts[1:] = (user_codes[1:] != user_codes[:-1]) | (date_codes[1:] != date_codes[:-1])
+    start_positions = np.flatnonzero(starts)
+    return np.arange(len(user_codes)) - start_positions[np.cumsum(starts) - 1] + 1
+
+
+def _ping_pong_flags(user_codes, door_codes, timestamps, thresholds_ns):
+    """{threshold: bool mask of rows in an A->B->A triple within the threshold}, rows in (user, time) order."""
+    triple = (user_codes[:-2] == user_codes[2:]) & (door_codes[:-2] == door_codes[2:]) & (door_codes[:-2] != door_codes[1:-1])
+    spans = timestamps[2:] - timestamps[:-2]
+    flags = {}
+    for threshold_ns in thresholds_ns:
+        hit = triple & (spans <= threshold_ns)
+        flagged = np.zeros(len(user_codes), dtype=bool)
+        flagged[:-2] |= hit
+        flagged[1:-1] |= hit
+        flagged[2:] |= hit
+        flags[threshold_ns] = flagged
+    return flags
+
+
+def run_threshold_sweep(raw_df, config_params, scan_thresholds=None, ping_pong_thresholds=None,
+                        confirmed_official_entrances=None, detailed_door_classifications=None):
+    """
+    Runs the model for every (same_door_scan_threshold_seconds, ping_pong_threshold_minutes) pair and
+    returns one row per pair: events removed by each filter, events/devices/paths/layers left, the
+    entrances picked and the door -> layer assignment (with the number of doors whose layer differs
+    from the run with the thresholds in `config_params`).
+    """
+    scan_thresholds = list(scan_thresholds or SENSITIVITY_SWEEP_CONFIG['same_door_scan_threshold_seconds'])
+    ping_pong_thresholds = list(ping_pong_thresholds or SENSITIVITY_SWEEP_CONFIG['ping_pong_threshold_minutes'])
+    current = (config_params.get('same_door_scan_threshold_seconds', 10), config_params.get('ping_pong_threshold_minutes', 1))
+    combinations = list(itertools.product(scan_thresholds, ping_pong_thresholds))
+    if current not in combinations:
+        combinations.append(current)
+
+    df = raw_df.copy()
+    if config_params.get('drop_exact_duplicates', True):
+        df, _ = drop_duplicate_events(df)
+    df = normalize_door_ids(filter_access_events(df, config_params), door_id_col=DOORID_COL_DISPLAY)
+    timestamps = pd.to_datetime(df[TIMESTAMP_COL_DISPLAY], errors='coerce')
+    df, timestamps = df[timestamps.notna()], timestamps[timestamps.notna()]
+    if df.empty:
+        print("Warning: No events left after event type filtering; nothing to sweep.")
+        return pd.DataFrame(columns=SWEEP_COLUMNS)
+
+    user_codes, _ = pd.factorize(df[USERID_COL_DISPLAY], sort=True)
+    door_codes, _ = pd.factorize(df[DOORID_COL_DISPLAY], sort=True)
+    ts = timestamps.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+    # Gap to the previous scan of the same user at the same door (as in remove_rapid_same_door_scans).
+    by_door = np.lexsort((ts, door_codes, user_codes))
+    gaps = np.full(len(ts), np.iinfo(np.int64).max, dtype=np.int64)
+    same_pair = (user_codes[by_door[1:]] == user_codes[by_door[:-1]]) & (door_codes[by_door[1:]] == door_codes[by_door[:-1]])
+    gaps[by_door[1:][same_pair]] = (ts[by_door[1:]] - ts[by_door[:-1]])[same_pair]
+    # (user, time) order of flag_ping_pong_scans, ties by door; a subset of it stays in that order.
+    by_time = np.lexsort((door_codes, ts, user_codes))
+
+    users, doors = df[USERID_COL_DISPLAY].to_numpy(), df[DOORID_COL_DISPLAY].to_numpy()
+    dates = timestamps.dt.date.to_numpy()
+    day_numbers = ts // (24 * 3600 * 10**9)
+    rows = []
+    for scan_seconds in dict.fromkeys(threshold for threshold, _ in combinations):
+        kept = by_time[gaps[by_time] > scan_seconds * 10**9]
+        ping_pong_for_scan = [minutes for threshold, minutes in combinations if threshold == scan_seconds]
+        flags = _ping_pong_flags(user_codes[kept], door_codes[kept], ts[kept],
+                                 [int(minutes * 60 * 10**9) for minutes in ping_pong_for_scan])
+        for minutes in ping_pong_for_scan:
+            remaining = kept[~flags[int(minutes * 60 * 10**9)]]
+            enriched = pd.DataFrame({
+                TIMESTAMP_COL_DISPLAY: timestamps.to_numpy()[remaining], USERID_COL_DISPLAY: users[remaining],
+                DOORID_COL_DISPLAY: doors[remaining], DATE_COL_NAME: dates[remaining],
+                DEPTH_COL_NAME: _sequence_depths(user_codes[remaining], day_numbers[remaining]),
+            })
+            run_config = dict(config_params, same_door_scan_threshold_seconds=scan_seconds, ping_pong_threshold_minutes=minutes)
+            device_attrs, _, all_paths = build_onion_model_from_aggregates(
+                compute_model_aggregates(enriched), run_config, confirmed_official_entrances, detailed_door_classifications)
+            door_layers = dict(zip(device_attrs[DOORID_COL_DISPLAY], device_attrs['FinalGlobalDeviceDepth'].astype(int))) \
+                if not device_attrs.empty else {}
+            rows.append({
+                'same_door_scan_threshold_seconds': scan_seconds, 'ping_pong_threshold_minutes': minutes,
+                'RapidScansRemoved': len(ts) - len(kept), 'PingPongRemoved': len(kept) - len(remaining),
+                'EnrichedEvents': len(remaining), 'Devices': len(device_attrs), 'Paths': len(all_paths),
+                'Layers': max(door_layers.values(), default=0),
+                'Entrances': sorted(device_attrs.loc[device_attrs['IsOfficialEntrance'].astype(bool), DOORID_COL_DISPLAY])
+                if not device_attrs.empty else [],
+                'DoorLayers': door_layers,
+            })
+
+    sweep = pd.DataFrame(rows).sort_values(['same_door_scan_threshold_seconds', 'ping_pong_threshold_minutes'], ignore_index=True)
+    current_layers = sweep.loc[(sweep['same_door_scan_threshold_seconds'] == current[0])
+                               & (sweep['ping_pong_threshold_minutes'] == current[1]), 'DoorLayers'].iloc[0]
+    sweep['LayerChangesVsCurrent'] = [sum(layers.get(door) != layer for door, layer in current_layers.items())
+                                      + len(set(layers) - set(current_layers)) for layers in sweep['DoorLayers']]
+    print(f"Threshold sweep: {len(sweep)} combinations over {len(df):,} events.")
+    return sweep[SWEEP_COLUMNS]
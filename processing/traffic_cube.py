@@ -0,0 +1,123 @@
+# processing/traffic_cube.py
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from processing.model_aggregates import TIMESTAMP_COL_DISPLAY, DOORID_COL_DISPLAY
+
+# Event counts per door x calendar day x hour of day, built in one pass over the enriched events.
+# The cube is a sparse (doors, days * 24) matrix: a door selection is a set of rows and a date range a
+# contiguous block of columns, so heatmaps and peak hours for any slice only sum the stored cells.
+TRAFFIC_CUBE_CONFIG = {
+    'peak_hours': 3,             # hours listed in the peak-hour summary
+    'max_heatmap_doors': 40,     # busiest doors shown in the door x hour heatmap
+}
+
+HOURS_PER_DAY = 24
+
+
+class TrafficCube:
+    def __init__(self, enriched_event_df, device_attributes_df=None):
+        """`device_attributes_df` (the model's door attributes) allows selecting doors by layer and floor."""
+        timestamps = pd.to_datetime(enriched_event_df[TIMESTAMP_COL_DISPLAY])
+        door_codes, doors = pd.factorize(enriched_event_df[DOORID_COL_DISPLAY].astype(str), sort=True)
+        day_numbers = timestamps.to_numpy(dtype='datetime64[D]').astype(np.int64)
+        first_day_number = int(day_numbers.min()) if len(day_numbers) else 0
+        num_days = int(day_numbers.max()) - first_day_number + 1 if len(day_numbers) else 0
+
+        self.doors = pd.Index(doors)
+        self.first_day = np.datetime64(first_day_number, 'D')
+        self.num_days = num_days
+        columns = (day_numbers - first_day_number) * HOURS_PER_DAY + timestamps.dt.hour.to_numpy()
+        # Duplicate (door, column) entries are summed when the matrix is assembled.
+        self.counts = sparse.csr_matrix((np.ones(len(door_codes), dtype=np.int32), (door_codes, columns)),
+                                        shape=(len(doors), num_days * HOURS_PER_DAY))
+
+        self._set_door_attributes(device_attributes_df)
+
+    @classmethod
+    def merge(cls, cubes, device_attributes_df=None):
+        """One cube from cubes of parts of the events (e.g. the shards of a sharded run): the counts add up."""
+        cubes = [cube for cube in cubes if cube.num_days]
+        merged = cls.__new__(cls)
+        merged.doors = pd.Index(sorted(set().union(*(cube.doors for cube in cubes))))
+        merged.first_day = min((cube.first_day for cube in cubes), default=np.datetime64(0, 'D'))
+        merged.num_days = max((int((cube.first_day - merged.first_day).astype(np.int64)) + cube.num_days
+                               for cube in cubes), default=0)
+        merged.counts = sparse.csr_matrix((len(merged.doors), merged.num_days * HOURS_PER_DAY), dtype=np.int32)
+        for cube in cubes:
+            # Rows move to the merged door codes and columns shift by the cube's first day.
+            cells = cube.counts.tocoo()
+            day_shift = int((cube.first_day - merged.first_day).astype(np.int64))
+            merged.counts = merged.counts + sparse.csr_matrix(
+                (cells.data, (merged.doors.get_indexer(cube.doors)[cells.row], cells.col + day_shift * HOURS_PER_DAY)),
+                shape=merged.counts.shape)
+        merged._set_door_attributes(device_attributes_df)
+        return merged
+
+    def _set_door_attributes(self, device_attributes_df):
+        self.door_layers = np.full(len(self.doors), -1, dtype=np.int64)
+        self.door_floors = np.full(len(self.doors), '', dtype=object)
+        if device_attributes_df is not None and not device_attributes_df.empty:
+            attributes = device_attributes_df.assign(_door=device_attributes_df[DOORID_COL_DISPLAY].astype(str)) \
+                .drop_duplicates('_door').set_index('_door').reindex(self.doors)
+            self.door_layers = pd.to_numeric(attributes['FinalGlobalDeviceDepth'], errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+            self.door_floors = attributes['Floor'].fillna('').astype(str).to_numpy(dtype=object)
+
+    @property
+    def days(self):
+        return [pd.Timestamp(self.first_day + offset).date() for offset in range(self.num_days)]
+
+    def layers(self):
+        return sorted(int(layer) for layer in np.unique(self.door_layers) if layer >= 0)
+
+    def floors(self):
+        return sorted(floor for floor in set(self.door_floors) if floor)
+
+    def door_rows(self, doors=None, layers=None, floors=None):
+        """Row positions of the doors matching every given filter (None/empty means no filter)."""
+        mask = np.ones(len(self.doors), dtype=bool)
+        if doors:
+            mask &= self.doors.isin([str(door) for door in doors])
+        if layers:
+            mask &= np.isin(self.door_layers, [int(layer) for layer in layers])
+        if floors:
+            mask &= np.isin(self.door_floors, [str(floor) for floor in floors])
+        return np.flatnonzero(mask)
+
+    def day_span(self, start=None, end=None):
+        """[first, last) day positions of the inclusive date range [start, end], clipped to the cube."""
+        first = 0 if start is None else int((np.datetime64(pd.Timestamp(start).date(), 'D') - self.first_day).astype(np.int64))
+        last = self.num_days if end is None else int((np.datetime64(pd.Timestamp(end).date(), 'D') - self.first_day).astype(np.int64)) + 1
+        first, last = max(0, first), min(self.num_days, last)
+        return first, max(first, last)
+
+    def _slice(self, doors=None, layers=None, floors=None, start=None, end=None):
+        rows = self.door_rows(doors, layers, floors)
+        first, last = self.day_span(start, end)
+        return rows, first, last, self.counts[rows][:, first * HOURS_PER_DAY:last * HOURS_PER_DAY]
+
+    def date_hour_matrix(self, doors=None, layers=None, floors=None, start=None, end=None):
+        """(dates, (days, 24) counts) summed over the selected doors."""
+        _, first, last, block = self._slice(doors, layers, floors, start, end)
+        matrix = np.asarray(block.sum(axis=0)).reshape(last - first, HOURS_PER_DAY)
+        return self.days[first:last], matrix
+
+    def door_hour_matrix(self, doors=None, layers=None, floors=None, start=None, end=None):
+        """(door names, (doors, 24) counts) summed over the selected days."""
+        rows, _, _, block = self._slice(doors, layers, floors, start, end)
+        block = block.tocoo()
+        matrix = np.bincount(block.row * HOURS_PER_DAY + block.col % HOURS_PER_DAY, weights=block.data,
+                             minlength=len(rows) * HOURS_PER_DAY).reshape(len(rows), HOURS_PER_DAY).astype(np.int64)
+        return list(self.doors[rows]), matrix
+
+    def hourly_totals(self, doors=None, layers=None, floors=None, start=None, end=None):
+        _, matrix = self.date_hour_matrix(doors, layers, floors, start, end)
+        return matrix.sum(axis=0)
+
+    def peak_hours(self, doors=None, layers=None, floors=None, start=None, end=None, top=None):
+        """[(hour, events)] of the busiest hours of day in the selection, busiest first."""
+        totals = self.hourly_totals(doors, layers, floors, start, end)
+        order = np.argsort(-totals, kind='stable')[:top or TRAFFIC_CUBE_CONFIG['peak_hours']]
+        return [(int(hour), int(totals[hour])) for hour in order if totals[hour] > 0]
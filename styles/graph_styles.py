@@ -133,6 +133,27 @@ actual_default_stylesheet_for_graph = [
         'selector': '[security_level="red"]',
         'style': {'background-color': COLORS['critical'], 'border-color': COLORS['critical'], 'color': COLORS['text_on_dark']}
     },
+    # Model comparison overlay (processing/model_diff.apply_diff_overlay)
+    {
+        'selector': 'node.diff-added',
+        'style': {'border-width': 4, 'border-color': COLORS['success'], 'border-style': 'double'}
+    },
+    {
+        'selector': 'node.diff-layer-changed',
+        'style': {'border-width': 4, 'border-color': COLORS['warning']}
+    },
+    {
+        'selector': 'node.diff-next-changed',
+        'style': {'border-width': 3, 'border-color': COLORS['accent'], 'border-style': 'dashed'}
+    },
+    {
+        'selector': 'edge.diff-added',
+        'style': {'line-color': COLORS['success'], 'target-arrow-color': COLORS['success'], 'width': 3}
+    },
+    {
+        'selector': 'edge.diff-removed',
+        'style': {'line-color': COLORS['critical'], 'target-arrow-color': COLORS['critical'], 'line-style': 'dashed', 'width': 2}
+    },
     # Add other selectors as needed for active, selected states etc.
     {
         'selector': ':selected',
@@ -144,4 +165,9 @@ actual_default_stylesheet_for_graph = [
             'overlay-opacity': 0.2
         }
     }
-]
\ No newline at end of file
+]
+
+# Journey highlight (callbacks/journey_callbacks.py): appended to the default stylesheet per selected person
+journey_node_style = {'border-width': 4, 'border-color': COLORS['accent'], 'background-color': COLORS['accent']}
+journey_edge_style = {'line-color': COLORS['accent'], 'target-arrow-color': COLORS['accent'], 'width': 4, 'z-index': 10}
+journey_dimmed_style = {'opacity': 0.25}
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+
+DOORS = ['LOBBY A', 'LOBBY B', 'ELEV 1', 'ELEV 2', 'F2 EAST', 'F2 WEST', 'F3 LAB', 'SERVER ROOM', 'GARAGE', 'STAIR N']
+CSV_MAPPING = {'Time': REQUIRED_INTERNAL_COLUMNS['Timestamp'], 'Badge': REQUIRED_INTERNAL_COLUMNS['UserID'],
+               'Device': REQUIRED_INTERNAL_COLUMNS['DoorID'], 'Result': REQUIRED_INTERNAL_COLUMNS['EventType']}
+
+
+def make_csv_events(num_users=60, days=5, seed=0, start='2024-01-01'):
+    """Synthetic raw export (CSV column names): morning entrance scans followed by a few inner doors."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for day in range(days):
+        for user in range(num_users):
+            if rng.random() < 0.3:
+                continue
+            t = pd.Timestamp(start) + pd.Timedelta(days=day, hours=int(rng.integers(6, 10)),
+                                                   minutes=int(rng.integers(0, 60)))
+            doors = [DOORS[rng.integers(0, 2)] if rng.random() < 0.8 else 'GARAGE']
+            doors += [DOORS[rng.integers(2, 10)] for _ in range(rng.integers(1, 6))]
+            for door in doors:
+                result = 'ACCESS GRANTED' if rng.random() < 0.93 else 'INVALID ACCESS LEVEL'
+                rows.append((t.strftime('%Y-%m-%d %H:%M:%S'), f'U{user:04d}', door, result))
+                t += pd.Timedelta(seconds=int(rng.integers(3, 900)))
+    return pd.DataFrame(rows, columns=list(CSV_MAPPING))
+
+
+def make_events(num_users=60, days=5, seed=0, start='2024-01-01'):
+    """make_csv_events with display-name columns and parsed timestamps, as load_csv_event_log returns them."""
+    df = make_csv_events(num_users, days, seed, start).rename(columns=CSV_MAPPING)
+    df[REQUIRED_INTERNAL_COLUMNS['Timestamp']] = pd.to_datetime(df[REQUIRED_INTERNAL_COLUMNS['Timestamp']])
+    return df
+
+
+@pytest.fixture
+def raw_events():
+    return make_events()
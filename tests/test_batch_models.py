@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from batch_models import run_site
+from data_io.ingest import expand_csv_members
+from data_io.event_store import EVENT_STORE_CONFIG
+from processing.incremental import INCREMENTAL_CONFIG
+from tests.conftest import CSV_MAPPING, make_csv_events
+
+
+@pytest.fixture
+def site_exports(tmp_path, monkeypatch):
+    """Two consecutive exports of one site whose windows overlap by a day."""
+    monkeypatch.setitem(INCREMENTAL_CONFIG, 'state_directory', str(tmp_path / 'state'))
+    monkeypatch.setitem(EVENT_STORE_CONFIG, 'root', str(tmp_path / 'store'))
+    events = make_csv_events(days=6)
+    day = events['Time'].str[:10]
+    exports = {'full': events, 'monday': events[day <= '2024-01-04'], 'tuesday': events[day >= '2024-01-04']}
+    members = {}
+    for name, frame in exports.items():
+        path = tmp_path / f'{name}.csv'
+        frame.to_csv(path, index=False)
+        members[name] = expand_csv_members(str(path), path.name)
+    return members, {'column_mapping': CSV_MAPPING}
+
+
+@pytest.mark.parametrize('event_store', [False, True])
+def test_incremental_runs_model_every_folded_day(tmp_path, site_exports, event_store):
+    if event_store:
+        pytest.importorskip('pyarrow')
+    members, settings = site_exports
+    full = run_site('full', members['full'], settings, str(tmp_path / 'out'))
+    run_site('hq', members['monday'], settings, str(tmp_path / 'out'), event_store=event_store, incremental=True)
+    timing = run_site('hq', members['tuesday'], settings, str(tmp_path / 'out'), event_store=event_store, incremental=True)
+    assert timing['status'] == 'ok', timing['error']
+    assert timing['devices'] == full['devices'] and timing['paths'] == full['paths']
+    if event_store:
+        assert timing['enriched_events'] == full['enriched_events']
+    with open(tmp_path / 'out' / 'hq' / 'cytoscape_elements.json') as fh:
+        assert len(json.load(fh)) == full['elements']
@@ -0,0 +1,41 @@
+import io
+
+import flask
+import pytest
+
+from data_io.chunked_upload import CHUNKED_UPLOAD_CONFIG, _UPLOAD_LOCKS, create_chunked_upload_blueprint
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setitem(CHUNKED_UPLOAD_CONFIG, 'spool_directory', str(tmp_path / 'spool'))
+    app = flask.Flask(__name__)
+    app.register_blueprint(create_chunked_upload_blueprint())
+    return app.test_client()
+
+
+def _start(client, size):
+    return client.post('/upload/init', json={'filename': 'events.csv', 'size': size}).get_json()['upload_id']
+
+
+def test_oversized_chunk_is_rejected_before_it_is_written(client):
+    upload_id = _start(client, 10)
+    assert client.put(f'/upload/{upload_id}?offset=0', data=b'0123456').status_code == 200
+    response = client.put(f'/upload/{upload_id}?offset=7', data=b'789abc')
+    assert response.status_code == 400
+    assert client.get(f'/upload/{upload_id}').get_json()['received'] == 7
+    # The upload can still be finished after the rejected chunk.
+    assert client.put(f'/upload/{upload_id}?offset=7', data=b'789').get_json()['received'] == 10
+
+
+def test_chunk_without_content_length_is_cut_off_and_rolled_back(client):
+    upload_id = _start(client, 4)
+    response = client.put(f'/upload/{upload_id}?offset=0', input_stream=io.BytesIO(b'abcdef'))
+    assert response.status_code == 400
+    assert client.get(f'/upload/{upload_id}').get_json()['received'] == 0
+
+
+def test_upload_locks_are_not_kept_after_the_requests(client):
+    upload_id = _start(client, 10)
+    client.put(f'/upload/{upload_id}?offset=0', data=b'0123')  # the upload is then abandoned
+    assert upload_id not in _UPLOAD_LOCKS
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.onion_model import run_onion_model_processing
+from processing.model_aggregates import (TIMESTAMP_COL_DISPLAY, USERID_COL_DISPLAY, DOORID_COL_DISPLAY,
+                                         DATE_COL_NAME, DEPTH_COL_NAME)
+from processing.door_profiles import DoorProfileIndex, _grouped_counts
+
+
+@pytest.fixture
+def enriched(raw_events):
+    return run_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG)[0]
+
+
+def _transitions(enriched):
+    """(door, next door) rows within each user-day, in depth order."""
+    ordered = enriched.sort_values([USERID_COL_DISPLAY, DATE_COL_NAME, DEPTH_COL_NAME])
+    next_door = ordered.groupby([USERID_COL_DISPLAY, DATE_COL_NAME])[DOORID_COL_DISPLAY].shift(-1)
+    return pd.DataFrame({'door': ordered[DOORID_COL_DISPLAY], 'next': next_door}).dropna()
+
+
+def test_profile_matches_pandas_counts(enriched):
+    index = DoorProfileIndex(enriched, top_k=3)
+    transitions = _transitions(enriched)
+    for door, door_df in enriched.groupby(DOORID_COL_DISPLAY):
+        profile = index.profile(door)
+        timestamps = pd.to_datetime(door_df[TIMESTAMP_COL_DISPLAY])
+        assert profile['events'] == len(door_df)
+        assert profile['users'] == door_df[USERID_COL_DISPLAY].nunique()
+        assert profile['hourly'].tolist() == timestamps.dt.hour.value_counts().reindex(range(24), fill_value=0).tolist()
+        assert profile['weekday'].tolist() == timestamps.dt.weekday.value_counts().reindex(range(7), fill_value=0).tolist()
+        assert profile['depth_distribution'] == sorted(door_df[DEPTH_COL_NAME].value_counts().items())
+
+        outbound = transitions.loc[transitions['door'] == door, 'next'].value_counts()
+        expected = sorted(outbound.items(), key=lambda item: (-item[1], item[0]))[:3]
+        assert profile['top_outbound'] == expected
+        inbound = transitions.loc[transitions['next'] == door, 'door'].value_counts()
+        assert profile['top_inbound'] == sorted(inbound.items(), key=lambda item: (-item[1], item[0]))[:3]
+    assert index.profile('NO SUCH DOOR') is None
+
+
+def test_merged_user_shards_equal_the_single_pass_index(enriched):
+    num_doors = enriched[DOORID_COL_DISPLAY].nunique()
+    users = enriched[USERID_COL_DISPLAY].unique()
+    shards = [enriched[enriched[USERID_COL_DISPLAY].isin(users[i::3])] for i in range(3)]
+    merged = DoorProfileIndex.merge([DoorProfileIndex(shard, top_k=num_doors) for shard in shards], top_k=3)
+    expected = DoorProfileIndex(enriched, top_k=3)
+
+    assert list(merged.doors) == list(expected.doors)
+    for name in ('event_counts', 'user_counts', 'hourly', 'weekday', 'depth_offsets', 'depth_values', 'depth_counts',
+                 'outbound_offsets', 'outbound_doors', 'outbound_counts',
+                 'inbound_offsets', 'inbound_doors', 'inbound_counts'):
+        assert np.array_equal(getattr(merged, name), getattr(expected, name)), name
+
+
+def test_weighted_grouped_counts_equal_repeated_rows():
+    groups = np.array([0, 0, 2, 2, 2])
+    values = np.array([3, 1, 1, 1, 0])
+    weights = np.array([2, 1, 3, 1, 4])
+    offsets, kept_values, counts = _grouped_counts(groups, values, 3, weights)
+    repeated = _grouped_counts(np.repeat(groups, weights), np.repeat(values, weights), 3)
+    assert offsets.tolist() == repeated[0].tolist() == [0, 2, 2, 4]
+    assert kept_values.tolist() == repeated[1].tolist() == [1, 3, 0, 1]
+    assert counts.tolist() == repeated[2].tolist() == [1, 2, 4, 4]
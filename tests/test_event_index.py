@@ -0,0 +1,22 @@
+from constants import REQUIRED_INTERNAL_COLUMNS
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.onion_model import run_onion_model_processing
+from processing.event_index import EventTimeIndex
+
+USERID_COL = REQUIRED_INTERNAL_COLUMNS['UserID']
+DOORID_COL = REQUIRED_INTERNAL_COLUMNS['DoorID']
+TIMESTAMP_COL = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+
+
+def test_range_stats_are_exact_counts_of_the_slice(raw_events):
+    enriched, _, _, _ = run_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG)
+    index = EventTimeIndex(enriched, raw_events)
+    stats, devices, _, _ = index.range_model(GRAPH_PROCESSING_CONFIG, '2024-01-02', '2024-01-03')
+
+    in_range = enriched[enriched[TIMESTAMP_COL].dt.date.astype(str).between('2024-01-02', '2024-01-03')]
+    assert not stats.get('users_estimated')
+    assert stats['users'] == in_range[USERID_COL].nunique()
+    assert stats['days'] == 2
+    assert stats['top_doors'] == list(in_range[DOORID_COL].value_counts().nlargest(5).items())
+    assert stats['raw_event_count'] == raw_events[TIMESTAMP_COL].dt.date.astype(str).between('2024-01-02', '2024-01-03').sum()
+    assert not devices.empty
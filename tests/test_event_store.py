@@ -0,0 +1,55 @@
+import os
+import datetime
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+from data_io.event_store import (write_events, read_events, record_event_chunks, list_event_dates, delete_event_dates,
+                                  dataset_path, DAY_HASHES_FILE, LEGACY_HASHES_FILE)
+from tests.conftest import make_events
+
+TIMESTAMP_COL = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+
+
+def test_date_only_end_includes_the_whole_day(tmp_path, raw_events):
+    write_events(raw_events, 'site', root=str(tmp_path))
+    last_day = raw_events[TIMESTAMP_COL].max().date()
+    expected = (raw_events[TIMESTAMP_COL].dt.date <= last_day).sum()
+    assert len(read_events('site', end=last_day.isoformat(), root=str(tmp_path))) == expected
+    assert len(read_events('site', end=last_day, root=str(tmp_path))) == expected
+    midnight = read_events('site', end=f"{last_day.isoformat()} 00:00:00", root=str(tmp_path))
+    assert len(midnight) == (raw_events[TIMESTAMP_COL] < str(last_day)).sum()
+
+
+def test_appending_the_same_export_twice_stores_it_once(tmp_path, raw_events):
+    write_events(raw_events, 'site', root=str(tmp_path), mode='append')
+    assert write_events(raw_events, 'site', root=str(tmp_path), mode='append') == []
+    assert len(read_events('site', root=str(tmp_path))) == len(raw_events)
+
+
+def test_record_event_chunks_passes_chunks_through_and_stores_them(tmp_path):
+    events = make_events(days=3)
+    chunks = [events.iloc[i:i + 100] for i in range(0, len(events), 100)]
+    passed = list(record_event_chunks(iter(chunks), 'site', root=str(tmp_path)))
+    assert [len(chunk) for chunk in passed] == [len(chunk) for chunk in chunks]
+    assert len(read_events('site', root=str(tmp_path))) == len(events)
+    assert list_event_dates('site', root=str(tmp_path)) == [datetime.date(2024, 1, day) for day in (1, 2, 3)]
+
+
+def test_each_write_only_touches_the_hashes_of_its_days(tmp_path):
+    events = make_events(days=3)
+    first_day = events[events[TIMESTAMP_COL].dt.date == datetime.date(2024, 1, 1)]
+    write_events(events, 'site', root=str(tmp_path), mode='append')
+    dataset_dir = dataset_path('site', root=str(tmp_path))
+    hashes_path = os.path.join(dataset_dir, 'EventDate=2024-01-02', DAY_HASHES_FILE)
+    modified = os.stat(hashes_path).st_mtime_ns
+
+    assert write_events(first_day, 'site', root=str(tmp_path), mode='append') == []
+    delete_event_dates('site', [datetime.date(2024, 1, 3)], root=str(tmp_path))
+    assert os.stat(hashes_path).st_mtime_ns == modified
+    assert not os.path.exists(os.path.join(dataset_dir, LEGACY_HASHES_FILE))
+    # The deleted day's hashes went with its partition: writing it again stores it again.
+    write_events(events, 'site', root=str(tmp_path), mode='append')
+    assert len(read_events('site', root=str(tmp_path))) == len(events)
@@ -0,0 +1,61 @@
+import pandas as pd
+
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.incremental import (empty_model_state, update_model_state, replace_days_in_state, model_from_state,
+                                    save_model_state, load_model_state)
+from constants import REQUIRED_INTERNAL_COLUMNS
+
+TIMESTAMP_COL = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+DOORID_COL = REQUIRED_INTERNAL_COLUMNS['DoorID']
+
+
+def _total(state, key):
+    return sum(aggregates[key] for aggregates in state['days'].values())
+
+
+def test_refolding_the_same_export_changes_nothing(raw_events):
+    state = empty_model_state(GRAPH_PROCESSING_CONFIG)
+    days = update_model_state(state, raw_events, GRAPH_PROCESSING_CONFIG)
+    event_count = _total(state, 'event_count')
+    assert update_model_state(state, raw_events, GRAPH_PROCESSING_CONFIG) == []
+    assert _total(state, 'event_count') == event_count
+    assert sorted(state['days']) == days
+
+
+def test_overlapping_export_windows_keep_every_event(raw_events):
+    cut = raw_events[TIMESTAMP_COL].sort_values().iloc[len(raw_events) // 2]
+    first = raw_events[raw_events[TIMESTAMP_COL] < cut + pd.Timedelta(hours=2)]
+    second = raw_events[raw_events[TIMESTAMP_COL] >= cut.normalize()]
+    state = empty_model_state(GRAPH_PROCESSING_CONFIG)
+    update_model_state(state, first, GRAPH_PROCESSING_CONFIG)
+    update_model_state(state, second, GRAPH_PROCESSING_CONFIG)
+    assert _total(state, 'raw_event_count') == len(raw_events)
+    assert sorted(state['days']) == sorted(raw_events[TIMESTAMP_COL].dt.date.unique())
+
+
+def test_replacing_a_split_day_matches_a_single_fold(raw_events, tmp_path):
+    full = empty_model_state(GRAPH_PROCESSING_CONFIG)
+    update_model_state(full, raw_events, GRAPH_PROCESSING_CONFIG)
+
+    state = empty_model_state(GRAPH_PROCESSING_CONFIG)
+    update_model_state(state, raw_events.iloc[::2], GRAPH_PROCESSING_CONFIG)
+    days = update_model_state(state, raw_events.iloc[1::2], GRAPH_PROCESSING_CONFIG)
+    replace_days_in_state(state, raw_events, days, GRAPH_PROCESSING_CONFIG)
+    save_model_state(state, 'site', directory=str(tmp_path))
+    state = load_model_state('site', GRAPH_PROCESSING_CONFIG, directory=str(tmp_path))
+    assert update_model_state(state, raw_events, GRAPH_PROCESSING_CONFIG) == []
+
+    expected = model_from_state(full, GRAPH_PROCESSING_CONFIG)
+    result = model_from_state(state, GRAPH_PROCESSING_CONFIG)
+    assert result[0]['event_count'] == expected[0]['event_count']
+    assert result[1].equals(expected[1]) and result[3].equals(expected[3])
+
+
+def test_replaced_days_dedupe_rows_with_raw_door_ids(raw_events):
+    raw = raw_events.assign(**{DOORID_COL: ' ' + raw_events[DOORID_COL].str.lower() + '  '})
+    state = empty_model_state(GRAPH_PROCESSING_CONFIG)
+    days = update_model_state(state, raw, GRAPH_PROCESSING_CONFIG)
+    replace_days_in_state(state, raw, days[:1], GRAPH_PROCESSING_CONFIG)
+    event_count, raw_event_count = _total(state, 'event_count'), _total(state, 'raw_event_count')
+    assert update_model_state(state, raw, GRAPH_PROCESSING_CONFIG) == []
+    assert (_total(state, 'event_count'), _total(state, 'raw_event_count')) == (event_count, raw_event_count)
@@ -0,0 +1,44 @@
+import gzip
+import zipfile
+
+from data_io.csv_prescan import prescan_csv
+from data_io.ingest import expand_csv_members, open_csv_member, opened_csv_member, load_event_members, iter_member_event_chunks
+from tests.conftest import make_csv_events, CSV_MAPPING
+
+
+def _zip_upload(tmp_path, csv_df):
+    path = tmp_path / 'export.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('a.csv', csv_df.iloc[:100].to_csv(index=False))
+        zf.writestr('b.csv.gz', gzip.compress(csv_df.iloc[100:].to_csv(index=False).encode()))
+    return expand_csv_members(str(path), 'export.zip')
+
+
+def test_zip_member_stream_closes_the_archive(tmp_path):
+    members = _zip_upload(tmp_path, make_csv_events())
+    for member in members:
+        with opened_csv_member(member) as stream:
+            assert stream.read(4) == b'Time'
+        assert stream.closed
+        archive = stream._owned[-1]
+        assert isinstance(archive, zipfile.ZipFile) and archive.fp is None
+
+
+def test_prescan_and_load_close_every_stream(tmp_path):
+    csv_df = make_csv_events()
+    members = _zip_upload(tmp_path, csv_df)
+    opened = []
+
+    def recording_opener(member):
+        def open_member():
+            opened.append(open_csv_member(member))
+            return opened[-1]
+        return open_member
+
+    prescan = prescan_csv([recording_opener(member) for member in members], door_column='Device')
+    assert prescan['row_count'] == len(csv_df)
+    assert opened and all(stream.closed for stream in opened)
+
+    loaded = load_event_members(members, CSV_MAPPING, max_workers=1)
+    chunks = list(iter_member_event_chunks(members, CSV_MAPPING, chunk_rows=50))
+    assert len(loaded) == sum(len(chunk) for chunk in chunks) == len(csv_df)
@@ -0,0 +1,13 @@
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.onion_model import run_onion_model_processing
+from processing.journey_index import UserJourneyIndex
+
+
+def test_users_with_prefix_returns_sorted_matches_up_to_the_limit(raw_events):
+    enriched, *_ = run_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG)
+    journeys = UserJourneyIndex(enriched)
+    expected = sorted(user for user in journeys.users if user.startswith('U001'))
+    assert journeys.users_with_prefix('U001') == expected
+    assert journeys.users_with_prefix('U00', limit=3) == sorted(journeys.users)[:3]
+    assert journeys.users_with_prefix('X') == []
+    assert journeys.users_with_prefix(None, limit=2) == list(journeys.users[:2])
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import pytest
+
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.live_model import (LIVE_MODEL_CONFIG, _LIVE_SESSIONS, get_live_session, find_live_session,
+                                   release_live_session)
+from tests.conftest import CSV_MAPPING, make_csv_events
+
+
+@pytest.fixture
+def live_source(tmp_path):
+    path = tmp_path / 'live.csv'
+    make_csv_events(num_users=5, days=1).to_csv(path, index=False)
+    yield str(path)
+    for session in list(_LIVE_SESSIONS.values()):
+        session.stop()
+    _LIVE_SESSIONS.clear()
+
+
+def _session(source, num_floors=1):
+    return get_live_session(source, CSV_MAPPING, dict(GRAPH_PROCESSING_CONFIG, num_floors=num_floors))
+
+
+def test_last_client_release_stops_the_follower(live_source):
+    session = _session(live_source)
+    assert _session(live_source) is session
+    release_live_session(session.session_id)
+    assert find_live_session(session.session_id) is session
+    release_live_session(session.session_id)
+    assert find_live_session(session.session_id) is None
+    assert session._stop_event is None
+
+
+def test_sessions_beyond_the_cap_are_stopped(live_source, monkeypatch):
+    monkeypatch.setitem(LIVE_MODEL_CONFIG, 'max_sessions', 1)
+    first = _session(live_source, num_floors=1)
+    second = _session(live_source, num_floors=2)
+    assert find_live_session(first.session_id) is None and first._stop_event is None
+    assert find_live_session(second.session_id) is second
+
+
+def test_a_failed_poll_is_reported_and_polling_goes_on(live_source):
+    session = _session(live_source)
+    session.stop()
+    stop_event, calls = threading.Event(), []
+
+    def on_rows(raw_rows):
+        calls.append(raw_rows)
+        if len(calls) == 1:
+            raise ValueError("bad rows")
+        stop_event.set()
+
+    asyncio.run(session.follower.watch(on_rows, stop_event, poll_seconds=0.01, on_error=session.on_follower_error))
+    assert len(calls) == 2
+    assert "bad rows" in session.snapshot()['status']
@@ -0,0 +1,73 @@
+import gzip
+import json
+import os
+import time
+import datetime
+
+import pytest
+
+from data_io import session_store
+from data_io.session_store import SESSION_STORE_CONFIG, get_session_store
+from data_io.ingest import UPLOADED_FILES_NAMESPACE
+from data_io.model_api import (MODEL_API_CONFIG, parse_model_request, release_job_inputs, store_model_resources,
+                               dumps_json, frame_records, _resource_key, stale_job_error, get_job,
+                               create_model_api_blueprint)
+from tests.conftest import CSV_MAPPING, make_csv_events
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    monkeypatch.setitem(SESSION_STORE_CONFIG, 'directory', str(tmp_path))
+    monkeypatch.setattr(session_store, '_STORES', {})
+
+
+def test_submitted_file_outlives_session_eviction_until_the_job_releases_it(stores):
+    session = get_session_store(UPLOADED_FILES_NAMESPACE)
+    file_key = session.put_bytes(make_csv_events(num_users=5, days=1).to_csv(index=False).encode())
+    spec = parse_model_request({'file_key': file_key, 'column_mapping': CSV_MAPPING})
+    session.delete(file_key)
+    path = spec['members'][0]['path']
+    assert os.path.exists(path)
+    release_job_inputs(spec)
+    assert not os.path.exists(path)
+
+
+def test_resources_are_stored_as_one_json_array_per_resource(stores, monkeypatch, raw_events):
+    monkeypatch.setitem(MODEL_API_CONFIG, 'serialize_block_rows', 7)
+    frame = raw_events.head(50)
+    elements = [{'data': {'id': str(i)}} for i in range(20)]
+    store_model_resources('f' * 64, {'device_attributes': frame, 'elements': elements, 'path_viz': []})
+    store = get_session_store('models')
+
+    def stored(resource):
+        with gzip.open(store.blob_path(_resource_key('f' * 64, resource))) as fh:
+            return json.load(fh)
+
+    assert stored('device_attributes') == json.loads(dumps_json(frame_records(frame)))
+    assert stored('elements') == elements
+    assert stored('path_viz') == []
+
+
+def test_jobs_whose_run_was_lost_are_failed_on_the_next_status_request(stores):
+    now = time.time()
+    submitted = datetime.datetime.fromtimestamp(now).isoformat()
+    assert stale_job_error({'submitted': submitted, 'heartbeat': now}, now=now + 5) is None
+    assert "stopped" in stale_job_error({'submitted': submitted, 'heartbeat': now}, now=now + 3600)
+    assert "did not finish" in stale_job_error({'submitted': submitted, 'heartbeat': now + 5 * 3600}, now=now + 5 * 3600)
+
+    store = get_session_store('models')
+    store.put({'status': 'queued', 'submitted': submitted, 'heartbeat': now - 3600}, key='a' * 32)
+    job = get_job('a' * 32)
+    assert job['status'] == 'failed' and "stopped" in job['error']
+    assert store.get('a' * 32)['status'] == 'failed'
+
+
+def test_expired_model_is_gone_even_for_a_matching_etag(stores):
+    from flask import Flask
+    app = Flask(__name__)
+    app.register_blueprint(create_model_api_blueprint())
+    get_session_store('models').put({'status': 'done', 'fingerprint': 'f' * 64}, key='b' * 32)
+    etag = f'W/"{"f" * 32}-elements"'
+    response = app.test_client().get(f"{MODEL_API_CONFIG['url_prefix']}/{'b' * 32}/elements",
+                                     headers={'If-None-Match': etag})
+    assert response.status_code == 410
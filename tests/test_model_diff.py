@@ -0,0 +1,42 @@
+from constants import REQUIRED_INTERNAL_COLUMNS
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.onion_model import run_onion_model_processing
+from processing.temporal_windows import TemporalModelIndex
+from processing.cytoscape_prep import prepare_cytoscape_elements
+from processing.model_diff import (diff_date_ranges, previous_period, apply_diff_overlay, clear_diff_overlay,
+                                   diff_models)
+from tests.conftest import make_events
+
+TIMESTAMP_COL = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+
+
+def test_previous_period_has_the_same_length():
+    assert previous_period('2024-01-08', '2024-01-14') == ('2024-01-01', '2024-01-07')
+    assert previous_period('2024-03-01', '2024-03-01T00:00:00') == ('2024-02-29', '2024-02-29')
+
+
+def test_date_range_diff_matches_diff_of_separate_runs():
+    raw = make_events(days=6)
+    enriched, _, _, _ = run_onion_model_processing(raw, GRAPH_PROCESSING_CONFIG)
+    index = TemporalModelIndex.from_enriched_events(enriched, raw)
+    diff = diff_date_ranges(index, GRAPH_PROCESSING_CONFIG, ('2024-01-01', '2024-01-03'), ('2024-01-04', '2024-01-06'))
+
+    models = []
+    for start, end in (('2024-01-01', '2024-01-03'), ('2024-01-04', '2024-01-06')):
+        in_range = raw[raw[TIMESTAMP_COL].dt.date.astype(str).between(start, end)]
+        _, device_attrs, _, all_paths = run_onion_model_processing(in_range, GRAPH_PROCESSING_CONFIG)
+        models.append({'device_attributes': device_attrs, 'all_paths': all_paths})
+    expected = diff_models(*models)
+    assert len(diff['added_transitions']) == len(expected['added_transitions'])
+    assert len(diff['removed_transitions']) == len(expected['removed_transitions'])
+    assert diff['added_doors'] == expected['added_doors']
+
+
+def test_clearing_the_overlay_restores_the_elements(raw_events):
+    _, device_attrs, path_viz, all_paths = run_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG)
+    nodes, edges = prepare_cytoscape_elements(device_attrs, path_viz, all_paths)
+    before = {'device_attributes': device_attrs.iloc[:-2], 'all_paths': all_paths.iloc[::2]}
+    diff = diff_models(before, {'device_attributes': device_attrs, 'all_paths': all_paths})
+    overlaid = apply_diff_overlay(nodes + edges, diff)
+    assert overlaid != nodes + edges
+    assert clear_diff_overlay(overlaid) == nodes + edges
@@ -0,0 +1,49 @@
+import threading
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from data_io.model_snapshots import (MODEL_SNAPSHOT_CONFIG, member_files_key, save_model_snapshot,
+                                     load_model_snapshot, list_model_snapshots)
+
+
+def _save(directory, devices, **kwargs):
+    paths = pd.DataFrame({'SourceDoor': ['A'], 'TargetDoor': ['B'], 'TransitionFrequency': [3]})
+    return save_model_snapshot('site', devices, paths, paths, {'events': 1}, 'input', {}, {}, directory=directory, **kwargs)
+
+
+def test_frames_round_trip(tmp_path):
+    pytest.importorskip('pyarrow')
+    devices = pd.DataFrame({'DoorID (Device Name)': ['A', 'B'], 'FinalGlobalDeviceDepth': [1, 2],
+                            'IsOfficialEntrance': [True, False], 'SecurityLevel': [None, None]})
+    header = _save(str(tmp_path), devices)
+    assert 'device_attributes' in header['sections']
+    snapshot = load_model_snapshot('site', fingerprint=header['fingerprint'], directory=str(tmp_path))
+    assert_frame_equal(snapshot['device_attributes'], devices)
+    assert snapshot['summary_stats'] == {'events': 1}
+
+
+def test_concurrent_saves_get_distinct_versions(tmp_path):
+    devices = pd.DataFrame({'DoorID (Device Name)': ['A']})
+    threads = [threading.Thread(target=_save, args=(str(tmp_path), devices)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    versions = [header['version'] for header in list_model_snapshots('site', directory=str(tmp_path))]
+    assert versions == list(range(1, 9))
+
+
+def test_member_files_key_covers_the_whole_content(tmp_path, monkeypatch):
+    monkeypatch.setitem(MODEL_SNAPSHOT_CONFIG, 'hash_block_bytes', 16)
+    first, second = tmp_path / 'a.csv', tmp_path / 'b.csv'
+    first.write_bytes(bytes(range(256)) * 4)
+    second.write_bytes(b'Time,Badge\n')
+    key = member_files_key([{'path': str(first)}, {'path': str(second)}])
+    assert member_files_key([{'path': str(second)}, {'path': str(first)}]) == key
+
+    data = bytearray(first.read_bytes())
+    data[500] ^= 1  # same size, one byte changed in the middle
+    first.write_bytes(bytes(data))
+    assert member_files_key([{'path': str(first)}, {'path': str(second)}]) != key
@@ -0,0 +1,51 @@
+import pandas as pd
+
+from processing.model_aggregates import TIMESTAMP_COL_DISPLAY, USERID_COL_DISPLAY, DOORID_COL_DISPLAY, DATE_COL_NAME
+from processing.occupancy import EVENTTYPE_USERDAY_COL, LayerOccupancy, layer_stays
+
+# Door A is in layer 1, B and C in layer 2.
+EVENTS = [
+    ('U1', '2024-01-01 08:00', 'A', 'ENTRANCE'),
+    ('U1', '2024-01-01 08:10', 'B', 'INNER'),
+    ('U1', '2024-01-01 08:20', 'C', 'INNER'),          # same layer as B: one stay 08:10-08:30
+    ('U1', '2024-01-01 08:30', 'A', 'EXIT'),           # ends the visit
+    ('U1', '2024-01-01 09:00', 'B', 'INNER'),          # last event of the day: no interval
+    ('U1', '2024-01-02 07:00', 'A', 'ENTRANCE'),
+    ('U1', '2024-01-02 07:30', 'B', 'INNER'),
+    ('U2', '2024-01-01 08:10', 'A', 'ENTRANCE'),       # starts as U1 leaves layer 1
+    ('U2', '2024-01-01 08:30', 'B', 'ENTRANCE_EXIT'),
+    ('U2', '2024-01-01 08:40', 'A', 'ENTRANCE'),
+    ('U2', '2024-01-01 08:50', 'B', 'INNER'),
+]
+
+
+def _model():
+    enriched = pd.DataFrame(EVENTS, columns=[USERID_COL_DISPLAY, TIMESTAMP_COL_DISPLAY, DOORID_COL_DISPLAY,
+                                             EVENTTYPE_USERDAY_COL])
+    enriched[TIMESTAMP_COL_DISPLAY] = pd.to_datetime(enriched[TIMESTAMP_COL_DISPLAY])
+    enriched[DATE_COL_NAME] = enriched[TIMESTAMP_COL_DISPLAY].dt.date
+    devices = pd.DataFrame({DOORID_COL_DISPLAY: ['A', 'B', 'C'], 'FinalGlobalDeviceDepth': [1, 2, 2]})
+    return enriched, devices
+
+
+def test_stays_merge_same_layer_intervals_and_end_at_exits():
+    layers, starts, ends = layer_stays(*_model())
+    stays = [(int(layer), pd.Timestamp(start).strftime('%d %H:%M'), pd.Timestamp(end).strftime('%d %H:%M'))
+             for layer, start, end in zip(layers, starts, ends)]
+    assert stays == [(1, '01 08:00', '01 08:10'), (2, '01 08:10', '01 08:30'), (1, '02 07:00', '02 07:30'),
+                     (1, '01 08:10', '01 08:30'), (1, '01 08:40', '01 08:50')]
+
+
+def test_occupancy_series_counts_people_present_at_each_bin():
+    occupancy = LayerOccupancy(*_model())
+    series = occupancy.occupancy_series(start='2024-01-01 08:00', end='2024-01-01 09:00', bin_minutes=10)
+    assert list(series.index.strftime('%H:%M')) == ['08:00', '08:10', '08:20', '08:30', '08:40', '08:50', '09:00']
+    assert series[1].tolist() == [1, 1, 1, 0, 1, 0, 0]
+    assert series[2].tolist() == [0, 1, 1, 0, 0, 0, 0]
+    assert occupancy.dwell_summary()['Stays'].tolist() == [4, 1]
+
+
+def test_peak_occupancy_counts_ends_before_starts_at_equal_times():
+    peaks = LayerOccupancy(*_model()).peak_occupancy()
+    # At 08:10 U1 leaves layer 1 as U2 enters it: one person, not two.
+    assert peaks == {1: (1, pd.Timestamp('2024-01-01 08:00')), 2: (1, pd.Timestamp('2024-01-01 08:10'))}
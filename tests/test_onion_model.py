@@ -0,0 +1,42 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from constants import REQUIRED_INTERNAL_COLUMNS
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.onion_model import (run_onion_model_processing, calculate_final_global_device_depths,
+                                    determine_heuristic_entrances)
+from processing.out_of_core import run_out_of_core_processing
+
+DOORID_COL = REQUIRED_INTERNAL_COLUMNS['DoorID']
+USERID_COL = REQUIRED_INTERNAL_COLUMNS['UserID']
+TIMESTAMP_COL = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+
+
+def test_interior_doors_get_their_modal_depth():
+    enriched = pd.DataFrame({DOORID_COL: ['LOBBY A', 'ELEV 1', 'ELEV 1', 'ELEV 1', 'F3 LAB'],
+                             'DeviceDepthPerDay': [1, 2, 2, 3, 4]})
+    depths = calculate_final_global_device_depths(enriched, ['LOBBY A'], door_id_col=DOORID_COL)
+    depths = depths.set_index(DOORID_COL)['FinalGlobalDeviceDepth']
+    assert depths.to_dict() == {'LOBBY A': 1, 'ELEV 1': 3, 'F3 LAB': 5}
+
+
+def test_heuristic_entrance_ties_keep_first_appearance_order():
+    events = pd.DataFrame({USERID_COL: ['U1', 'U2', 'U3', 'U4'],
+                           DOORID_COL: ['LOBBY B', 'LOBBY A', 'LOBBY A', 'LOBBY B'],
+                           TIMESTAMP_COL: pd.to_datetime(['2024-01-01 08:00'] * 4)})
+    events['Date'] = events[TIMESTAMP_COL].dt.date
+    entrances = determine_heuristic_entrances(events, user_id_col=USERID_COL, door_id_col=DOORID_COL,
+                                              timestamp_col=TIMESTAMP_COL, top_n_entrances=1)
+    assert entrances == ['LOBBY B']
+
+
+def test_out_of_core_matches_in_memory_pipeline(tmp_path, raw_events):
+    _, expected_devices, expected_viz, expected_paths = run_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG)
+    chunks = [raw_events.iloc[i:i + 500] for i in range(0, len(raw_events), 500)]
+    aggregates, devices, viz, paths = run_out_of_core_processing(chunks, GRAPH_PROCESSING_CONFIG, num_partitions=3,
+                                                                 work_directory=str(tmp_path))
+    assert aggregates['raw_event_count'] == len(raw_events)
+    assert (devices[DOORID_COL] != 'nan').all() and (devices['FinalGlobalDeviceDepth'] < 99).all()
+    assert_frame_equal(devices.reset_index(drop=True), expected_devices.reset_index(drop=True))
+    assert_frame_equal(viz.reset_index(drop=True), expected_viz.reset_index(drop=True))
+    assert_frame_equal(paths.reset_index(drop=True), expected_paths.reset_index(drop=True))
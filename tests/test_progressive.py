@@ -0,0 +1,88 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from callbacks import progressive_callbacks
+from callbacks.progressive_callbacks import submit_refinement, stale_job_error
+from data_io import session_store
+from data_io.session_store import SESSION_STORE_CONFIG, get_session_store
+from processing.progressive import PROGRESSIVE_CONFIG, stratified_user_sample, model_stability
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.onion_model import run_onion_model_processing
+from tests.conftest import make_events
+from constants import REQUIRED_INTERNAL_COLUMNS
+
+USERID_COL = REQUIRED_INTERNAL_COLUMNS['UserID']
+DOORID_COL = REQUIRED_INTERNAL_COLUMNS['DoorID']
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    monkeypatch.setitem(SESSION_STORE_CONFIG, 'directory', str(tmp_path))
+    monkeypatch.setattr(session_store, '_STORES', {})
+
+
+def test_job_without_heartbeat_or_past_its_deadline_is_stale():
+    now = time.time()
+    assert stale_job_error({'status': 'running', 'submitted': now - 5, 'heartbeat': now - 1}, now) is None
+    assert 'stopped' in stale_job_error({'status': 'running', 'submitted': now - 5,
+                                         'heartbeat': now - PROGRESSIVE_CONFIG['stale_after_seconds'] - 1}, now)
+    assert 'did not finish' in stale_job_error({'status': 'running', 'heartbeat': now,
+                                                'submitted': now - PROGRESSIVE_CONFIG['max_job_seconds'] - 1}, now)
+    # Records written before heartbeats existed count as lost.
+    assert stale_job_error({'status': 'running'}, now) is not None
+
+
+def test_finished_job_is_stored_and_no_longer_beats(stores):
+    job_key = submit_refinement(lambda value: {'value': value}, 3)
+    progressive_callbacks._executor().submit(lambda: None).result()  # the single worker ran the job first
+    assert get_session_store('progressive').get(job_key) == {'value': 3, 'status': 'done'}
+    assert job_key not in progressive_callbacks._ACTIVE_JOBS
+
+
+def _sampled_users(events, mask):
+    sampled = set(events.loc[mask, USERID_COL])
+    # Whole people are sampled: every row of a sampled person is kept.
+    assert mask.sum() == events[USERID_COL].isin(sampled).sum()
+    return sampled
+
+
+def test_sample_takes_the_fraction_of_people_or_at_least_the_minimum():
+    events = make_events(num_users=400, days=2)
+    num_users = events[USERID_COL].nunique()
+    sampled = _sampled_users(events, stratified_user_sample(events, fraction=0.1, min_users=10, seed=1))
+    assert abs(len(sampled) - 0.1 * num_users) <= 1
+    sampled = _sampled_users(events, stratified_user_sample(events, fraction=0.01, min_users=80, seed=1))
+    assert abs(len(sampled) - 80) <= 1
+    assert stratified_user_sample(events, fraction=0.1, min_users=num_users, seed=1).all()
+
+
+def test_sample_covers_every_stratum_and_is_deterministic_under_a_seed():
+    events = make_events(num_users=400, days=2)
+    fraction = 0.1
+    mask = stratified_user_sample(events, fraction=fraction, min_users=1, seed=7)
+    sampled = _sampled_users(events, mask)
+
+    # Strata as in stratified_user_sample: log2 of the event count, then the most used door (first seen wins ties).
+    door_order = {door: code for code, door in enumerate(pd.unique(events[DOORID_COL]))}
+    pair_counts = events.groupby([USERID_COL, DOORID_COL]).size().reset_index(name='n')
+    pair_counts['code'] = pair_counts[DOORID_COL].map(door_order)
+    main_doors = pair_counts.sort_values(['n', 'code'], ascending=[False, True]).drop_duplicates(USERID_COL) \
+        .set_index(USERID_COL)[DOORID_COL]
+    activity = np.log2(events.groupby(USERID_COL).size()).astype(int)
+    strata = pd.DataFrame({'activity': activity, 'door': main_doors}).groupby(['activity', 'door'])
+    for _, stratum in strata:
+        if len(stratum) >= 1 / fraction:  # a stratum of at least one sampling step always gets a person
+            assert sampled & set(stratum.index)
+
+    assert np.array_equal(mask, stratified_user_sample(events, fraction=fraction, min_users=1, seed=7))
+    assert not np.array_equal(mask, stratified_user_sample(events, fraction=fraction, min_users=1, seed=8))
+
+
+def test_identical_models_are_fully_stable(raw_events):
+    _, devices, _, paths = run_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG)
+    assert model_stability(devices, paths, devices.copy(), paths.copy()) == {
+        'door_coverage': 1.0, 'layer_agreement': 1.0, 'edge_jaccard': 1.0, 'traffic_covered': 1.0,
+        'same_entrances': True}
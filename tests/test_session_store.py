@@ -0,0 +1,32 @@
+import os
+import time
+
+from data_io.session_store import DiskSessionStore
+
+
+def test_lru_eviction_beyond_max_entries(tmp_path):
+    store = DiskSessionStore(str(tmp_path), ttl_seconds=3600, max_entries=2)
+    keys = [store.put(i) for i in range(3)]
+    assert keys[0] not in store
+    assert store.get(keys[2]) == 2
+
+
+def test_unlimited_namespace_is_never_evicted(tmp_path):
+    store = DiskSessionStore(str(tmp_path), ttl_seconds=None, max_entries=None)
+    keys = [store.put(i) for i in range(5)]
+    old = time.time() - 10 * 365 * 24 * 3600
+    os.utime(os.path.join(str(tmp_path), keys[0] + '.pkl'), (old, old))
+    store.evict()
+    assert all(key in store for key in keys)
+    assert store.get(keys[0]) == 0
+
+
+def test_byte_limit_evicts_least_recently_used_files(tmp_path):
+    store = DiskSessionStore(str(tmp_path), ttl_seconds=3600, max_entries=None, max_bytes=250)
+    keys = [store.put_bytes(b'x' * 100) for _ in range(2)]
+    for age, key in zip((20, 10), keys):
+        os.utime(store.blob_path(key), (time.time() - age, time.time() - age))
+    big = store.put_bytes(b'y' * 1000)
+    assert keys[0] not in store and keys[1] not in store
+    # The newest file is kept even when it alone is over the limit.
+    assert store.get_bytes(big) == b'y' * 1000
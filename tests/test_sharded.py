@@ -0,0 +1,57 @@
+import numpy as np
+from pandas.testing import assert_frame_equal
+
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.onion_model import run_onion_model_processing
+from processing.sharded import run_sharded_onion_model_processing, _shard_pool
+from processing.temporal_windows import TemporalModelIndex
+from processing.journey_index import UserJourneyIndex
+from processing.door_profiles import DoorProfileIndex
+from processing.traffic_cube import TrafficCube
+
+
+def test_sharded_matches_single_process_pipeline(raw_events):
+    _, expected_devices, expected_viz, expected_paths = run_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG)
+    aggregates, devices, viz, paths = run_sharded_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG, max_workers=2)
+    assert aggregates['raw_event_count'] == len(raw_events)
+    assert_frame_equal(devices.reset_index(drop=True), expected_devices.reset_index(drop=True))
+    assert_frame_equal(viz.reset_index(drop=True), expected_viz.reset_index(drop=True))
+    assert_frame_equal(paths.reset_index(drop=True), expected_paths.reset_index(drop=True))
+
+
+def test_worker_pool_is_reused_across_runs(raw_events):
+    run_sharded_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG, max_workers=2)
+    pool = _shard_pool(2)
+    run_sharded_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG, max_workers=2)
+    assert _shard_pool(2) is pool
+
+
+def test_merged_shard_indexes_match_single_process_indexes(raw_events):
+    enriched, expected_devices, _, _ = run_onion_model_processing(raw_events.copy(), GRAPH_PROCESSING_CONFIG)
+    *_, indexes = run_sharded_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG, max_workers=2,
+                                                     with_indexes=True)
+
+    expected_windows = TemporalModelIndex.from_enriched_events(enriched, raw_events)
+    assert indexes['temporal_index'].days == expected_windows.days
+    start, end = expected_windows.days[1], expected_windows.days[3]
+    window = indexes['temporal_index'].window_model(GRAPH_PROCESSING_CONFIG, start, end)
+    expected_window = expected_windows.window_model(GRAPH_PROCESSING_CONFIG, start, end)
+    assert window[0]['raw_event_count'] == expected_window[0]['raw_event_count']
+    assert_frame_equal(window[3].reset_index(drop=True), expected_window[3].reset_index(drop=True))
+
+    journeys, expected_journeys = indexes['journey_index'], UserJourneyIndex(enriched)
+    assert list(journeys.users) == list(expected_journeys.users)
+    for user in expected_journeys.users[::7]:
+        assert_frame_equal(journeys.journey(user), expected_journeys.journey(user))
+
+    profiles, expected_profiles = indexes['door_profiles'], DoorProfileIndex(enriched)
+    for door in expected_profiles.doors:
+        profile, expected = profiles.profile(door), expected_profiles.profile(door)
+        assert {key: np.asarray(value).tolist() for key, value in profile.items()} == \
+            {key: np.asarray(value).tolist() for key, value in expected.items()}
+
+    cube, expected_cube = indexes['traffic_cube'], TrafficCube(enriched, expected_devices)
+    assert cube.days == expected_cube.days
+    assert np.array_equal(cube.date_hour_matrix()[1], expected_cube.date_hour_matrix()[1])
+    assert np.array_equal(cube.door_hour_matrix(layers=[1])[1], expected_cube.door_hour_matrix(layers=[1])[1])
+    assert cube.layers() == expected_cube.layers()
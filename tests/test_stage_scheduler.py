@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from processing.stage_scheduler import STAGE_SCHEDULER_CONFIG, run_stage_graph
+
+
+def _chain(calls):
+    def stage(name, value):
+        def run(**kwargs):
+            calls.append((name, kwargs))
+            return value + sum(kwargs.values())
+        return run
+    return {
+        'total': (stage('total', 100), ['base', 'double']),
+        'double': (stage('double', 0), ['base']),
+        'base': (stage('base', 1), []),
+    }
+
+
+@pytest.mark.parametrize('enabled', [True, False])
+def test_stages_run_after_their_dependencies_with_their_results(enabled, monkeypatch):
+    monkeypatch.setitem(STAGE_SCHEDULER_CONFIG, 'enabled', enabled)
+    calls = []
+    assert run_stage_graph(_chain(calls)) == {'base': 1, 'double': 1, 'total': 102}
+    assert calls == [('base', {}), ('double', {'base': 1}), ('total', {'base': 1, 'double': 1})]
+
+
+def test_independent_stages_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)  # both stages must be running at once to pass it
+    stages = {name: (lambda: barrier.wait() is not None, []) for name in ('left', 'right')}
+    assert run_stage_graph(stages, max_workers=2) == {'left': True, 'right': True}
+
+
+def test_stage_errors_are_raised_and_dependents_never_run():
+    ran = []
+
+    def fail():
+        raise RuntimeError("stage failed")
+
+    stages = {'fail': (fail, []), 'after': (lambda fail: ran.append(fail), ['fail'])}
+    with pytest.raises(RuntimeError, match="stage failed"):
+        run_stage_graph(stages)
+    assert ran == []
+
+
+def test_unknown_and_cyclic_dependencies_are_rejected():
+    with pytest.raises(ValueError, match="unknown"):
+        run_stage_graph({'a': (lambda missing: None, ['missing'])})
+    with pytest.raises(ValueError, match="cycle"):
+        run_stage_graph({'a': (lambda b: None, ['b']), 'b': (lambda a: None, ['a'])})
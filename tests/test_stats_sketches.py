@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.onion_model import run_onion_model_processing
+from processing.model_aggregates import compute_model_aggregates, aggregate_summary_stats, enriched_event_stats
+from processing.stats_sketches import HyperLogLog, EventStatsSketch, value_hashes, STATS_SKETCH_CONFIG
+
+# Four standard errors of a precision-p HyperLogLog (1.04 / sqrt(2^p)).
+_TOLERANCE = 4 * 1.04 / np.sqrt(2 ** STATS_SKETCH_CONFIG['hll_precision'])
+
+
+def _sketch(values):
+    sketch = HyperLogLog()
+    sketch.add_hashes(value_hashes(values))
+    return sketch
+
+
+@pytest.mark.parametrize('cardinality', [10, 1_000, 50_000, 300_000])
+def test_distinct_count_is_within_the_error_bound(cardinality):
+    estimate = _sketch([f'user-{i}' for i in range(cardinality)]).estimate()
+    assert abs(estimate - cardinality) <= max(1, _TOLERANCE * cardinality)
+
+
+def test_merge_equals_the_sketch_of_the_union_and_ignores_repeats():
+    values = [f'user-{i}' for i in range(40_000)]
+    left, right = _sketch(values[:25_000]), _sketch(values[15_000:])
+    left.merge(right)
+    assert np.array_equal(left.registers, _sketch(values).registers)
+    with pytest.raises(ValueError):
+        left.merge(HyperLogLog(precision=10))
+
+
+def test_stats_sketches_merge_per_day_counts_and_users():
+    users, dates = np.array(['a', 'b', 'a', 'c']), np.array(['d1', 'd1', 'd2', 'd2'])
+    merged = EventStatsSketch.merged([EventStatsSketch().update(users[:2], dates[:2]), None,
+                                      EventStatsSketch().update(users[2:], dates[2:])])
+    assert merged.event_count == 4
+    assert merged.day_counts == {'d1': 2, 'd2': 2}
+    assert merged.distinct_users() == 3
+
+
+def test_busiest_doors_from_aggregates_are_exact(raw_events):
+    enriched, *_ = run_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG)
+    stats = aggregate_summary_stats(compute_model_aggregates(enriched))
+    expected = enriched_event_stats(enriched, len(raw_events))
+    assert sorted(stats['top_doors']) == sorted(expected['top_doors'])
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.onion_model import run_onion_model_processing
+from processing.threshold_sweep import run_threshold_sweep
+from tests.conftest import make_events
+from constants import REQUIRED_INTERNAL_COLUMNS
+
+TIMESTAMP_COL = REQUIRED_INTERNAL_COLUMNS['Timestamp']
+DOORID_COL = REQUIRED_INTERNAL_COLUMNS['DoorID']
+
+
+def _noisy_events():
+    """Events with rapid repeat scans and A->B->A ping-pongs at gaps that straddle the swept thresholds."""
+    events = make_events(num_users=30, days=3)
+    rng = np.random.default_rng(1)
+    repeats = events.sample(80, random_state=1)
+    repeats = repeats.assign(**{TIMESTAMP_COL: repeats[TIMESTAMP_COL] + pd.to_timedelta(rng.integers(1, 90, 80), 's')})
+    origins = events.sample(60, random_state=2)
+    away = origins.assign(**{DOORID_COL: 'ELEV 1',
+                             TIMESTAMP_COL: origins[TIMESTAMP_COL] + pd.to_timedelta(rng.integers(5, 60, 60), 's')})
+    back = origins.assign(**{TIMESTAMP_COL: origins[TIMESTAMP_COL] + pd.to_timedelta(rng.integers(61, 400, 60), 's')})
+    return pd.concat([events, repeats, away, back], ignore_index=True).sample(frac=1, random_state=3)
+
+
+def test_sweep_rows_equal_separate_pipeline_runs():
+    raw = _noisy_events()
+    sweep = run_threshold_sweep(raw, GRAPH_PROCESSING_CONFIG, [5, 10, 30, 60], [0.5, 1, 2, 5])
+    assert len(sweep) == 16
+    assert sweep['RapidScansRemoved'].nunique() > 1 and sweep['PingPongRemoved'].nunique() > 1
+    for row in sweep.itertuples():
+        config = dict(GRAPH_PROCESSING_CONFIG, same_door_scan_threshold_seconds=row.same_door_scan_threshold_seconds,
+                      ping_pong_threshold_minutes=row.ping_pong_threshold_minutes)
+        enriched, devices, _, paths = run_onion_model_processing(raw.copy(), config)
+        assert (row.EnrichedEvents, row.Devices, row.Paths) == (len(enriched), len(devices), len(paths))
+        assert row.DoorLayers == dict(zip(devices[DOORID_COL], devices['FinalGlobalDeviceDepth'].astype(int)))
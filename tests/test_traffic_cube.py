@@ -0,0 +1,65 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing.graph_config import GRAPH_PROCESSING_CONFIG
+from processing.onion_model import run_onion_model_processing
+from processing.model_aggregates import TIMESTAMP_COL_DISPLAY, DOORID_COL_DISPLAY
+from processing.traffic_cube import TrafficCube
+
+
+@pytest.fixture
+def model(raw_events):
+    enriched, devices, _, _ = run_onion_model_processing(raw_events, GRAPH_PROCESSING_CONFIG)
+    return enriched, devices
+
+
+def _counts(enriched, keys):
+    timestamps = pd.to_datetime(enriched[TIMESTAMP_COL_DISPLAY])
+    columns = {'date': timestamps.dt.date, 'hour': timestamps.dt.hour, 'door': enriched[DOORID_COL_DISPLAY]}
+    return pd.DataFrame(columns).groupby(keys).size().unstack('hour', fill_value=0).reindex(columns=range(24), fill_value=0)
+
+
+def test_matrices_match_a_groupby(model):
+    enriched, devices = model
+    cube = TrafficCube(enriched, devices)
+    days, matrix = cube.date_hour_matrix()
+    expected = _counts(enriched, ['date', 'hour'])
+    assert days == list(expected.index) and np.array_equal(matrix, expected.to_numpy())
+
+    layer = cube.layers()[0]
+    layer_doors = devices.loc[devices['FinalGlobalDeviceDepth'] == layer, DOORID_COL_DISPLAY].astype(str)
+    start, end = days[1], days[2]
+    selected = enriched[enriched[DOORID_COL_DISPLAY].isin(layer_doors)
+                        & pd.to_datetime(enriched[TIMESTAMP_COL_DISPLAY]).dt.date.between(start, end)]
+    doors, matrix = cube.door_hour_matrix(layers=[layer], start=start, end=end)
+    expected = _counts(selected, ['door', 'hour']).reindex(doors, fill_value=0)
+    assert sorted(doors) == sorted(layer_doors) and np.array_equal(matrix, expected.to_numpy())
+
+    totals = expected.sum(axis=0)
+    expected_peaks = sorted(((hour, count) for hour, count in totals.items() if count), key=lambda hc: (-hc[1], hc[0]))
+    assert cube.peak_hours(layers=[layer], start=start, end=end, top=3) == expected_peaks[:3]
+
+
+def test_day_span_is_clipped_to_the_cube(model):
+    cube = TrafficCube(model[0])
+    first_day = cube.days[0]
+    assert cube.day_span() == (0, cube.num_days)
+    assert cube.day_span(first_day - datetime.timedelta(days=10), first_day + datetime.timedelta(days=1)) == (0, 2)
+    assert cube.day_span(cube.days[-1], cube.days[-1] + datetime.timedelta(days=30)) == (cube.num_days - 1, cube.num_days)
+    assert cube.day_span(first_day - datetime.timedelta(days=10), first_day - datetime.timedelta(days=5)) == (0, 0)
+    assert cube.date_hour_matrix(start='2000-01-01', end='2000-01-02')[1].shape == (0, 24)
+
+
+def test_merging_cubes_with_different_first_days_equals_one_cube(model):
+    enriched, devices = model
+    dates = pd.to_datetime(enriched[TIMESTAMP_COL_DISPLAY]).dt.date
+    cut = sorted(dates.unique())[2]
+    # The later part is passed first, so the merged first day comes from the second cube.
+    merged = TrafficCube.merge([TrafficCube(enriched[dates >= cut]), TrafficCube(enriched[dates < cut])], devices)
+    expected = TrafficCube(enriched, devices)
+    assert merged.days == expected.days and list(merged.doors) == list(expected.doors)
+    assert (merged.counts != expected.counts).nnz == 0
+    assert np.array_equal(merged.door_layers, expected.door_layers)